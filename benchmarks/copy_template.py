@@ -0,0 +1,66 @@
+"""Benchmark copying a template with large assets and many small files.
+
+Usage:
+    python benchmarks/copy_template.py [--large-mb N] [--small N] [--jobs N]
+
+The template has a few large files like vendored datasets and many small source
+files. It's copied by reading and writing each file in Python as the old
+`copy_template` did, and by the copy engine of `start.core.fastcopy`.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from start.core.fastcopy import copy_tree
+
+
+def naive_copy(src: Path, dest: Path):
+    """Recursive copy by read_bytes and write_bytes."""
+    dest.mkdir(parents=True, exist_ok=True)
+    for item in src.iterdir():
+        if item.is_dir():
+            naive_copy(item, dest / item.name)
+        elif not (dest_item := dest / item.name).exists():
+            dest_item.write_bytes(item.read_bytes())
+
+
+def make_template(root: Path, large_mb: int, small: int):
+    for i in range(4):
+        (root / "data").mkdir(parents=True, exist_ok=True)
+        with open(root / "data" / f"dataset{i}.bin", "wb") as f:
+            for _ in range(large_mb // 4):
+                f.write(os.urandom(1024 * 1024))
+    for i in range(small):
+        (package := root / "src" / f"module{i % 50}").mkdir(parents=True, exist_ok=True)
+        (package / f"file{i}.py").write_text(f"VALUE = {i}\n" * 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--large-mb", type=int, default=200, help="Total size of large files")
+    parser.add_argument("--small", type=int, default=2000, help="Number of small files")
+    parser.add_argument("--jobs", type=int, default=0, help="Threads of the copy engine")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="start-bench-") as tmp_dir:
+        template = Path(tmp_dir, "template")
+        make_template(template, args.large_mb, args.small)
+        copies = {
+            "read/write": lambda dest: naive_copy(template, dest),
+            "copy engine": lambda dest: copy_tree(template, dest, args.jobs),
+        }
+        print(f"template: {args.large_mb} MB of large files, {args.small} small files")
+        for name, copy in copies.items():
+            start = time.perf_counter()
+            copy(Path(tmp_dir, name.replace("/", "-")))
+            print(f"{name:<12}{(time.perf_counter() - start) * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark parsing requirement lines by `Dependency`.
+
+Usage:
+    python benchmarks/parse_requirements.py [--lines N] [--unique N] [--budget MS]
+
+A requirement file of generated lines is parsed twice, the first pass parses
+every unique line and the second pass hits the parse cache. The time of
+`packaging.requirements.Requirement` is displayed for reference. Exit with code
+1 if the cold pass is over budget.
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+from packaging.requirements import Requirement
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from start.core.dependency import Dependency, _parse
+
+TEMPLATES = (
+    "{name}",
+    "{name}=={major}.{minor}.{patch}",
+    "{name}>={major}.{minor},<{next_major}",
+    "{name}[extra, more.extra]~={major}.{minor}",
+    "{name} ; python_version >= '3.{minor}'",
+    "{name}>={major}.{minor} ; sys_platform == 'linux' and (python_version < '3.12' or "
+    "extra == 'test')",
+    "{name} @ https://example.com/packages/{name}-{major}.{minor}.{patch}-py3-none-any.whl",
+    "{name}@git+https://github.com/example/{name}.git@v{major}.{minor}",
+)
+
+
+def generate_lines(count: int, unique: int) -> list[str]:
+    """Requirement lines with `unique` distinct strings, in random order."""
+    rand = random.Random(0)
+    distinct = []
+    for i in range(unique):
+        major, minor = rand.randint(0, 30), rand.randint(0, 20)
+        distinct.append(
+            rand.choice(TEMPLATES).format(
+                name=f"package_{i}.{rand.choice(('core', 'utils', 'io'))}",
+                major=major,
+                next_major=major + 1,
+                minor=minor,
+                patch=rand.randint(0, 9),
+            )
+        )
+    return [distinct[i % unique] for i in rand.sample(range(count), count)]
+
+
+def timeit(func, lines: list[str]) -> float:
+    """Time of calling func on every line in milliseconds."""
+    start = time.perf_counter()
+    for line in lines:
+        func(line)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100_000, help="Number of lines to parse")
+    parser.add_argument("--unique", type=int, default=20_000, help="Number of distinct lines")
+    parser.add_argument("--budget", type=float, default=1000, help="Budget of the cold pass")
+    args = parser.parse_args()
+
+    lines = generate_lines(args.lines, min(args.unique, args.lines))
+    _parse.cache_clear()
+    cold = timeit(Dependency, lines)
+    warm = timeit(Dependency, lines)
+    reference = timeit(Requirement, lines[: args.lines // 10]) * 10
+
+    def report(name: str, elapsed: float, extra: str = ""):
+        rate = args.lines / elapsed * 1000
+        print(f"{name:<24}{elapsed:>10.1f} ms {rate:>12,.0f} lines/s {extra}")
+
+    status = "ok" if cold <= args.budget else "OVER BUDGET"
+    report("Dependency (cold)", cold, f"(budget {args.budget:.0f} ms) {status}")
+    report("Dependency (cached)", warm)
+    report("packaging Requirement", reference, "(estimated from 10% of lines)")
+    print(f"cache: {_parse.cache_info()}")
+    sys.exit(1 if cold > args.budget else 0)
+
+
+if __name__ == "__main__":
+    main()
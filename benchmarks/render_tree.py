@@ -0,0 +1,82 @@
+"""Benchmark rendering the dependency tree of a synthetic package graph.
+
+Usage:
+    python benchmarks/render_tree.py [--nodes N] [--requires N] [--budget MS]
+
+Each package requires a few random packages from the next layers, so shared
+subtrees are everywhere like the environments of data science. The lines of
+the naive tree which expands every path are counted for reference. Exit with
+code 1 if rendering is over budget.
+"""
+
+import argparse
+import io
+import random
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from start.core.graph import PackageGraph
+from start.core.tree import DependencyTree
+
+
+def generate_graph(nodes: int, requires: int, layers: int = 20) -> dict[str, list[str]]:
+    """Layered graph of packages, packages only require packages of deeper layers."""
+    rand = random.Random(0)
+    names = [f"package-{i}" for i in range(nodes)]
+    layer_size = max(nodes // layers, 1)
+    graph = {}
+    for i, name in enumerate(names):
+        deeper = names[(i // layer_size + 1) * layer_size :]
+        graph[name] = rand.sample(deeper, min(requires, len(deeper)))
+    return graph
+
+
+def naive_lines(graph: dict[str, list[str]], roots: list[str]) -> int:
+    """Number of lines when every path is expanded, as the old renderer did."""
+
+    @lru_cache(maxsize=None)
+    def count(name: str) -> int:
+        return 1 + sum(count(child) for child in graph[name])
+
+    return sum(count(root) for root in roots)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=5000, help="Number of packages")
+    parser.add_argument("--requires", type=int, default=3, help="Requirements of each package")
+    parser.add_argument("--budget", type=float, default=500, help="Budget of rendering in ms")
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), args.nodes * 2))
+    graph = generate_graph(args.nodes, args.requires)
+    start = time.perf_counter()
+    tree = DependencyTree(PackageGraph(graph))
+    print(f"build graph: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    lines = sum(1 for _ in tree.render())
+    elapsed = (time.perf_counter() - start) * 1000
+    edges = sum(map(len, graph.values()))
+    status = "ok" if elapsed <= args.budget else "OVER BUDGET"
+    print(f"graph: {args.nodes} packages, {edges} requirements")
+    print(f"render: {elapsed:.1f} ms, {lines:,} lines (budget {args.budget:.0f} ms) {status}")
+    print(f"naive tree: {naive_lines(graph, tree.roots()):,} lines")
+
+    exports = {
+        "json": lambda: tree.write_json(io.StringIO()),
+        "dot": lambda: list(tree.iter_dot()),
+    }
+    for name, export in exports.items():
+        start = time.perf_counter()
+        export()
+        print(f"{name} export: {(time.perf_counter() - start) * 1000:.1f} ms")
+    sys.exit(1 if elapsed > args.budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark the startup time of start commands.
+
+Usage:
+    python benchmarks/startup.py [--runs N] [--help-budget MS] [--activate-budget MS]
+                                 [--run-budget MS]
+
+Each command is run in a fresh interpreter, the median wall time is compared
+with the budget and the slowest imports reported by `python -X importtime` are
+displayed. Exit with code 1 if any command is over budget.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import venv
+
+
+def wall_time(cmd: list[str], runs: int, env: dict) -> float:
+    """Median wall time of the command in milliseconds."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def slowest_imports(cmd: list[str], env: dict, top: int = 5) -> list[tuple[int, str]]:
+    """Top level imports with the largest cumulative time in microseconds."""
+    result = subprocess.run(
+        [cmd[0], "-X", "importtime", *cmd[1:]],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # only the top level imports, the nested imports are indented
+        if cumulative.strip().isdigit() and not name[1:].startswith(" "):
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="Runs of each command")
+    parser.add_argument("--help-budget", type=float, default=400, help="Budget of `start --help`")
+    parser.add_argument(
+        "--activate-budget", type=float, default=100, help="Budget of `start env activate`"
+    )
+    parser.add_argument(
+        "--run-budget",
+        type=float,
+        default=150,
+        help="Budget of `start run --direct`, including the startup of the python it runs",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="start-bench-") as tmp_dir:
+        venv.create(os.path.join(tmp_dir, "bench-env"), with_pip=False)
+        env = {**os.environ, "START_DATA_DIR": tmp_dir, "SHELL": os.getenv("SHELL") or "bash"}
+        commands = {
+            "start --help": ([sys.executable, "-m", "start", "--help"], args.help_budget),
+            "start env activate": (
+                [sys.executable, "-m", "start", "env", "activate", "bench-env"],
+                args.activate_budget,
+            ),
+            "start run --direct": (
+                [sys.executable, "-m", "start", "run", "-n", "bench-env", "--direct"]
+                + ["python", "-c", "pass"],
+                args.run_budget,
+            ),
+        }
+        baseline = wall_time([sys.executable, "-c", "pass"], args.runs, env)
+        print(f"{'python -c pass':<24}{baseline:>8.1f} ms")
+
+        over_budget = False
+        for name, (cmd, budget) in commands.items():
+            elapsed = wall_time(cmd, args.runs, env)
+            status = "ok" if elapsed <= budget else "OVER BUDGET"
+            over_budget |= elapsed > budget
+            print(f"{name:<24}{elapsed:>8.1f} ms  (budget {budget:.0f} ms) {status}")
+            for cumulative, module in slowest_imports(cmd, env):
+                print(f"    {module:<36}{cumulative / 1000:>8.1f} ms")
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""Run the benchmark suite and compare the results with a baseline.
+
+Usage:
+    python benchmarks/suite.py [--only NAME ...] [--repeat N] [--output FILE]
+                               [--baseline [FILE]] [--tolerance RATIO]
+
+The suite covers parsing dependencies, editing the dependency file, building
+and rendering the dependency tree, copying a template and creating an
+environment with packages end to end, and installing locked packages from the
+cached wheels by pip and by the in-process installer. Packages are installed from a local
+simple index of generated wheels, so the results don't depend on the network.
+
+`benchmarks/baseline.json` is the reference result of the main branch, it's
+compared when `--baseline` is given without a file. Compare a change with it,
+exit with code 1 if any benchmark is slower than the tolerance:
+
+    python benchmarks/suite.py --baseline
+
+Timings depend on the machine, so record the baseline of the main branch on
+the same machine before comparing. Update the reference result by running the
+whole suite on the main branch:
+
+    python benchmarks/suite.py --output benchmarks/baseline.json
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from copy_template import make_template
+from parse_requirements import generate_lines
+from render_tree import generate_graph
+
+from start.core import trace
+from start.core.dependency import DependencyManager, _parse
+from start.core.env_builder import ExtEnvBuilder
+from start.core.fastcopy import copy_tree
+from start.core.graph import PackageGraph
+from start.core.installer import WheelInstaller, install_locked
+from start.core.metadata import EnvMetadata
+from start.core.pip_manager import PipManager
+from start.core.tree import DependencyTree
+from start.core.wheelhouse import Wheelhouse
+
+RESULTS_VERSION = 1
+BASELINE_FILE = Path(__file__).absolute().parent / "baseline.json"
+# zip entries have a fixed time, so the wheels and their hashes are reproducible
+WHEEL_TIME = (2020, 1, 1, 0, 0, 0)
+
+
+def record_hash(data: bytes) -> str:
+    digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=")
+    return "sha256=" + digest.decode()
+
+
+def build_wheel(dest_dir: Path, name: str, version: str, requires: List[str]) -> Path:
+    """Pure python wheel of a package with a module and a console script."""
+    dist = name.replace("-", "_")
+    dist_info = f"{dist}-{version}.dist-info"
+    metadata = ["Metadata-Version: 2.1", f"Name: {name}", f"Version: {version}"]
+    metadata.extend(f"Requires-Dist: {require}" for require in requires)
+    files = {
+        f"{dist}/__init__.py": f'__version__ = "{version}"\n\n\ndef main():\n    print(__version__)\n',
+        f"{dist_info}/METADATA": "\n".join(metadata) + "\n",
+        f"{dist_info}/WHEEL": "Wheel-Version: 1.0\nGenerator: start-benchmarks\n"
+        "Root-Is-Purelib: true\nTag: py3-none-any\n",
+        f"{dist_info}/entry_points.txt": f"[console_scripts]\n{name} = {dist}:main\n",
+    }
+    record = [
+        f"{path},{record_hash(text.encode())},{len(text.encode())}" for path, text in files.items()
+    ]
+    files[f"{dist_info}/RECORD"] = "\n".join([*record, f"{dist_info}/RECORD,,"]) + "\n"
+    wheel = dest_dir / f"{dist}-{version}-py3-none-any.whl"
+    with zipfile.ZipFile(wheel, "w", zipfile.ZIP_DEFLATED) as zf:
+        for path, text in files.items():
+            zf.writestr(zipfile.ZipInfo(path, WHEEL_TIME), text)
+    return wheel
+
+
+def build_index(root: Path, packages: int = 30) -> str:
+    """Simple repository (PEP 503) of layered packages in the directory, each
+    package requires a few packages of the next layer.
+
+    Returns:
+        The index url of the repository
+    """
+    rand = random.Random(0)
+    names = [f"bench-package-{i}" for i in range(packages)]
+    files_dir, simple_dir = root / "files", root / "simple"
+    files_dir.mkdir(parents=True, exist_ok=True)
+    for i, name in enumerate(names):
+        deeper = names[(i // 5 + 1) * 5 :]
+        requires = [f"{dep}>=1.0" for dep in rand.sample(deeper, min(2, len(deeper)))]
+        links = []
+        for version in ("1.0.0", "1.1.0"):
+            wheel = build_wheel(files_dir, name, version, requires)
+            sha256 = hashlib.sha256(wheel.read_bytes()).hexdigest()
+            links.append(f'<a href="../../files/{wheel.name}#sha256={sha256}">{wheel.name}</a>')
+        (project_dir := simple_dir / name).mkdir(parents=True, exist_ok=True)
+        (project_dir / "index.html").write_text(
+            "<html><body>\n" + "\n".join(links) + "\n</body></html>\n"
+        )
+    links = [f'<a href="{name}/">{name}</a>' for name in names]
+    (simple_dir / "index.html").write_text(
+        "<html><body>\n" + "\n".join(links) + "\n</body></html>\n"
+    )
+    return simple_dir.as_uri()
+
+
+class Benchmark(NamedTuple):
+    """A benchmark, `run` is timed and `setup` prepares the state before each run.
+
+    Args:
+        name: Name of the benchmark in the results
+        run: Function to time
+        setup: Function called before each run, not timed
+        repeat: Default number of runs
+        params: Parameters recorded with the results
+    """
+
+    name: str
+    run: Callable[[], object]
+    setup: Callable[[], object] = lambda: None
+    repeat: int = 5
+    params: Optional[dict] = None
+
+
+def make_benchmarks(work_dir: Path, index_url: str) -> List[Benchmark]:
+    lines = generate_lines(50_000, 10_000)
+
+    config = work_dir / "pyproject.toml"
+    packages = [f"package-{i}>={i % 10}.0" for i in range(500)]
+
+    def reset_config():
+        config.write_text(
+            '[project]\nname = "bench"\ndependencies = [\n'
+            + "".join(f'    "{package}",\n' for package in packages)
+            + "]\n"
+        )
+
+    def edit_config():
+        dm = DependencyManager(config)
+        with dm.batch() as edit:
+            edit.add([f"added-{i}" for i in range(100)])
+            edit.remove([f"package-{i}" for i in range(0, 500, 5)])
+            edit.add(["pytest>=7", "ruff"], group="dev")
+
+    graph = generate_graph(5000, 3)
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10_000))
+
+    template, copied = work_dir / "template", work_dir / "copied"
+    make_template(template, 16, 1000)
+
+    env_dir = work_dir / "env"
+
+    def create_env():
+        ExtEnvBuilder(
+            ["bench-package-0", "bench-package-1", "bench-package-2"],
+            force=True,
+            pip_args=["--index-url", index_url, "--no-cache-dir"],
+            display_activate=False,
+        ).create(env_dir)
+
+    # locked installs of all packages into an environment created by the first setup
+    locked_env = work_dir / "locked-env"
+    wheelhouse = Wheelhouse(work_dir / "wheelhouse")
+    files_dir = work_dir / "index" / "files"
+    locked = []
+    for wheel in sorted(files_dir.glob("*-1.0.0-*.whl")):
+        sha256 = hashlib.sha256(wheel.read_bytes()).hexdigest()
+        locked.append(f"{wheel.name.split('-')[0]}==1.0.0 --hash=sha256:{sha256}")
+        wheelhouse.add(shutil.copy2(wheel, work_dir / wheel.name))
+
+    def reset_locked_env():
+        if not locked_env.exists():
+            ExtEnvBuilder(None, display_activate=False).create(locked_env)
+        installer = WheelInstaller(EnvMetadata(str(locked_env / "bin" / "python")), wheelhouse)
+        for name in list(installer.installed):
+            if name.startswith("bench"):
+                installer.uninstall(name)
+
+    def install_by(backend: str):
+        pip = PipManager(str(locked_env / "bin" / "python"))
+        pip_args = ["--no-index", "--find-links", str(files_dir)]
+        if not install_locked(pip, locked, pip_args, backend, wheelhouse):
+            raise RuntimeError(f"failed to install the locked packages by {backend}")
+
+    benchmarks = [
+        Benchmark(
+            "dependency_parse",
+            lambda: [_parse(line) for line in lines],
+            setup=_parse.cache_clear,
+            params={"lines": len(lines), "unique": 10_000},
+        ),
+        Benchmark("dependency_edit", edit_config, setup=reset_config, params={"packages": 500}),
+        Benchmark(
+            "tree_render",
+            lambda: sum(1 for _ in DependencyTree(PackageGraph(graph)).render()),
+            params={"packages": len(graph), "requires": 3},
+        ),
+        Benchmark(
+            "copy_template",
+            lambda: copy_tree(template, copied),
+            setup=lambda: shutil.rmtree(copied, ignore_errors=True),
+            params={"large_mb": 16, "small": 1000},
+        ),
+        Benchmark(
+            "env_create",
+            create_env,
+            setup=lambda: shutil.rmtree(env_dir, ignore_errors=True),
+            repeat=2,
+            params={"packages": 3, "index": "local"},
+        ),
+        Benchmark(
+            "install_locked_pip",
+            lambda: install_by("pip"),
+            setup=reset_locked_env,
+            repeat=3,
+            params={"packages": len(locked), "backend": "pip"},
+        ),
+        Benchmark(
+            "install_locked_wheel",
+            lambda: install_by("auto"),
+            setup=reset_locked_env,
+            params={"packages": len(locked), "backend": "auto"},
+        ),
+    ]
+    return [benchmark._replace(params=benchmark.params or {}) for benchmark in benchmarks]
+
+
+def run_benchmark(benchmark: Benchmark, repeat: Optional[int]) -> Dict:
+    """Time the benchmark, the phases of the last run are recorded by the tracer."""
+    timings = []
+    for _ in range(max(repeat or benchmark.repeat, 1)):
+        benchmark.setup()
+        tracer = trace.enable(benchmark.name)
+        start = time.perf_counter()
+        benchmark.run()
+        timings.append((time.perf_counter() - start) * 1000)
+        trace.disable()
+    result = {
+        "median": round(statistics.median(timings), 3),
+        "min": round(min(timings), 3),
+        "runs": len(timings),
+        "params": benchmark.params,
+    }
+    if phases := tracer.phases():
+        result["phases"] = phases
+    return result
+
+
+def compare(baseline: Dict, results: Dict, tolerance: float) -> List[str]:
+    """Print the change of the fastest run of each benchmark, which is less
+    noisy than the median, return the names of the regressions."""
+    regressions = []
+    print(f"\n{'benchmark':<20}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, result in results["results"].items():
+        if not (before := baseline.get("results", {}).get(name)):
+            print(f"{name:<20}{'-':>12}{result['min']:>10.1f}ms{'new':>10}")
+            continue
+        change = result["min"] / before["min"] - 1
+        status = ""
+        if change > tolerance:
+            regressions.append(name)
+            status = " REGRESSION"
+        print(f"{name:<20}{before['min']:>10.1f}ms{result['min']:>10.1f}ms{change:>+10.1%}{status}")
+    if baseline.get("python") != results["python"]:
+        print(f"baseline was recorded by python {baseline.get('python')}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", default=[], help="Names of benchmarks to run")
+    parser.add_argument("--repeat", type=int, help="Runs of each benchmark")
+    parser.add_argument("--output", help="Save the results as json to the file")
+    parser.add_argument(
+        "--baseline",
+        nargs="?",
+        const=str(BASELINE_FILE),
+        help="Compare the results with the saved results, default to benchmarks/baseline.json",
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Slowdown ratio reported as regression"
+    )
+    args = parser.parse_args()
+
+    # pip reads these from the environment, keep it away from the user config and network
+    for name in [name for name in os.environ if name.startswith("PIP_")]:
+        del os.environ[name]
+    os.environ.update(
+        {
+            "PIP_CONFIG_FILE": os.devnull,
+            "PIP_DISABLE_PIP_VERSION_CHECK": "1",
+            "PIP_NO_INPUT": "1",
+        }
+    )
+    results: Dict = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="start-bench-") as tmp_dir:
+        work_dir = Path(tmp_dir)
+        index_url = build_index(work_dir / "index")
+        benchmarks = make_benchmarks(work_dir, index_url)
+        unknown = set(args.only) - {benchmark.name for benchmark in benchmarks}
+        if unknown:
+            parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+        for benchmark in benchmarks:
+            if args.only and benchmark.name not in args.only:
+                continue
+            result = run_benchmark(benchmark, args.repeat)
+            results["results"][benchmark.name] = result
+            print(
+                f"{benchmark.name:<20}{result['median']:>10.1f} ms median"
+                f"{result['min']:>10.1f} ms min  ({result['runs']} runs)"
+            )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    regressions = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(baseline, results, args.tolerance)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import sys
+
+
+def activate_fast_path(argv: list[str]) -> bool:
+    """Print the activate command without loading the cli framework, it's called
+    in shell hooks so should be as fast as possible. Return False to fall back to
+    the normal cli when the arguments can't be handled here.
+    """
+    if argv[:2] != ["env", "activate"] or len(argv) > 3:
+        return False
+    if any(arg.startswith("-") for arg in argv[2:]):
+        return False
+    if not os.getenv("SHELL") and os.name != "nt":
+        return False
+
+    from start.utils import display_activate_cmd, find_env
+
+    if not (env_path := find_env(argv[2] if len(argv) == 3 else ".")):
+        return False
+    print(display_activate_cmd(env_path, prompt=False))
+    return True
+
+
+def run_fast_path(argv: list[str]) -> bool:
+    """Execute `start run --direct` without loading the cli framework, the
+    process is replaced by the command. Options are parsed until the first
+    positional argument, the rest is the command and passed as is. Return False
+    to fall back to the normal cli when the arguments can't be handled here.
+    """
+    if argv[:1] != ["run"]:
+        return False
+    direct = os.getenv("START_RUN_DIRECT", "").lower() in ("1", "true", "yes", "on")
+    env_name, index = "", 1
+    while index < len(argv):
+        arg = argv[index]
+        if arg == "--direct":
+            direct = True
+        elif arg in ("-n", "--vname") and index + 1 < len(argv):
+            env_name = argv[index := index + 1]
+        elif arg.startswith("--vname="):
+            env_name = arg.partition("=")[2]
+        elif arg == "--":
+            index += 1
+            break
+        elif arg.startswith("-"):
+            return False
+        else:
+            break
+        index += 1
+    commands = argv[index:]
+    if not direct or not commands:
+        return False
+
+    from start.core.config import DEFAULT_ENV
+    from start.utils import exec_in_env, find_env, is_env_dir
+
+    if not env_name:
+        env_path = next((env for env in DEFAULT_ENV if is_env_dir(env)), None)
+    else:
+        env_path = env_name if is_env_dir(env_name) else find_env(env_name)
+    if not env_path:
+        return False
+    try:
+        return_code = exec_in_env(env_path, commands)
+    except FileNotFoundError:
+        return False
+    sys.exit(return_code)
+
+
+def daemon_forward(argv: list[str]) -> bool:
+    """Run the command by the daemon if `START_DAEMON` is set and the daemon is
+    running, the process exits with the code of the command."""
+    if os.getenv("START_DAEMON", "").lower() not in ("1", "true", "yes", "on"):
+        return False
+    from start.client import forward, is_local
+
+    if is_local(argv) or (return_code := forward(argv)) is None:
+        return False
+    sys.exit(return_code)
+
+
+def main(use_daemon: bool = True):
+    """Entry of the start command.
+
+    Args:
+        use_daemon: Whether to send the command to the daemon, False when called by the client
+    """
+    argv = sys.argv[1:]
+    if activate_fast_path(argv) or run_fast_path(argv):
+        return
+    if use_daemon and daemon_forward(argv):
+        return
+    from start.cli import app
+
+    app()
+
+
+if __name__ == "__main__":
+    main()
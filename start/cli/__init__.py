@@ -2,22 +2,31 @@ import os
 
 from typer import Typer
 
-from start.cli.environment import activate, create, list_environments, run
+from start.cli.cache import clear, list_wheels, prune
+from start.cli.daemon import start_daemon, status, stop
+from start.cli.environment import activate, create, create_many, dedupe, list_environments, run
 from start.cli.inspect import list_packages, show
 from start.cli.modify import add, remove
-from start.cli.project import init, install, new
+from start.cli.profile import profile
+from start.cli.project import init, install, lock, new
 
 app = Typer(
     help="Package manager based on pip and venv",
     rich_markup_mode="markdown",
     pretty_exceptions_show_locals=bool(os.getenv("DEBUG")),
 )
+app.callback()(profile)
 
 with_extra_args = {"allow_extra_args": True, "ignore_unknown_options": True}
 app.command(rich_help_panel="Project", context_settings=with_extra_args)(new)
 app.command(rich_help_panel="Project", context_settings=with_extra_args)(init)
 app.command(rich_help_panel="Project", context_settings=with_extra_args)(install)
-app.command(rich_help_panel="Project", context_settings=with_extra_args)(run)
+app.command(rich_help_panel="Project", context_settings=with_extra_args)(lock)
+# options after the command belong to the command
+app.command(
+    rich_help_panel="Project",
+    context_settings={**with_extra_args, "allow_interspersed_args": False},
+)(run)
 
 app.command(rich_help_panel="Modify Dependencies", context_settings=with_extra_args)(add)
 app.command(rich_help_panel="Modify Dependencies", context_settings=with_extra_args)(remove)
@@ -28,7 +37,25 @@ app.command(rich_help_panel="Inspect")(show)
 env_typer = Typer(help="Manager environments.")
 
 env_typer.command(context_settings=with_extra_args)(create)
+env_typer.command(name="create-many", context_settings=with_extra_args)(create_many)
 env_typer.command()(activate)
 env_typer.command(name="list")(list_environments)
+env_typer.command()(dedupe)
 
 app.add_typer(env_typer, name="env", rich_help_panel="Environment")
+
+cache_typer = Typer(help="Manage the shared wheelhouse.")
+
+cache_typer.command(name="list")(list_wheels)
+cache_typer.command()(prune)
+cache_typer.command()(clear)
+
+app.add_typer(cache_typer, name="cache", rich_help_panel="Environment")
+
+daemon_typer = Typer(help="Manage the daemon running commands with warm caches.")
+
+daemon_typer.command(name="start")(start_daemon)
+daemon_typer.command()(stop)
+daemon_typer.command()(status)
+
+app.add_typer(daemon_typer, name="daemon", rich_help_panel="Environment")
@@ -0,0 +1,46 @@
+import time
+
+from start.cli import params as _p
+from start.logger import Detail, Info, Success, Warn
+
+
+def list_wheels():
+    """List wheels in the wheelhouse, sorted by last used time."""
+    from start.core.wheelhouse import Wheelhouse, format_size
+
+    wheelhouse = Wheelhouse()
+    if not (wheels := wheelhouse.wheels()):
+        Warn(f"Wheelhouse {wheelhouse.root} is empty.")
+        return
+    Info(f"Wheelhouse: {wheelhouse.root}")
+    Detail(
+        "\n".join(
+            f"- {wheel['name']} ({format_size(wheel['size'])}, last used "
+            f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(wheel['last_used']))})"
+            for wheel in wheels
+        )
+    )
+    Info(
+        f"Total: {len(wheels)} wheels, {format_size(wheelhouse.size())} "
+        f"(max size {format_size(wheelhouse.max_size)})"
+    )
+
+
+def prune(max_size: _p.MaxSize = ""):
+    """Remove the least recently used wheels until the wheelhouse is smaller than max size."""
+    from start.core.wheelhouse import Wheelhouse, format_size
+
+    wheelhouse = Wheelhouse(max_size=max_size or None)
+    evicted = wheelhouse.prune()
+    if evicted:
+        Detail("\n".join("- " + name for name in evicted))
+    Success(f"Removed {len(evicted)} wheels, {format_size(wheelhouse.size())} left.")
+
+
+def clear():
+    """Remove all wheels in the wheelhouse."""
+    from start.core.wheelhouse import Wheelhouse
+
+    wheelhouse = Wheelhouse()
+    wheelhouse.clear()
+    Success(f"Wheelhouse {wheelhouse.root} cleared.")
@@ -0,0 +1,68 @@
+import subprocess
+import sys
+import time
+
+from typer import Exit
+
+from start.cli import params as _p
+from start.logger import Error, Info, Success, Warn
+
+
+def start_daemon(foreground: _p.Foreground = False, idle_timeout: _p.IdleTimeout = 3600):
+    """Start the daemon which runs commands with warm caches.
+
+    Set `START_DAEMON=1` to send commands of `start` to the daemon when it's
+    running, or use the `start-client` command. The output of a background
+    daemon is written to `$START_DATA_DIR/logs/daemon.log`.
+    """
+    from start.core.daemon import LOG_FILE, SOCKET_FILE, Daemon, is_running
+
+    if is_running():
+        Warn(f"Daemon is already running on {SOCKET_FILE}.")
+        return
+    if foreground:
+        Daemon(idle_timeout=idle_timeout).serve()
+        return
+    LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(LOG_FILE, "ab") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "start.core.daemon", str(idle_timeout)],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    # wait until the daemon is listening
+    deadline = time.monotonic() + 30
+    while not is_running():
+        if process.poll() is not None or time.monotonic() > deadline:
+            Error(f"Failed to start the daemon, see {LOG_FILE}")
+            raise Exit(1)
+        time.sleep(0.05)
+    Success(f"Daemon {process.pid} started on {SOCKET_FILE}.")
+
+
+def stop():
+    """Stop the daemon."""
+    from start.client import request
+    from start.core.daemon import SOCKET_FILE
+
+    if request({"command": "stop"}, str(SOCKET_FILE)) is None:
+        Warn("Daemon is not running.")
+        return
+    Success("Daemon stopped.")
+
+
+def status():
+    """Display whether the daemon is running."""
+    from start.client import request
+    from start.core.daemon import SOCKET_FILE
+
+    if not (response := request({"command": "status"}, str(SOCKET_FILE))):
+        Info("Daemon is not running.")
+        raise Exit(1)
+    uptime = time.time() - response["started"]
+    Info(
+        f"Daemon {response['pid']} running on {SOCKET_FILE} for {uptime:.0f}s, "
+        f"{response['commands']} commands served."
+    )
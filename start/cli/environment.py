@@ -1,17 +1,16 @@
 import os
+import time
 from pathlib import Path
-from subprocess import Popen
+from typing import Optional
 
 from typer import Context, Exit
 
 from start.cli import params as _p
-from start.core.config import DEFAULT_ENV
-from start.core.env_builder import ExtEnvBuilder
-from start.logger import Error, Info, Success
-from start.utils import display_activate_cmd, is_env_dir
+from start.core.config import DATA_DIR, DEFAULT_ENV
+from start.logger import Detail, Error, Info, Success, Warn
+from start.utils import display_activate_cmd, exec_in_env, find_env, is_env_dir
 
-# load data directory, read from START_DATA_DIR or $HOME/.start
-_data_dir = Path(os.getenv("START_DATA_DIR", "~/.start")).expanduser().absolute()
+_data_dir = DATA_DIR
 _data_dir.mkdir(exist_ok=True, parents=True)
 
 
@@ -38,13 +37,9 @@ def activate(env_name: _p.EnvName = "."):
     - fish: start env activate <ENV_NAME>| source\n
     - csh/tcsh: eval \\`start env activate <ENV_NAME>\\`\n
     """
-    for base_dir in (_data_dir, Path.cwd()):
-        for env in (".", *DEFAULT_ENV):
-            env_path = base_dir / env_name / env
-            if is_env_dir(env_path):
-                active_cmd = display_activate_cmd(env_path, prompt=False)
-                print(active_cmd)
-                raise Exit(0)
+    if env_path := find_env(env_name, _data_dir):
+        print(display_activate_cmd(env_path, prompt=False))
+        raise Exit(0)
     Error(f"Virtual environment {env_name} not found.")
     raise Exit(1)
 
@@ -59,9 +54,19 @@ def create(
     with_pip: _p.WithPip = True,
     without_upgrade: _p.WithoutUpgrade = False,
     without_system_packages: _p.WithoutSystemPackages = False,
+    from_base: _p.FromBase = "",
+    wheelhouse: _p.Wheelhouse = False,
+    offline: _p.Offline = False,
+    dedupe: _p.Dedupe = False,
 ):
     """Create a virtual environment and install specified packages."""
+    from start.core.env_builder import ExtEnvBuilder
+    from start.core.registry import EnvRegistry
+    from start.core.wheelhouse import get_wheelhouse
 
+    if from_base and not (base_path := find_env(from_base, _data_dir)):
+        Error(f"Base environment {from_base} not found.")
+        raise Exit(1)
     env_path = _data_dir / env_name
     Info(f"Creating virtual environment: {env_name}({env_path})")
     ExtEnvBuilder(
@@ -73,20 +78,189 @@ def create(
         upgrade_core=not without_upgrade,
         system_site_packages=not without_system_packages,
         pip_args=ctx.meta["pip_args"],
+        wheelhouse=get_wheelhouse(wheelhouse, offline),
+        base=base_path if from_base else None,
     ).create(env_path)
+    registry = EnvRegistry(_data_dir)
+    registry.register(env_path)
+    registry.save()
     Success("Finish creating virtual environment.")
+    if dedupe:
+        _dedupe([record["path"] for record in registry.refresh()])
+
+
+def create_many(
+    ctx: Context,
+    env_names: _p.EnvNames = None,
+    manifest: _p.Manifest = "",
+    packages: _p.PackageOption = None,
+    require: _p.Require = "",
+    jobs: _p.Jobs = 0,
+    force: _p.Force = False,
+    with_pip: _p.WithPip = True,
+    without_upgrade: _p.WithoutUpgrade = False,
+    without_system_packages: _p.WithoutSystemPackages = False,
+    from_base: _p.FromBase = "",
+    wheelhouse: _p.Wheelhouse = False,
+    offline: _p.Offline = False,
+    dedupe: _p.Dedupe = False,
+):
+    """Create multiple virtual environments concurrently.
+
+    Environments are given by names, which share the packages and options, or
+    by a manifest file. Outputs of each environment are written to
+    `$START_DATA_DIR/logs/<ENV_NAME>.log`.
+    """
+    from start.core.batch import EnvSpec, create_envs, load_manifest
+    from start.core.registry import EnvRegistry
+    from start.core.wheelhouse import get_wheelhouse
 
+    specs = [EnvSpec(name, list(packages or []), require, from_base) for name in env_names or []]
+    if manifest:
+        if not os.path.isfile(manifest):
+            Error(f"Manifest {manifest} not found.")
+            raise Exit(1)
+        specs.extend(load_manifest(manifest))
+    if not specs:
+        Error("No virtual environment to create, give names or a manifest.")
+        raise Exit(1)
+    names = [spec.name for spec in specs]
+    if duplicated := sorted({name for name in names if names.count(name) > 1}):
+        Error(f"Duplicated virtual environments: {', '.join(duplicated)}")
+        raise Exit(1)
 
-def list_environments():
-    """List all virtual environments."""
+    Info(f"Creating {len(specs)} virtual environments in {_data_dir}")
+    results = create_envs(
+        specs,
+        _data_dir,
+        jobs=jobs,
+        options={
+            "force": force,
+            "with_pip": with_pip,
+            "upgrade_core": not without_upgrade,
+            "system_site_packages": not without_system_packages,
+            "pip_args": ctx.args,
+            "wheelhouse": get_wheelhouse(wheelhouse, offline),
+        },
+    )
+    registry = EnvRegistry(_data_dir)
+    for result in results:
+        if result.success:
+            registry.register(_data_dir / result.name)
+            Success(f"{result.name}: created in {result.duration:.1f}s")
+        else:
+            log = f", see {result.log_file}" if result.log_file else ""
+            Error(f"{result.name}: {result.error}{log}")
+    registry.save()
+    if dedupe:
+        _dedupe([record["path"] for record in registry.refresh()])
+    if failed := sum(not result.success for result in results):
+        Error(f"{failed} of {len(results)} virtual environments failed.")
+        raise Exit(1)
+    Success(f"Finish creating {len(results)} virtual environments.")
 
-    for env in _data_dir.iterdir():
-        if is_env_dir(env):
-            Info(f"{env.name}({env.absolute()})")
 
+def list_environments(details: _p.Details = False):
+    """List all virtual environments.
+
+    Environments are read from the registry in `$START_DATA_DIR/cache/registry.json`,
+    which is refreshed by the changed environments.
+    """
+    from start.core.registry import EnvRegistry
+    from start.core.wheelhouse import format_size
+
+    def format_time(timestamp: float) -> str:
+        return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp)) if timestamp else "never"
+
+    records = EnvRegistry(_data_dir).refresh()
+    for record in records:
+        Info(f"{record['name']}({record['path']})")
+        if details:
+            Detail(
+                f"  python {record['python'] or 'unknown'}, {record['packages']} packages, "
+                f"{format_size(record['size'])}, created {format_time(record['created'])}, "
+                f"last used {format_time(record['last_used'])}"
+            )
+    if details and records:
+        total = format_size(sum(record["size"] for record in records))
+        Info(f"Total: {len(records)} environments, {total}")
 
-def run(commands: list[str], env: _p.VName = ""):
-    """Run a command in the virtual environment."""
+
+def dedupe(
+    env_names: _p.EnvNames = None,
+    reflink: _p.Reflink = False,
+    dry_run: _p.DryRun = False,
+    restore: _p.Restore = False,
+    jobs: _p.HashJobs = 0,
+):
+    """Replace identical files in site-packages of the environments by hardlinks.
+
+    All environments in the data directory are deduplicated if no names are given.
+    Hardlinked files are recorded in `$START_DATA_DIR/cache/dedupe.json`, use
+    `--restore` to copy them back out before modifying files of an environment
+    in place, installing and removing packages by pip is safe.
+    """
+    from start.core.registry import EnvRegistry
+
+    records = EnvRegistry(_data_dir).refresh()
+    if env_names:
+        found = {record["name"]: record["path"] for record in records}
+        paths = []
+        for name in env_names:
+            if not (env_path := found.get(name) or find_env(name, _data_dir)):
+                Error(f"Virtual environment {name} not found.")
+                raise Exit(1)
+            paths.append(str(env_path))
+    else:
+        paths = [record["path"] for record in records]
+    if restore:
+        from start.core.dedupe import Deduplicator
+        from start.core.registry import site_packages_dir
+
+        roots = [root for path in paths if (root := site_packages_dir(Path(path)))]
+        count = Deduplicator(_data_dir / "cache").restore(roots)
+        Success(f"Restored {count} hardlinked files.")
+        return
+    _dedupe(paths, reflink, dry_run, jobs)
+
+
+def _dedupe(paths: list[str], reflink: bool = False, dry_run: bool = False, jobs: int = 0):
+    """Deduplicate site-packages of the environments and display the result."""
+    from start.core.dedupe import Deduplicator
+    from start.core.registry import site_packages_dir
+    from start.core.wheelhouse import format_size
+
+    roots = [root for path in paths if (root := site_packages_dir(Path(path)))]
+    Info(f"Deduplicating files of {len(roots)} environments")
+    result = Deduplicator(_data_dir / "cache", jobs=jobs).dedupe(roots, reflink, dry_run)
+    if dry_run:
+        Info(
+            f"Found {result.groups} groups of identical files, "
+            f"{result.files} files can be linked to save {format_size(result.saved)}."
+        )
+        return
+    if result.skipped:
+        Warn(f"Skipped {result.skipped} files which changed or failed to link.")
+    Success(f"Linked {result.files} files, saved {format_size(result.saved)}.")
+
+
+def _find_in_data_dir(env_name: str) -> Optional[Path]:
+    """Find the environment in the registry, then the data directory."""
+    from start.core.registry import EnvRegistry
+
+    if env_path := EnvRegistry(_data_dir).lookup(env_name):
+        return env_path
+    return env_path if is_env_dir(env_path := _data_dir / env_name) else None
+
+
+def run(commands: list[str], env: _p.VName = "", direct: _p.Direct = False):
+    """Run a command in the virtual environment.
+
+    By default the command is joined and run after the activate script by
+    `$SHELL`, so shell syntax like pipes and redirections can be used. With
+    `--direct` the environment variables are set in process and the command is
+    executed without a shell, arguments are passed as is.
+    """
     if not env:
         # default to find environment in current directory
         for env in DEFAULT_ENV:
@@ -100,19 +274,27 @@ def run(commands: list[str], env: _p.VName = ""):
             raise Exit(1)
     # find environment in with specified name, or in data directory
     # env_path will be the first found path
-    elif not (is_env_dir(env_path := env) or is_env_dir(env_path := _data_dir / env)):
+    elif not (is_env_dir(env_path := env) or (env_path := _find_in_data_dir(env))):
         Error(
             f"Virtual environment {env} not found. Use 'start env create' to create a new environment."
         )
         raise Exit(1)
 
+    # there is no shell to run the activate script in containers without SHELL
+    if direct or (os.name != "nt" and not os.getenv("SHELL")):
+        try:
+            raise Exit(exec_in_env(env_path, commands))
+        except FileNotFoundError:
+            Error(f"Command {commands[0]} not found.")
+            raise Exit(127)
+
     active_cmd = display_activate_cmd(env_path, prompt=False)
     cmd = f"{active_cmd} && {' '.join(commands)}"
     if os.name == "nt":
+        from subprocess import Popen
+
         with Popen(["powershell.exe", "-c", cmd]) as proc:
             proc.communicate()
     else:
-        if not (shell := os.getenv("SHELL")):
-            Error("Unknown shell to run command.")
-            raise Exit(1)
+        shell = os.environ["SHELL"]
         os.execvp(shell, [shell, "-c", cmd])
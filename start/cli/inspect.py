@@ -1,28 +1,48 @@
+import sys
 from os import sep
 
 from typer import Exit
 
 from start.cli import params as _p
-from start.core.dependency import DependencyManager
-from start.core.pip_manager import PipManager
 from start.logger import Detail, Error, Info, Success, Warn
 from start.utils import ensure_path
 
 
 def show(packages: _p.Packages):
     """Show information about installed packages."""
-    pip = PipManager()
-    pip.execute(["show", *(packages or [])])
-    if pip.stdout:
-        Detail("\n".join(pip.stdout))
-    if pip.stderr:
-        Error("\n".join(pip.stderr))
+    from start.core.metadata import EnvMetadata
+
+    metadata = EnvMetadata()
+    infos, not_found = [], []
+    for package in packages or []:
+        if info := metadata.show(package):
+            infos.append("\n".join(f"{field}: {value}" for field, value in info.items()))
+        else:
+            not_found.append(package)
+    if infos:
+        Detail("\n---\n".join(infos))
+    if not_found:
+        Error("Package(s) not found: " + ", ".join(not_found))
 
 
-def list_packages(tree: _p.Tree = False, group: _p.Group = "", dependency: _p.Dependency = ""):
+def list_packages(
+    tree: _p.Tree = False,
+    group: _p.Group = "",
+    dependency: _p.Dependency = "",
+    depth: _p.Depth = None,
+    reverse: _p.Reverse = False,
+    output_format: _p.OutputFormat = _p.TreeFormat.text,
+):
     """Display all installed packages."""
+    from packaging.utils import canonicalize_name
+
+    from start.core.dependency import DependencyManager
+    from start.core.metadata import EnvMetadata
+    from start.core.pip_manager import PipManager
+    from start.core.tree import REPEATED, DependencyTree
 
     pip = PipManager()
+    metadata = EnvMetadata(pip.execu)
 
     status = ""
     if dependency:
@@ -31,29 +51,41 @@ def list_packages(tree: _p.Tree = False, group: _p.Group = "", dependency: _p.De
             raise Exit(1)
         status = f"({group}-Dependencies)" if group else "(Dependencies)"
         dm = DependencyManager(config_path)
-        packages = [dep.name for dep in dm.packages(group)]
+        packages = [canonicalize_name(dep.name) for dep in dm.packages(group)]
     else:
-        packages = pip.execute(["list"]).parse_list_output()
+        packages = metadata.packages()
 
     if not packages:
         Warn("No packages found")
         raise Exit(1)
 
-    if not tree:
+    if not tree and output_format == _p.TreeFormat.text:
         Info(f"Installed{status} packages:")
         Detail("\n".join("- " + package for package in packages))
         raise Exit(0)
 
-    analyzed_packages = pip.analyze_packages_require(*packages)
-    Success("Analysis for installed packages:")
+    # only the requirements of declared packages are displayed for dependency file
+    graph = metadata.graph.restrict(packages) if dependency else metadata.graph
+    dependency_tree = DependencyTree(graph)
+    if reverse:
+        dependency_tree = dependency_tree.reverse()
+    if output_format == _p.TreeFormat.json:
+        dependency_tree.write_json(sys.stdout, depth)
+        return
+    if output_format == _p.TreeFormat.dot:
+        for line in dependency_tree.iter_dot(depth):
+            print(line)
+        return
 
+    Success("Analysis for installed packages:")
     Info(pip.execu.split(sep)[-4] + status if sep in pip.execu else pip.execu)
 
     installed_packages = set(packages)
-    for i, package in enumerate(analyzed_packages):
-        name, dependencies = list(package.items())[0]
-        for branch, tree_string in pip.generate_dependency_tree(
-            name, dependencies, i == len(analyzed_packages) - 1
-        ):
-            Status = Detail if branch in installed_packages else Warn
-            Detail(tree_string + Status(branch, display=False))
+    repeated = False
+    # lines are printed once rendered, so large trees are displayed progressively
+    for line in dependency_tree.render(depth):
+        Status = Detail if line.name in installed_packages else Warn
+        Detail(line.prefix + Status(line.name, display=False) + line.marker)
+        repeated = repeated or line.marker == REPEATED
+    if repeated:
+        Info(f"{REPEATED.strip()} requirements of the package are displayed above")
@@ -1,10 +1,14 @@
-from typing import Literal
+from typing import TYPE_CHECKING, Literal, Optional
 
 from typer import Context
 
 from start.cli import params as _p
-from start.core.dependency import DependencyManager
-from start.core.pip_manager import PipManager
+from start.logger import Info
+
+if TYPE_CHECKING:
+    from start.core.dependency import DependencyManager
+    from start.core.pip_manager import PipManager
+    from start.core.wheelhouse import Wheelhouse
 
 
 def _modify(
@@ -14,13 +18,40 @@ def _modify(
     dependency: str = "pyproject.toml",
     verbose: bool = False,
     pip_args: list[str] = [],
+    wheelhouse: Optional["Wheelhouse"] = None,
+    prune: bool = False,
 ):
+    from start.core.dependency import DependencyManager
+    from start.core.pip_manager import PipManager
+
     dm = DependencyManager(dependency)
-    pip = PipManager(verbose=verbose)
+    pip = PipManager(verbose=verbose, wheelhouse=wheelhouse)
+    # requirements of the removed packages are unknown after uninstalling them
+    prunable = _prunable(dm, pip, packages) if prune else []
     operate = pip.install if method == "add" else pip.uninstall
     result = operate(*packages, pip_args=pip_args)
     if result:
         dm.modify_dependencies(method=method, packages=result, group=group, save=True)
+    if result and prunable:
+        Info("Uninstall packages no longer required: " + ", ".join(prunable))
+        pip.uninstall(*prunable, pip_args=pip_args)
+
+
+def _prunable(dm: "DependencyManager", pip: "PipManager", packages: tuple) -> list[str]:
+    """Installed packages only required by the packages to remove, packages
+    declared in any group of the dependency file are kept."""
+    from start.core.dependency import Dependency
+    from start.core.metadata import EnvMetadata
+
+    metadata = EnvMetadata(pip.execu)
+    removed = {Dependency(package).key for package in packages}
+    groups = ["", *dm.project.get("optional-dependencies", {})]
+    declared = [dep.key for group in groups for dep in dm.packages(group)]
+    return [
+        name
+        for name in metadata.graph.prunable(removed, keep=set(declared) - removed)
+        if name in metadata.installed
+    ]
 
 
 def add(
@@ -29,8 +60,11 @@ def add(
     group: _p.Group = "",
     dependency: _p.Dependency = "pyproject.toml",
     verbose: _p.Verbose = False,
+    wheelhouse: _p.Wheelhouse = False,
+    offline: _p.Offline = False,
 ):
     """Install packages and add to the dependency file."""
+    from start.core.wheelhouse import get_wheelhouse
 
     _modify(
         *packages or [],
@@ -39,6 +73,7 @@ def add(
         dependency=dependency,
         verbose=verbose,
         pip_args=ctx.meta["pip_args"],
+        wheelhouse=get_wheelhouse(wheelhouse, offline),
     )
 
 
@@ -48,6 +83,7 @@ def remove(
     group: _p.Group = "",
     dependency: _p.Dependency = "pyproject.toml",
     verbose: _p.Verbose = False,
+    prune: _p.Prune = False,
 ):
     """Uninstall packages and remove from the dependency file."""
 
@@ -58,4 +94,5 @@ def remove(
         dependency=dependency,
         verbose=verbose,
         pip_args=ctx.meta["pip_args"],
+        prune=prune,
     )
@@ -1,8 +1,25 @@
+from enum import Enum
 from typing import Annotated, Optional
 
 from typer import Argument, Context, Option
 
 
+class TreeFormat(str, Enum):
+    text = "text"
+    json = "json"
+    dot = "dot"
+
+
+class TraceFormat(str, Enum):
+    json = "json"
+    chrome = "chrome"
+
+
+class InstallerBackend(str, Enum):
+    auto = "auto"
+    pip = "pip"
+
+
 def correct_extra_args(ctx: Context, packages: list[str]):
     """Due to packages cost all the extra args, we need to separate them."""
     ctx.meta.setdefault("pip_args", [])
@@ -16,6 +33,22 @@ def correct_extra_args(ctx: Context, packages: list[str]):
     return packages
 
 
+Dedupe = Annotated[
+    bool,
+    Option(
+        "--dedupe",
+        help="Hardlink files identical to other environments after creating, see 'start env dedupe'",
+        envvar="START_DEDUPE",
+    ),
+]
+Details = Annotated[
+    bool,
+    Option("--details", help="Display python version, packages, size and usage of environments"),
+]
+Depth = Annotated[
+    Optional[int],
+    Option("--depth", help="Max depth of the dependency tree to display", show_default=False),
+]
 Dependency = Annotated[
     str,
     Option(
@@ -27,22 +60,143 @@ Dependency = Annotated[
         "If not given, start will find 'pyproject.toml' and 'requirements.txt'",
     ),
 ]
+Foreground = Annotated[
+    bool, Option("--foreground", help="Run in the foreground instead of in the background")
+]
+FromBase = Annotated[
+    str,
+    Option(
+        "--from-base",
+        help="Clone packages from an existing virtual environment instead of "
+        "installing pip and core packages from scratch",
+        show_default=False,
+    ),
+]
 Group = Annotated[str, Option("-g", "--group", help="Specify group of dependencies to operate")]
+Direct = Annotated[
+    bool,
+    Option(
+        "--direct",
+        help="Set the environment variables in process and execute the command without a shell",
+        envvar="START_RUN_DIRECT",
+    ),
+]
+DryRun = Annotated[bool, Option("--dry-run", help="Only display what would be done")]
 EnvName = Annotated[str, Argument(help="Name of the virtual environment", show_default=False)]
+EnvNames = Annotated[
+    Optional[list[str]],
+    Argument(help="Names of the virtual environments", show_default=False),
+]
 Force = Annotated[
     bool,
     Option("-f", "--force", help="Remove the existing virtual environment if it exists"),
 ]
+HashJobs = Annotated[
+    int, Option("-j", "--jobs", help="Number of threads to hash files, 0 for cpu count")
+]
+IdleTimeout = Annotated[
+    float,
+    Option("--idle-timeout", help="Seconds to exit after the last command, 0 to never exit"),
+]
+Installer = Annotated[
+    InstallerBackend,
+    Option(
+        "--installer",
+        help="Installer of the locked packages, auto installs the wheels cached in the "
+        "wheelhouse in process and the others by pip",
+        envvar="START_INSTALLER",
+    ),
+]
+Jobs = Annotated[
+    int,
+    Option(
+        "-j", "--jobs", help="Max number of environments to create concurrently, 0 for cpu count"
+    ),
+]
+Manifest = Annotated[
+    str,
+    Option(
+        "-m",
+        "--manifest",
+        help="Toml file of environments to create, each '[envs.<name>]' table "
+        "can set 'packages', 'require' and 'from-base'",
+        show_default=False,
+    ),
+]
+MaxSize = Annotated[
+    str,
+    Option(
+        "-s",
+        "--max-size",
+        help="Max size of the wheelhouse, e.g. 500M, 5G. Default to $START_WHEELHOUSE_SIZE or 5G",
+        show_default=False,
+    ),
+]
+NoLock = Annotated[
+    bool, Option("--no-lock", help="Ignore start.lock and resolve the declared dependencies")
+]
+Offline = Annotated[
+    bool,
+    Option(
+        "--offline",
+        help="Install packages only from the wheelhouse, implies --wheelhouse, "
+        "and use the cached remote templates without fetching",
+    ),
+]
+OutputFormat = Annotated[
+    TreeFormat,
+    Option(
+        "--format", help="Output format of the dependency tree, json and dot are for other tools"
+    ),
+]
+PackageOption = Annotated[
+    Optional[list[str]],
+    Option("-p", "--package", help="Package to install, can be used multiple times"),
+]
 Packages = Annotated[
     Optional[list[str]],
     Argument(
         help="Packages to install or display", show_default=False, callback=correct_extra_args
     ),
 ]
+Profile = Annotated[
+    bool,
+    Option(
+        "--profile",
+        help="Display the time, started subprocesses and written bytes of each phase "
+        "after the command",
+    ),
+]
+Prune = Annotated[
+    bool,
+    Option(
+        "--prune",
+        help="Uninstall the packages which are only required by the removed packages "
+        "and not declared in the dependency file",
+    ),
+]
 ProjectName = Annotated[str, Argument(help="Name of the project", show_default=False)]
+Reflink = Annotated[
+    bool,
+    Option(
+        "--reflink",
+        help="Clone files by copy-on-write instead of hardlinks, the file system must support it",
+    ),
+]
 Require = Annotated[
     str, Option("-r", "--require", help="Dependency file name. Toml file or plain text file")
 ]
+Restore = Annotated[
+    bool,
+    Option(
+        "--restore",
+        help="Copy the hardlinked files of the environments back out, so they can be modified",
+    ),
+]
+Reverse = Annotated[
+    bool,
+    Option("--reverse", help="Display the packages which require each package in the tree"),
+]
 Template = Annotated[
     str,
     Option(
@@ -52,11 +206,36 @@ Template = Annotated[
         show_default=False,
     ),
 ]
+TraceFile = Annotated[
+    str,
+    Option(
+        "--trace",
+        help="Write the phase timings of the command to the file",
+        envvar="START_TRACE",
+        show_default=False,
+    ),
+]
+TraceFileFormat = Annotated[
+    TraceFormat,
+    Option(
+        "--trace-format",
+        help="Format of the trace file, chrome is for chrome://tracing and Perfetto",
+        envvar="START_TRACE_FORMAT",
+    ),
+]
 Tree = Annotated[
     bool, Option("-t", "--tree", help="Display installed packages in a tree structure")
 ]
 VName = Annotated[str, Option("-n", "--vname", help="Name of the virtual environment")]
 Verbose = Annotated[bool, Option("-v", "--verbose", help="Display install details")]
+Wheelhouse = Annotated[
+    bool,
+    Option(
+        "--wheelhouse/--no-wheelhouse",
+        help="Save wheels to and install packages from the shared wheelhouse in $START_DATA_DIR/wheels",
+        envvar="START_WHEELHOUSE",
+    ),
+]
 WithPip = Annotated[
     bool, Option("--with-pip/--without-pip", help="Install pip in the virtual environment")
 ]
@@ -74,3 +253,11 @@ WithoutSystemPackages = Annotated[
         help="Don't give the virtual environment access to system packages",
     ),
 ]
+Workspace = Annotated[
+    bool,
+    Option(
+        "--workspace",
+        help="Install all members of the workspace in [tool.start.workspace] of the root config "
+        "found in the current or parent directories, or specified by -r",
+    ),
+]
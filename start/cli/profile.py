@@ -0,0 +1,40 @@
+import sys
+
+from typer import Context, Exit
+
+from start.cli import params as _p
+
+
+def profile(
+    ctx: Context,
+    profile: _p.Profile = False,
+    trace_file: _p.TraceFile = "",
+    trace_format: _p.TraceFileFormat = _p.TraceFormat.json,
+):
+    """Record the phases of the command if --profile or --trace is given, the
+    trace is displayed or saved after the command, even if it failed.
+
+    Commands which must run in the client are refused in the daemon, which
+    passes `{"daemon": True}` as the context object.
+    """
+    if ctx.obj and ctx.obj.get("daemon"):
+        from start.client import LOCAL_COMMANDS
+
+        if ctx.invoked_subcommand in LOCAL_COMMANDS:
+            ctx.obj["local"] = True
+            raise Exit(0)
+    if not (profile or trace_file):
+        return
+    from start.core import trace
+
+    trace.enable(" ".join(["start", *sys.argv[1:]]))
+
+    def finish():
+        if not (tracer := trace.disable()):
+            return
+        if trace_file:
+            tracer.save(trace_file, trace_format.value)
+        if profile:
+            print(tracer.summary(), file=sys.stderr)
+
+    ctx.call_on_close(finish)
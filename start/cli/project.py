@@ -1,15 +1,16 @@
 from os import path
+from pathlib import Path
+from typing import TYPE_CHECKING, List
 
 from typer import Context, Exit
 
 from start.cli import params as _p
-from start.core.dependency import DependencyManager
-from start.core.env_builder import ExtEnvBuilder
-from start.core.pip_manager import PipManager
-from start.core.template import Template
-from start.logger import Error, Info, Success
+from start.logger import Error, Info, Success, Warn
 from start.utils import ensure_path
 
+if TYPE_CHECKING:
+    from start.core.pip_manager import PipManager
+
 
 def new(
     ctx: Context,
@@ -23,12 +24,18 @@ def new(
     with_pip: _p.WithPip = True,
     without_upgrade: _p.WithoutUpgrade = False,
     without_system_packages: _p.WithoutSystemPackages = False,
+    wheelhouse: _p.Wheelhouse = False,
+    offline: _p.Offline = False,
 ):
     """Create a new project and virtual environment, install the specified packages."""
+    from start.core.dependency import DependencyManager
+    from start.core.env_builder import ExtEnvBuilder
+    from start.core.template import Template
+    from start.core.wheelhouse import get_wheelhouse
 
     Info(f"Start {'creating' if project_name != '.' else 'initializing'} project: {project_name}")
     # Create project directory from template
-    Template(project_name=project_name, template_name=template).create()
+    Template(project_name=project_name, template_name=template, offline=offline).create()
     # Create virtual environment
     ExtEnvBuilder(
         packages=packages,
@@ -39,6 +46,7 @@ def new(
         upgrade_core=not without_upgrade,
         system_site_packages=not without_system_packages,
         pip_args=ctx.args,
+        wheelhouse=get_wheelhouse(wheelhouse, offline),
     ).create(path.join(project_name, vname))
     Success("Finish creating virtual environment.")
     # modify dependencies in pyproject.toml
@@ -57,6 +65,8 @@ def init(
     with_pip: _p.WithPip = True,
     without_upgrade: _p.WithoutUpgrade = False,
     without_system_packages: _p.WithoutSystemPackages = False,
+    wheelhouse: _p.Wheelhouse = False,
+    offline: _p.Offline = False,
 ):
     """Use current directory as the project name and create a new project at the current directory."""
 
@@ -72,18 +82,131 @@ def init(
         with_pip=with_pip,
         without_upgrade=without_upgrade,
         without_system_packages=without_system_packages,
+        wheelhouse=wheelhouse,
+        offline=offline,
     )
 
 
-def install(ctx: Context, require: _p.Require = "", verbose: _p.Verbose = False):
-    """Install packages in specified dependency file."""
+# pip install options which reinstall the satisfied requirements
+REINSTALL_ARGS = ("-U", "--upgrade", "--force-reinstall", "-I", "--ignore-installed")
+
 
+def _dependency_file(require: str) -> str | Path:
+    """Dependency file specified by user, or find pyproject.toml and requirements.txt."""
     if require:
-        packages = DependencyManager(require).packages()
-    elif file := (ensure_path("pyproject.toml") or ensure_path("requirements.txt")):
-        packages = DependencyManager(file).packages()
-    else:
-        Error("No dependency file found")
+        return require
+    if file := (ensure_path("pyproject.toml") or ensure_path("requirements.txt")):
+        return file
+    Error("No dependency file found")
+    raise Exit(1)
+
+
+def install(
+    ctx: Context,
+    require: _p.Require = "",
+    verbose: _p.Verbose = False,
+    wheelhouse: _p.Wheelhouse = False,
+    offline: _p.Offline = False,
+    no_lock: _p.NoLock = False,
+    workspace: _p.Workspace = False,
+    installer: _p.Installer = _p.InstallerBackend.auto,
+):
+    """Install packages in specified dependency file.
+
+    If start.lock exists next to the dependency file and is up to date, the
+    pinned packages will be installed without resolving dependencies, the
+    wheels cached in the wheelhouse are installed without running pip.
+    With --workspace, dependencies of all members are merged and installed
+    with the editable members in a single pip call.
+    """
+    from start.core.dependency import DependencyManager
+    from start.core.installer import install_locked
+    from start.core.lock import find_lockfile
+    from start.core.metadata import EnvMetadata
+    from start.core.pip_manager import PipManager
+    from start.core.requirements import constraint_args
+    from start.core.wheelhouse import Wheelhouse, get_wheelhouse
+
+    if workspace:
+        pip = PipManager(verbose=verbose, wheelhouse=get_wheelhouse(wheelhouse, offline))
+        return _install_workspace(require, pip, ctx.args)
+
+    config_file = _dependency_file(require)
+    dm = DependencyManager(config_file)
+    # options in requirements file go first, so they can be overridden by user
+    pip_args = [*dm.pip_options, *ctx.args]
+    cache = get_wheelhouse(wheelhouse, offline)
+    pip = PipManager(verbose=verbose, wheelhouse=cache)
+    metadata = EnvMetadata(pip.execu)
+    # satisfied requirements are skipped unless user asks pip to reinstall them
+    reinstall = any(arg in REINSTALL_ARGS for arg in ctx.args)
+
+    if not no_lock and (lockfile := find_lockfile(Path(config_file))):
+        if lockfile.is_fresh(dm, metadata.marker_environment):
+            requirements = lockfile.requirements(skip=None if reinstall else metadata.is_satisfied)
+            if not requirements:
+                Success("All locked packages are already installed.")
+            elif not install_locked(
+                pip, requirements, pip_args, installer.value, cache or Wheelhouse()
+            ):
+                raise Exit(1)
+            return
+        Warn(f"{lockfile.path} is outdated, run 'start lock' to update it.")
+
+    packages = [str(dep) for dep in dm.packages()]
+    if not reinstall:
+        packages = [package for package in packages if not metadata.is_satisfied(package)]
+    if not packages:
+        Success("All requirements are already satisfied.")
+        return
+    with constraint_args(dm.constraints) as constraints:
+        pip.install(*packages, pip_args=[*constraints, *pip_args])
+
+
+def _install_workspace(require: str, pip: "PipManager", pip_args: List[str]):
+    """Install the merged dependencies and editable members of the workspace,
+    conflicting requirements are reported before running pip."""
+    from start.core.metadata import EnvMetadata
+    from start.core.workspace import Workspace, find_workspace, is_editable_install
+
+    if not (root_config := Path(require) if require else find_workspace()):
+        Error("No [tool.start.workspace] found in pyproject.toml of current or parent directories")
+        raise Exit(1)
+    workspace = Workspace(root_config)
+    if not workspace.members:
+        Error(f"No workspace members found in {root_config}")
+        raise Exit(1)
+    metadata = EnvMetadata(pip.execu)
+    requirements = workspace.requirements(metadata.marker_environment)
+    if conflicts := workspace.conflicts(requirements):
+        for requirement in conflicts:
+            Error(f"Conflicting requirements of {requirement.name}: {requirement.describe()}")
+        raise Exit(1)
+    Info(f"Workspace members: {', '.join(member.name for member in workspace.members)}")
+
+    reinstall = any(arg in REINSTALL_ARGS for arg in pip_args)
+    packages = [str(requirement) for requirement in requirements]
+    members = workspace.members
+    if not reinstall:
+        packages = [package for package in packages if not metadata.is_satisfied(package)]
+        members = [member for member in members if not is_editable_install(metadata, member)]
+    editable = [str(member.path) for member in members]
+    if not packages and not editable:
+        Success("All requirements are already satisfied.")
+        return
+    pip.install(*packages, pip_args=list(pip_args), editable=editable)
+
+
+def lock(ctx: Context, require: _p.Require = "", verbose: _p.Verbose = False):
+    """Resolve dependencies of all groups and pin them in start.lock."""
+    from start.core.dependency import DependencyManager
+    from start.core.lock import Lockfile
+    from start.core.pip_manager import PipManager
+
+    config_file = _dependency_file(require)
+    lockfile = Lockfile.for_config(config_file)
+    if not lockfile.lock(DependencyManager(config_file), PipManager(verbose=verbose), ctx.args):
         raise Exit(1)
-    packages = [str(dep) for dep in packages]
-    PipManager(verbose=verbose).install(*packages, pip_args=ctx.args)
+    lockfile.save()
+    total = sum(len(packages) for packages in lockfile.groups.values())
+    Success(f"Locked {total} packages of {len(lockfile.groups)} groups in {lockfile.path}")
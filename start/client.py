@@ -0,0 +1,135 @@
+"""Thin client of the start daemon.
+
+The client sends its arguments, working directory and environment variables to
+the daemon with its stdin, stdout and stderr, so the command writes to the
+terminal of the client directly. Only the standard library is imported here,
+the client falls back to running the command itself if the daemon isn't running.
+"""
+
+import json
+import os
+import socket
+import sys
+from typing import List, Optional, Sequence, Tuple
+
+# commands replacing the process or managing the daemon, they always run in the client
+LOCAL_COMMANDS = ("run", "daemon")
+# options of start before the subcommand, and whether they take a value
+GLOBAL_OPTIONS = {"--profile": False, "--trace": True, "--trace-format": True}
+# length of a message is sent before it
+HEADER_SIZE = 4
+BUFFER_SIZE = 64 * 1024
+
+
+def socket_path() -> str:
+    """Path of the daemon socket in the data directory, same as `start.core.config.DATA_DIR`."""
+    data_dir = os.path.abspath(os.path.expanduser(os.getenv("START_DATA_DIR", "~/.start")))
+    return os.path.join(data_dir, "daemon.sock")
+
+
+def subcommand(argv: Sequence[str]) -> Optional[str]:
+    """The subcommand after the global options, None if there isn't any."""
+    index = 0
+    while index < len(argv):
+        option, has_value, _ = argv[index].partition("=")
+        if option not in GLOBAL_OPTIONS:
+            return None if option.startswith("-") else argv[index]
+        index += 2 if GLOBAL_OPTIONS[option] and not has_value else 1
+    return None
+
+
+def is_local(argv: Sequence[str]) -> bool:
+    """Whether the command must run in the client instead of the daemon."""
+    return subcommand(argv) in LOCAL_COMMANDS
+
+
+def send_message(sock: socket.socket, message: dict, fds: Sequence[int] = ()):
+    """Send the message as json after its length, the file descriptors are sent
+    with the first bytes."""
+    payload = json.dumps(message).encode("utf-8")
+    data = len(payload).to_bytes(HEADER_SIZE, "big") + payload
+    sent = socket.send_fds(sock, [data], list(fds)) if fds else 0
+    sock.sendall(data[sent:])
+
+
+def recv_message(sock: socket.socket, max_fds: int = 0) -> Tuple[dict, List[int]]:
+    """Receive a message and the file descriptors sent with it.
+
+    Raises:
+        ConnectionError: The connection is closed before the message is received
+    """
+    if max_fds:
+        data, fds, _, _ = socket.recv_fds(sock, BUFFER_SIZE, max_fds)
+    else:
+        data, fds = sock.recv(BUFFER_SIZE), []
+    while len(data) < HEADER_SIZE or len(data) < HEADER_SIZE + int.from_bytes(
+        data[:HEADER_SIZE], "big"
+    ):
+        if not (chunk := sock.recv(BUFFER_SIZE)):
+            for fd in fds:
+                os.close(fd)
+            raise ConnectionError("connection closed before the message is received")
+        data += chunk
+    return json.loads(data[HEADER_SIZE:]), fds
+
+
+def connect(path: Optional[str] = None) -> Optional[socket.socket]:
+    """Connect to the daemon, None if it's not running or not supported."""
+    if not hasattr(socket, "send_fds"):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path or socket_path())
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def request(message: dict, path: Optional[str] = None) -> Optional[dict]:
+    """Send a control message like `{"command": "stop"}` to the daemon, return
+    the response, None if the daemon isn't running."""
+    if not (sock := connect(path)):
+        return None
+    with sock:
+        send_message(sock, message)
+        try:
+            return recv_message(sock)[0]
+        except ConnectionError:
+            return None
+
+
+def forward(argv: List[str], path: Optional[str] = None) -> Optional[int]:
+    """Run the command by the daemon.
+
+    Returns:
+        The exit code of the command, None if the daemon isn't running or
+        refused to run the command
+    """
+    if not (sock := connect(path)):
+        return None
+    with sock:
+        for stream in (sys.stdout, sys.stderr):
+            stream.flush()
+        message = {"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}
+        send_message(sock, message, fds=(0, 1, 2))
+        try:
+            response = recv_message(sock)[0]
+            return None if response.get("local") else int(response["exit"])
+        except (ConnectionError, KeyError, ValueError):
+            print("The start daemon stopped while running the command.", file=sys.stderr)
+            return 1
+
+
+def main():
+    """Entry of the client, run the command by the daemon if it's running."""
+    argv = sys.argv[1:]
+    if is_local(argv) or (code := forward(argv)) is None:
+        from start.__main__ import main as start_main
+
+        return start_main(use_daemon=False)
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import rtoml
+
+from start.core.config import DATA_DIR
+
+LOG_DIR = DATA_DIR / "logs"
+
+
+@dataclass
+class EnvSpec:
+    """An environment to create in a batch.
+
+    Args:
+        name: Name of the environment, created in the data directory
+        packages: Packages to install after the environment is created
+        require: Dependency file to install
+        from_base: Name or path of the base environment to clone
+    """
+
+    name: str
+    packages: List[str] = field(default_factory=list)
+    require: str = ""
+    from_base: str = ""
+
+
+@dataclass
+class EnvResult:
+    """Result of creating an environment in a batch."""
+
+    name: str
+    success: bool
+    duration: float = 0.0
+    log_file: str = ""
+    error: str = ""
+
+
+def load_manifest(path: str | Path) -> List[EnvSpec]:
+    """Load the environments from a toml manifest, e.g.
+
+    ```toml
+    [envs.py311-test]
+    packages = ["pytest"]
+    require = "requirements.txt"
+    from-base = "base"
+    ```
+
+    Relative dependency files are resolved from the directory of the manifest.
+    """
+    path = Path(path)
+    specs = []
+    for name, config in rtoml.load(path).get("envs", {}).items():
+        require = config.get("require", "")
+        if require and not Path(require).is_absolute():
+            require = str(path.parent.absolute() / require)
+        specs.append(
+            EnvSpec(
+                name=name,
+                packages=list(config.get("packages", [])),
+                require=require,
+                from_base=config.get("from-base", ""),
+            )
+        )
+    return specs
+
+
+@contextmanager
+def redirect_output(log_file: Path):
+    """Redirect stdout and stderr of the process, including the subprocesses,
+    into the log file, so concurrent builds don't mix their outputs.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = os.dup(1), os.dup(2)
+    with log_file.open("w", encoding="utf-8", buffering=1) as f:
+        os.dup2(f.fileno(), 1)
+        os.dup2(f.fileno(), 2)
+        try:
+            with redirect_stdout(f), redirect_stderr(f):
+                yield
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+
+
+def create_env(
+    spec: EnvSpec, data_dir: Path, base: Optional[Path], log_dir: Path, options: Dict
+) -> EnvResult:
+    """Create an environment in a worker process, outputs are written to its log file.
+
+    Args:
+        spec: Environment to create
+        data_dir: Directory to create the environment in
+        base: Path of the base environment to clone
+        log_dir: Directory to write the log file
+        options: Other arguments of ExtEnvBuilder
+    """
+    from typer import Exit
+
+    from start.core.env_builder import ExtEnvBuilder
+
+    log_dir.mkdir(parents=True, exist_ok=True)
+    log_file = log_dir / f"{spec.name}.log"
+    start, error = time.perf_counter(), ""
+    with redirect_output(log_file):
+        try:
+            builder = ExtEnvBuilder(
+                packages=list(spec.packages),
+                require=spec.require,
+                base=base,
+                display_activate=False,
+                **options,
+            )
+            builder.create(data_dir / spec.name)
+            if not builder.installed:
+                error = "failed to install packages"
+        except Exit:
+            error = "failed to create environment"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    return EnvResult(
+        name=spec.name,
+        success=not error,
+        duration=time.perf_counter() - start,
+        log_file=str(log_file),
+        error=error,
+    )
+
+
+def create_envs(
+    specs: List[EnvSpec],
+    data_dir: Path,
+    jobs: int = 0,
+    options: Optional[Dict[str, Any]] = None,
+    log_dir: Optional[Path] = None,
+) -> List[EnvResult]:
+    """Create environments concurrently by a process pool and display the progress.
+    An environment cloned from another environment in the batch waits for it.
+
+    Args:
+        specs: Environments to create
+        data_dir: Directory to create the environments in
+        jobs: Max number of concurrent builds, default to the cpu count
+        options: Other arguments of ExtEnvBuilder shared by all environments
+        log_dir: Directory to write the log files, default to $START_DATA_DIR/logs
+    Returns:
+        results: Results of the environments in the order of specs
+    """
+    from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn, TimeElapsedColumn
+
+    from start.utils import find_env
+
+    options = options or {}
+    log_dir = log_dir or LOG_DIR
+    names = {spec.name for spec in specs}
+    results: Dict[str, EnvResult] = {}
+    pending = list(specs)
+    running: Dict[Future, str] = {}
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(specs)))
+
+    columns = (
+        TextColumn("{task.description}"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TimeElapsedColumn(),
+    )
+    with ProcessPoolExecutor(max_workers=jobs) as executor, Progress(*columns) as progress:
+        task = progress.add_task("Creating environments", total=len(specs))
+
+        def submit_ready():
+            for spec in list(pending):
+                if spec.from_base in names and spec.from_base not in results:
+                    continue
+                pending.remove(spec)
+                if spec.from_base in names and not results[spec.from_base].success:
+                    results[spec.name] = EnvResult(
+                        spec.name, False, error=f"base environment {spec.from_base} failed"
+                    )
+                    progress.advance(task)
+                    continue
+                base = None
+                if spec.from_base and not (base := find_env(spec.from_base, data_dir)):
+                    results[spec.name] = EnvResult(
+                        spec.name, False, error=f"base environment {spec.from_base} not found"
+                    )
+                    progress.advance(task)
+                    continue
+                future = executor.submit(create_env, spec, data_dir, base, log_dir, options)
+                running[future] = spec.name
+
+        submit_ready()
+        while running:
+            progress.update(task, description=f"Creating: {', '.join(sorted(running.values()))}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    # the worker process died, e.g. killed by signal
+                    results[name] = EnvResult(name, False, error=f"{type(e).__name__}: {e}")
+                progress.advance(task)
+            submit_ready()
+        for spec in pending:
+            # the base environments depend on each other
+            results[spec.name] = EnvResult(spec.name, False, error="circular base environment")
+            progress.advance(task)
+        progress.update(task, description="Created environments")
+    return [results[spec.name] for spec in specs]
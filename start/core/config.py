@@ -1,3 +1,8 @@
+import os
+from pathlib import Path
+
+# Data directory of start, read from START_DATA_DIR or $HOME/.start
+DATA_DIR = Path(os.getenv("START_DATA_DIR", "~/.start")).expanduser().absolute()
 # Default virtual environment directory names for searching.
 DEFAULT_ENV = [".venv", ".env", "venv"]
 DEFAULT_TOML_FILE_CONFIG = {
@@ -0,0 +1,170 @@
+"""Long-lived process running start commands for the thin client.
+
+The daemon listens on a unix socket in the data directory, with the cli modules
+imported and the warm caches enabled, so a command doesn't pay for starting the
+interpreter, importing modules, detecting the pip version and scanning the
+site-packages again. The caches are validated by the mtimes of pyvenv.cfg and
+site-packages for each command.
+
+Commands run one at a time on the stdin, stdout and stderr of the client, as
+they change the working directory and environment variables of the process.
+"""
+
+import os
+import socket
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import List, Optional
+
+from start.client import recv_message, send_message
+from start.core import warm
+from start.core.config import DATA_DIR
+from start.logger import Error, Info
+
+SOCKET_FILE = DATA_DIR / "daemon.sock"
+LOG_FILE = DATA_DIR / "logs" / "daemon.log"
+# seconds to exit after the last command
+DEFAULT_IDLE_TIMEOUT = 3600
+
+
+def is_running(path: Path = SOCKET_FILE) -> bool:
+    """Whether a daemon is listening on the socket."""
+    from start.client import connect
+
+    if sock := connect(str(path)):
+        sock.close()
+        return True
+    return False
+
+
+class Daemon:
+    """Serve the commands sent by the client on a unix socket.
+
+    Args:
+        path: Path of the socket
+        idle_timeout: Seconds to exit after the last command, 0 to never exit
+    """
+
+    def __init__(self, path: Path = SOCKET_FILE, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self.path = Path(path)
+        self.idle_timeout = idle_timeout
+        self.started = time.time()
+        self.commands = 0
+
+    def serve(self):
+        """Listen on the socket until stopped or idle for the timeout."""
+        if not hasattr(socket, "send_fds"):
+            Error("The daemon is not supported on this platform.")
+            return
+        if is_running(self.path):
+            Error(f"The daemon is already running on {self.path}.")
+            return
+        if os.path.lexists(self.path):
+            # left by a daemon which was killed
+            os.unlink(self.path)
+        warm.enable()
+        from start.cli import app
+
+        self.app = app
+        # other users shouldn't run commands as this user
+        umask = os.umask(0o077)
+        try:
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(str(self.path))
+        finally:
+            os.umask(umask)
+        server.listen(16)
+        server.settimeout(self.idle_timeout or None)
+        Info(f"Daemon {os.getpid()} listening on {self.path}")
+        try:
+            with server:
+                while True:
+                    try:
+                        conn, _ = server.accept()
+                    except socket.timeout:
+                        Info("Daemon exits after idle.")
+                        break
+                    conn.settimeout(None)
+                    with conn:
+                        if not self.handle(conn):
+                            break
+        finally:
+            if os.path.lexists(self.path):
+                os.unlink(self.path)
+
+    def handle(self, conn: socket.socket) -> bool:
+        """Handle a message of the client, return False to stop the daemon."""
+        try:
+            message, fds = recv_message(conn, max_fds=3)
+        except (ConnectionError, ValueError):
+            return True
+        try:
+            command = message.get("command")
+            if command == "stop":
+                send_message(conn, {"exit": 0})
+                return False
+            if command == "status":
+                status = {"pid": os.getpid(), "started": self.started, "commands": self.commands}
+                send_message(conn, {"exit": 0, **status})
+                return True
+            if len(fds) != 3:
+                send_message(conn, {"exit": 1})
+                return True
+            self.commands += 1
+            code = self.execute(message["argv"], message["cwd"], message["env"], fds)
+            try:
+                send_message(conn, {"local": True} if code is None else {"exit": code})
+            except OSError:
+                # the client was interrupted
+                pass
+        finally:
+            for fd in fds:
+                os.close(fd)
+        return True
+
+    def execute(self, argv: List[str], cwd: str, env: dict, fds: List[int]) -> Optional[int]:
+        """Run the command in this process on the file descriptors of the client.
+
+        Returns:
+            The exit code of the command, None if the command must run in the client,
+            e.g. `start run` which replaces the process
+        """
+        saved_cwd, saved_env, saved_argv = os.getcwd(), dict(os.environ), sys.argv
+        saved_fds = [os.dup(fd) for fd in range(3)]
+        sys.stdout.flush()
+        sys.stderr.flush()
+        code: Optional[int] = 0
+        # the app callback sets `local` instead of running a local command
+        state = {"daemon": True}
+        try:
+            os.chdir(cwd)
+            os.environ.clear()
+            os.environ.update(env)
+            # same as start.core.pip_manager, which is set once when imported
+            os.environ.setdefault("PYTHONIOENCODING", "utf-8")
+            sys.argv = ["start", *argv]
+            for target, fd in enumerate(fds):
+                os.dup2(fd, target)
+            self.app(args=argv, prog_name="start", obj=state)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            for target, fd in enumerate(saved_fds):
+                os.dup2(fd, target)
+                os.close(fd)
+            os.chdir(saved_cwd)
+            sys.argv = saved_argv
+            os.environ.clear()
+            os.environ.update(saved_env)
+        return None if state.get("local") else code or 0
+
+
+if __name__ == "__main__":
+    Daemon(idle_timeout=float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_IDLE_TIMEOUT).serve()
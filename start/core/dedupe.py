@@ -0,0 +1,298 @@
+"""Deduplicate identical files across the virtual environments.
+
+Files in site-packages are grouped by device, size and mode, only the groups
+with different inodes are hashed, by a thread pool as hashing releases the GIL.
+Identical files are replaced by hardlinks to one of them, or reflinks when the
+file system supports copy-on-write clones.
+
+Hardlinked files share the content, so writing one of them in place changes all
+environments. Every hardlink is recorded in a journal before the file is
+replaced, `restore` copies the files of an environment back out before they are
+modified. Digests are cached by inode, size and mtime, so deduplicating again
+only hashes the new files.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from start.core.fastcopy import reflink as clone_file
+
+JOURNAL_FILE = "dedupe.json"
+# small files save little space and are the most likely to be rewritten
+DEFAULT_MIN_SIZE = 1024
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class FileInfo:
+    """A regular file found by scanning, files of the same inode share one."""
+
+    path: str
+    dev: int
+    ino: int
+    size: int
+    mode: int
+    mtime: int
+    nlink: int
+
+
+@dataclass
+class DedupeResult:
+    """Result of deduplicating the environments.
+
+    Args:
+        groups: Number of groups of identical files with different inodes
+        files: Number of files replaced, or to be replaced in a dry run
+        saved: Bytes saved by the replaced files
+        skipped: Files changed after hashing or failed to link
+    """
+
+    groups: int = 0
+    files: int = 0
+    saved: int = 0
+    skipped: int = 0
+
+
+def scan_files(roots: Iterable[Path], min_size: int = DEFAULT_MIN_SIZE) -> List[FileInfo]:
+    """Regular files not smaller than min size in the directories, symlinks are not followed."""
+    files = []
+    stack = [str(root) for root in roots]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        if st.st_size >= min_size:
+                            files.append(
+                                FileInfo(
+                                    entry.path,
+                                    st.st_dev,
+                                    st.st_ino,
+                                    st.st_size,
+                                    st.st_mode,
+                                    st.st_mtime_ns,
+                                    st.st_nlink,
+                                )
+                            )
+        except OSError:
+            continue
+    return files
+
+
+def file_digest(path: str) -> str:
+    """Sha256 of the file content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _inode_key(file: FileInfo) -> str:
+    return f"{file.dev}:{file.ino}"
+
+
+class Deduplicator:
+    """Find and link identical files across the environments.
+
+    Args:
+        state_dir: Directory of the journal, e.g. `$START_DATA_DIR/cache`
+        jobs: Number of threads to hash files, 0 for the cpu count
+        min_size: Files smaller than it are ignored
+    """
+
+    format_version = 1
+
+    def __init__(self, state_dir: Path, jobs: int = 0, min_size: int = DEFAULT_MIN_SIZE):
+        self.path = Path(state_dir) / JOURNAL_FILE
+        self.jobs = jobs or os.cpu_count() or 1
+        self.min_size = min_size
+        # hardlinked file -> the file it's linked to
+        self.links: Dict[str, str] = {}
+        # inode key -> [size, mtime, digest]
+        self.digests: Dict[str, list] = {}
+        self.read()
+
+    def read(self):
+        """Read the journal, an invalid journal is treated as empty."""
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                journal = json.load(f)
+            if journal.get("version") != self.format_version:
+                return
+            self.links = dict(journal["links"])
+            self.digests = dict(journal["digests"])
+        except (OSError, ValueError, KeyError, TypeError):
+            self.links, self.digests = {}, {}
+
+    def save(self):
+        """Write the journal atomically, it must be written before files are linked."""
+        journal = {
+            "version": self.format_version,
+            "links": dict(sorted(self.links.items())),
+            "digests": self.digests,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp_file.write_text(json.dumps(journal, indent=2), encoding="utf-8")
+        os.replace(tmp_file, self.path)
+
+    def find_duplicates(self, roots: Iterable[Path]) -> List[List[FileInfo]]:
+        """Groups of identical files in the directories, the files of each group
+        are on the same device and have the same mode.
+
+        Returns:
+            groups: Files of each group, the first file has the most links
+        """
+        candidates: Dict[Tuple[int, int, int], Dict[int, List[FileInfo]]] = {}
+        for file in scan_files(roots, self.min_size):
+            inodes = candidates.setdefault((file.dev, file.size, file.mode), {})
+            inodes.setdefault(file.ino, []).append(file)
+        # inodes only need to be hashed when files of the same size have other inodes
+        to_hash = [
+            files[0]
+            for inodes in candidates.values()
+            if len(inodes) > 1
+            for files in inodes.values()
+        ]
+        digests = self._hash_files(to_hash)
+        self.digests.update(
+            (key, [file.size, file.mtime, digests[key]])
+            for file in to_hash
+            if (key := _inode_key(file)) in digests
+        )
+
+        groups = []
+        for inodes in candidates.values():
+            by_digest: Dict[str, List[List[FileInfo]]] = {}
+            for files in inodes.values():
+                if digest := digests.get(_inode_key(files[0])):
+                    by_digest.setdefault(digest, []).append(files)
+            for same in by_digest.values():
+                if len(same) > 1:
+                    same.sort(key=lambda files: (-files[0].nlink, files[0].path))
+                    groups.append([file for files in same for file in files])
+        return groups
+
+    def _hash_files(self, files: List[FileInfo]) -> Dict[str, str]:
+        """Digests of the files by inode key, cached digests are reused when the
+        size and mtime are unchanged, files failed to read are dropped."""
+        digests, missing = {}, []
+        for file in files:
+            cached = self.digests.get(key := _inode_key(file))
+            if cached and cached[:2] == [file.size, file.mtime]:
+                digests[key] = cached[2]
+            else:
+                missing.append(file)
+
+        def digest(file: FileInfo) -> Optional[str]:
+            try:
+                return file_digest(file.path)
+            except OSError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            for file, result in zip(missing, executor.map(digest, missing)):
+                if result:
+                    digests[_inode_key(file)] = result
+        return digests
+
+    def dedupe(self, roots: Iterable[Path], reflink: bool = False, dry_run: bool = False):
+        """Replace the identical files in the directories by links to the first
+        file of each group. Files modified after hashing are skipped.
+
+        Args:
+            roots: Directories to deduplicate, e.g. site-packages of the environments
+            reflink: Clone files by copy-on-write instead of hardlinks
+            dry_run: Only count the files to replace
+        Returns:
+            result: Number of the replaced files and saved bytes
+        """
+        groups = self.find_duplicates(Path(root).absolute() for root in roots)
+        result = DedupeResult(groups=len(groups))
+        # files of each inode to replace, the space is freed when all links are replaced
+        replace: List[Tuple[FileInfo, List[FileInfo]]] = []
+        for group in groups:
+            inodes: Dict[int, List[FileInfo]] = {}
+            for file in group:
+                if file.ino != group[0].ino:
+                    inodes.setdefault(file.ino, []).append(file)
+            replace.extend((group[0], files) for files in inodes.values())
+        if dry_run:
+            result.files = sum(len(files) for _, files in replace)
+            result.saved = sum(
+                files[0].size for _, files in replace if len(files) >= files[0].nlink
+            )
+            return result
+        if not reflink:
+            # write ahead, so the links can be restored even if linking is interrupted
+            self.links.update(
+                (file.path, source.path) for source, files in replace for file in files
+            )
+        self.save()
+        for source, files in replace:
+            replaced = 0
+            for file in files:
+                if self._replace(source, file, reflink):
+                    replaced += 1
+                else:
+                    self.links.pop(file.path, None)
+            result.files += replaced
+            result.skipped += len(files) - replaced
+            if replaced >= files[0].nlink:
+                result.saved += files[0].size
+        self.save()
+        return result
+
+    def _replace(self, source: FileInfo, file: FileInfo, reflink: bool) -> bool:
+        """Replace the file by a link to the source atomically, False if the file
+        changed after scanning or failed to link."""
+        tmp_file = f"{file.path}.{os.getpid()}.dedupe"
+        try:
+            st = os.stat(file.path, follow_symlinks=False)
+            if (st.st_ino, st.st_size, st.st_mtime_ns) != (file.ino, file.size, file.mtime):
+                return False
+            if reflink:
+                clone_file(source.path, tmp_file)
+            else:
+                os.link(source.path, tmp_file)
+            os.replace(tmp_file, file.path)
+        except OSError:
+            if os.path.lexists(tmp_file):
+                os.unlink(tmp_file)
+            return False
+        return True
+
+    def restore(self, roots: Iterable[Path]) -> int:
+        """Copy the hardlinked files in the directories back out, so they can be
+        written without changing other environments.
+
+        Returns:
+            count: Number of files copied
+        """
+        prefixes = tuple(os.path.join(os.path.abspath(root), "") for root in roots)
+        count = 0
+        for path in [path for path in self.links if path.startswith(prefixes)]:
+            try:
+                if os.stat(path, follow_symlinks=False).st_nlink > 1:
+                    tmp_file = f"{path}.{os.getpid()}.restore"
+                    shutil.copy2(path, tmp_file)
+                    os.replace(tmp_file, path)
+                    count += 1
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # keep it in the journal to restore again
+                continue
+            del self.links[path]
+        self.save()
+        return count
@@ -1,25 +1,49 @@
 import re
+import sys
+from contextlib import contextmanager
+from copy import deepcopy
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Iterable, List, Literal
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Set, Tuple
 
 import rtoml
+from packaging.utils import canonicalize_name
 from typer import Exit
 
 from start.core.config import DEFAULT_TOML_FILE_CONFIG
-from start.logger import Error
+from start.core.requirements import (
+    COMMENT_PATTERN,
+    logical_lines,
+    parse_requirements,
+    read_entries,
+    strip_requirement_options,
+)
+from start.core.toml_edit import patch_arrays, write_atomic
+from start.logger import Error, Warn
 from start.utils import update_config_with_default
 
+# max number of parsed dependency strings kept in memory
+PARSE_CACHE_SIZE = 65536
+
 
 class Dependency:
-    """Parse the dependency string to name, extras, version and markers."""
+    """Parse the dependency string to name, extras, version, url and markers.
+
+    Parsed results are cached by the raw string, so the same dependency
+    string is only parsed once and the parsed fields are shared.
+    """
 
-    __slots__ = ("_raw", "name", "extra", "version", "markers")
+    __slots__ = ("_raw", "name", "key", "extra", "version", "url", "markers")
+    # https://peps.python.org/pep-0508/
     pkg_pattern = re.compile(
         r"""
-    ^(?P<name>[\w\d_-]+)           # package name
-    (\[(?P<extras>[\w\d_,\s]+)\])?  # extras option
-    (\s*(?P<version_spec>[=><!~]+\s*[\w\d.*]+(,\s*([=><!~]+)\s*[\w\d.*]+)*))?   # version
-    (\s*;\s*(?P<markers>.*))?      # markers
+    ^\s*(?P<name>[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)  # package name
+    \s*(\[\s*(?P<extras>[^\]]*?)\s*\])?  # extras option
+    \s*(?:
+        @\s*(?P<url>\S+)(?=\s+;|\s*$)   # direct url, markers must be separated by space
+        |\(?\s*(?P<version_spec>(?:[=><!~]=?|===)[^;()]*?)\s*\)?  # version
+    )?
+    (\s*;\s*(?P<markers>.*?))?\s*      # markers
     $
     """,
         re.VERBOSE,
@@ -39,42 +63,84 @@ class Dependency:
 
     def __init__(self, dep: str):
         self._raw = dep
-        self.name = self.extra = self.version = self.markers = ""
-        if match := self.pkg_pattern.match(dep):
-            self.name = match.group("name").replace("_", "-")
-            self.extra = match.group("extras") or ""
-            self.version = match.group("version_spec") or ""
-            self.markers = match.group("markers") or ""
-        elif match := self.vcs_pattern.match(dep):
-            self.name = match.group("pkg_name") or match.group("name")
-            self.version = match.group("rev") or ""
+        self.name, self.key, self.extra, self.version, self.url, self.markers = _parse(dep)
 
     def __repr__(self):
         return self._raw
 
     def __eq__(self, other: Any):
         if isinstance(other, Dependency):
-            return self.name == other.name
+            return self.key == other.key
         elif isinstance(other, str):
             return str(self) == other
         return False
 
     def __hash__(self) -> int:
-        return hash(self.name)
+        return hash(self.key)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse(dep: str) -> Tuple[str, str, str, str, str, str]:
+    """Parse the dependency string to name, canonical name, extras, version, url and markers."""
+    name = extra = version = url = markers = ""
+    if match := Dependency.pkg_pattern.match(dep):
+        name = match.group("name").replace("_", "-")
+        extra = match.group("extras") or ""
+        version = match.group("version_spec") or ""
+        url = match.group("url") or ""
+        markers = match.group("markers") or ""
+        if url and (vcs_match := Dependency.vcs_pattern.match(url)):
+            version = vcs_match.group("rev") or ""
+    elif match := Dependency.vcs_pattern.match(dep):
+        name = match.group("pkg_name") or match.group("name")
+        version = match.group("rev") or ""
+        url = dep.removeprefix(f"{match.group('pkg_name')}@") if match.group("pkg_name") else dep
+    # names are shared by all dependencies of the same package
+    return sys.intern(name), sys.intern(canonicalize_name(name)), extra, version, url, markers
+
+
+def _dependency_key(dependency: str) -> str:
+    """Key to compare the dependencies, unparsable dependencies are compared by the string."""
+    return Dependency(dependency).key or dependency
+
+
+class DependencyEdit:
+    """Adds and removes of dependencies collected by `DependencyManager.batch`,
+    they are applied in order when the batch exits.
+    """
+
+    def __init__(self):
+        self.changes: List[Tuple[Literal["add", "remove"], str, List[str]]] = []
+
+    def add(self, packages: Iterable[str], group: str = "") -> "DependencyEdit":
+        self.changes.append(("add", group, list(packages)))
+        return self
+
+    def remove(self, packages: Iterable[str], group: str = "") -> "DependencyEdit":
+        self.changes.append(("remove", group, list(packages)))
+        return self
 
 
 class DependencyManager:
     def __init__(self, config_file: str | Path):
         self.config_file = Path(config_file)
         self.is_toml_file = self.config_file.suffix == ".toml"
-        self.config = DEFAULT_TOML_FILE_CONFIG
+        self.config = deepcopy(DEFAULT_TOML_FILE_CONFIG)
+        # requirements of the files included by `-r`, constraints of the files
+        # included by `-c` and other pip options, only for requirements file
+        self.included: List[str] = []
+        self.constraints: List[str] = []
+        self.pip_options: List[str] = []
         if self.is_toml_file:
             self.config = update_config_with_default(rtoml.load(self.config_file), self.config)
         elif self.config_file.suffix == ".txt":
-            with self.config_file.open(encoding="utf-8") as f:
-                self.config["project"]["dependencies"] = [
-                    line for _line in f if (line := _line.strip()) and line[0] not in "#-/!"
-                ]
+            # only the requirements of the file itself are editable
+            own = read_entries(self.config_file.absolute().resolve()).requirements
+            self.config["project"]["dependencies"] = list(own)
+            parsed = parse_requirements(self.config_file)
+            self.included = [r for r in parsed.requirements if r not in set(own)]
+            self.constraints = parsed.constraints
+            self.pip_options = parsed.options
         else:
             Error(f"Unsupported file format: {config_file}")
             raise Exit(1)
@@ -85,10 +151,12 @@ class DependencyManager:
             self.config["project"]["dependencies"] = []
         self.project = self.config["project"]
         self._changed = False
+        self._changed_groups: Set[str] = set()
 
     def packages(self, group: str = "") -> List[Dependency]:
         """
         Retrieve a list of dependencies, if group is specified, retrieve the dependencies in that group.
+        Requirements of the files included by requirements file are in the default group.
         Args:
             group (str): The group of dependencies to retrieve. Defaults to an empty string.
         Returns:
@@ -100,6 +168,8 @@ class DependencyManager:
             if not group
             else self.project["optional-dependencies"].get(group, [])
         )
+        if not group:
+            packages = packages + [p for p in self.included if p not in packages]
         return list(map(Dependency, packages))
 
     def modify_dependencies(
@@ -118,58 +188,125 @@ class DependencyManager:
             group (str): The group to modify. Defaults to "".
             save (bool): Whether to save the changes to the configuration file. Defaults to True.
         """
+        self._modify_group(group, [(method, package) for package in packages])
+        if save:
+            self.save()
+
+    def _modify_group(self, group: str, changes: List[Tuple[str, str]]):
+        """Apply the adds and removes to a group in one pass, then sort it."""
         if group and not self.is_toml_file:
             Error("Optional dependencies are only supported in TOML format.")
             raise Exit(1)
 
         if not group:
             packages_ref: list[str] = self.project["dependencies"]
-        elif group not in self.project["optional-dependencies"] and method == "remove":
+        elif group not in self.project["optional-dependencies"] and all(
+            method == "remove" for method, _ in changes
+        ):
             return
         else:
-            packages_ref: list[str] = self.project["optional-dependencies"][group]
-        # convert package to pure name for lookup
-        dependencies = {Dependency(p): i for i, p in enumerate(packages_ref)}
-
-        _origin_package_num = len(packages_ref)
-        if method == "add":
-            # compare modified packages and exists packages
-            # if modified package's name already exists, update it else append it
-            for package in packages:
-                if (i := dependencies.get(Dependency(package))) is not None:
-                    packages_ref[i] = package
-                else:
-                    packages_ref.append(package)
+            packages_ref = self.project["optional-dependencies"].setdefault(group, [])
+        # compare packages by the canonical name, if the name already exists, update it
+        dependencies = {_dependency_key(p): p for p in packages_ref}
+        for method, package in changes:
+            key = _dependency_key(package)
+            if method == "add":
+                dependencies[key] = package
+            else:
+                dependencies.pop(key, None)
+        if (modified := sorted(dependencies.values())) != packages_ref:
+            packages_ref[:] = modified
+            self._changed_groups.add(group)
             self._changed = True
-        elif method == "remove":
-            for package in packages:
-                if (i := dependencies.get(Dependency(package))) is not None:
-                    packages_ref.pop(i)
-            self._changed = _origin_package_num != len(packages_ref)
-        packages_ref.sort()
+
+    @contextmanager
+    def batch(self, save: bool = True) -> Iterator[DependencyEdit]:
+        """Collect adds and removes across groups, apply them in a single pass
+        and write the file once when exit.
+
+        Example:
+            with dm.batch() as edit:
+                edit.add(["requests>=2"]).remove(["pytest"], group="dev")
+        """
+        edit = DependencyEdit()
+        yield edit
+        self.apply(edit, save=save)
+
+    def apply(self, edit: DependencyEdit, save: bool = False):
+        """Apply the collected changes, each group is modified once."""
+        changes: Dict[str, List[Tuple[str, str]]] = {}
+        for method, group, packages in edit.changes:
+            changes.setdefault(group, []).extend((method, package) for package in packages)
+        for group, group_changes in changes.items():
+            self._modify_group(group, group_changes)
         if save:
             self.save()
 
     def add(self, packages: Iterable[str], group: str = "", save: bool = False):
-        self.modify_dependencies("add", packages, group)
+        self.modify_dependencies("add", packages, group, save)
 
     def remove(self, packages: Iterable[str], group: str = "", save: bool = False):
-        self.modify_dependencies("remove", packages, group)
+        self.modify_dependencies("remove", packages, group, save)
 
     def save(self):
         """
-        Saves the configuration to a file.
+        Saves the changed dependencies to the file atomically.
         If the configuration has not been changed, the method returns without saving.
-        If the configuration is in TOML format, it is saved using the `rtoml.dump` function.
-        If the configuration is not in TOML format, the dependencies are written to the file.
+        For TOML file, only the changed dependency arrays are patched, comments and
+        formatting of the rest are kept. If the arrays can't be patched in place,
+        the whole configuration is written by `rtoml.dumps`.
+        For requirements file, the changed lines are replaced, removed lines are
+        dropped and new lines are appended, other lines are kept.
         After saving, the `_changed` flag is set to False.
         """
 
         if not self._changed:
             return
+        text = self.config_file.read_text(encoding="utf-8") if self.config_file.exists() else ""
         if self.is_toml_file:
-            rtoml.dump(self.config, self.config_file, pretty=True)
+            arrays = {
+                ("project", "optional-dependencies", group)
+                if group
+                else ("project", "dependencies"): self._packages_ref(group)
+                for group in sorted(self._changed_groups)
+            }
+            if (patched := patch_arrays(text, arrays, key=_dependency_key)) is None:
+                Warn(f"Can't update {self.config_file} in place, rewrite the whole file.")
+                patched = rtoml.dumps(self.config, pretty=True)
         else:
-            with self.config_file.open("w", encoding="utf-8") as f:
-                f.write("\n".join(self.project["dependencies"]))
+            patched = self._patch_requirements(text)
+        write_atomic(self.config_file, patched)
         self._changed = False
+        self._changed_groups.clear()
+
+    def _packages_ref(self, group: str = "") -> List[str]:
+        """The dependency strings of the group."""
+        if not group:
+            return self.project["dependencies"]
+        return self.project["optional-dependencies"].get(group, [])
+
+    def _patch_requirements(self, text: str) -> str:
+        """Update the requirement lines of the requirements file, continuation
+        lines of a requirement are replaced together."""
+        dependencies = {_dependency_key(p): p for p in self.project["dependencies"]}
+        lines: List[str] = []
+        written: Set[str] = set()
+        block: List[str] = []
+        for line in text.splitlines():
+            block.append(line)
+            if line.endswith("\\") and not COMMENT_PATTERN.search(line):
+                continue
+            requirement = next(logical_lines(block), "")
+            block, physical_lines = [], block
+            if not requirement or requirement.startswith("-"):
+                lines.extend(physical_lines)
+                continue
+            requirement = strip_requirement_options(requirement)
+            key = _dependency_key(requirement)
+            if key in dependencies and key not in written:
+                same = dependencies[key] == requirement
+                lines.extend(physical_lines if same else [dependencies[key]])
+                written.add(key)
+        lines.extend(block)
+        lines.extend(p for key, p in dependencies.items() if key not in written)
+        return "\n".join(lines) + "\n"
@@ -1,13 +1,21 @@
 import os
+import sys
 import venv
+from pathlib import Path
 from types import SimpleNamespace
+from typing import TYPE_CHECKING, Optional
 
 from typer import Exit
 
+from start.core import trace
 from start.core.dependency import DependencyManager
 from start.core.pip_manager import PipManager
+from start.core.requirements import constraint_args
 from start.logger import Error, Info
-from start.utils import display_activate_cmd
+from start.utils import display_activate_cmd, link_or_copy, read_env_config
+
+if TYPE_CHECKING:
+    from start.core.wheelhouse import Wheelhouse
 
 
 class ExtEnvBuilder(venv.EnvBuilder):
@@ -24,6 +32,10 @@ class ExtEnvBuilder(venv.EnvBuilder):
         system_site_packages: Dont give the virtual environment access
             to system packages
         pip_args: Extra arguments to pass to pip command
+        wheelhouse: Save the wheels to and install packages from the wheelhouse
+        base: Clone the site-packages and scripts from this provisioned
+            environment instead of running ensurepip and upgrading core packages
+        display_activate: Display the activate command after the environment is created
     """
 
     def __init__(
@@ -36,6 +48,9 @@ class ExtEnvBuilder(venv.EnvBuilder):
         upgrade_core: bool = False,
         system_site_packages: bool = False,
         pip_args: list[str] = [],
+        wheelhouse: Optional["Wheelhouse"] = None,
+        base: str | Path | None = None,
+        display_activate: bool = True,
     ):
         super().__init__(
             clear=force,
@@ -44,11 +59,96 @@ class ExtEnvBuilder(venv.EnvBuilder):
             upgrade_deps=upgrade_core,
         )
         self.packages = packages or []
+        self.pip_args = pip_args
+        self.constraints: list[str] = []
         if require:
             dm = DependencyManager(require)
             self.packages.extend(str(dep) for dep in dm.packages())
+            self.pip_args = [*dm.pip_options, *pip_args]
+            self.constraints = dm.constraints
         self.verbose = verbose
-        self.pip_args = pip_args
+        self.wheelhouse = wheelhouse
+        self.base = Path(base).absolute() if base else None
+        self.display_activate = display_activate
+        # whether the packages were installed successfully, set in post_setup
+        self.installed = True
+
+    def create(self, env_dir: str | bytes | os.PathLike[str] | os.PathLike[bytes]):
+        """Create the virtual environment, clone it from base environment if specified."""
+        with trace.phase("create environment", path=os.fsdecode(env_dir)):
+            if not self.base:
+                return super().create(env_dir)
+            self._create_from_base(env_dir)
+
+    def _create_from_base(self, env_dir: str | bytes | os.PathLike[str] | os.PathLike[bytes]):
+        assert self.base is not None, "clone from base environment only"
+        base_version = read_env_config(self.base).get("version", "").split(".")[:2]
+        if base_version != [str(v) for v in sys.version_info[:2]]:
+            Error(
+                f"Base environment {self.base} was created by python {'.'.join(base_version)}, "
+                f"can't be cloned by python {sys.version_info[0]}.{sys.version_info[1]}"
+            )
+            raise Exit(1)
+        context = self.ensure_directories(os.path.abspath(env_dir))
+        # pyvenv.cfg, interpreter and activate scripts are generated for the new
+        # environment, everything else is cloned from base environment
+        self.create_configuration(context)
+        self.setup_python(context)
+        self.setup_scripts(context)
+        with trace.phase("clone base"):
+            self.clone_base(context)
+        self.post_setup(context)
+
+    def setup_python(self, context: SimpleNamespace):
+        with trace.phase("setup python"):
+            super().setup_python(context)
+
+    def setup_scripts(self, context: SimpleNamespace):
+        with trace.phase("setup scripts"):
+            super().setup_scripts(context)
+
+    def _setup_pip(self, context: SimpleNamespace):
+        with trace.phase("ensurepip"):
+            trace.count("subprocesses")
+            super()._setup_pip(context)  # type: ignore[misc]
+
+    def upgrade_dependencies(self, context: SimpleNamespace):
+        with trace.phase("upgrade core"):
+            trace.count("subprocesses")
+            super().upgrade_dependencies(context)
+
+    def clone_base(self, context: SimpleNamespace):
+        """Hardlink files from base environment into the new environment, files
+        already created in the new environment are kept. Scripts in bin directory
+        refer to the base environment interpreter, so they are copied and fixed up.
+        """
+        assert self.base is not None
+        Info(f"Cloning virtual environment from {self.base}")
+        env_dir = Path(context.env_dir)
+        old_prefix, new_prefix = os.fsencode(self.base), os.fsencode(env_dir)
+        for root, dirs, files in os.walk(self.base):
+            src_dir = Path(root)
+            dest_dir = env_dir / src_dir.relative_to(self.base)
+            in_bin = src_dir == self.base / context.bin_name
+            for name in dirs + files:
+                src, dest = src_dir / name, dest_dir / name
+                if src.is_symlink():
+                    if not os.path.lexists(dest):
+                        target = os.readlink(src)
+                        if Path(target).is_relative_to(self.base):
+                            target = env_dir / Path(target).relative_to(self.base)
+                        dest.symlink_to(target)
+                elif name in dirs:
+                    dest.mkdir(exist_ok=True)
+                elif dest.exists():
+                    continue
+                elif in_bin and (content := src.read_bytes()).startswith(b"#!"):
+                    dest.write_bytes(content.replace(old_prefix, new_prefix))
+                    dest.chmod(src.stat().st_mode)
+                else:
+                    link_or_copy(src, dest)
+            # don't walk into symlinked directories, e.g. lib64 -> lib
+            dirs[:] = [d for d in dirs if not (src_dir / d).is_symlink()]
 
     def ensure_directories(
         self, env_dir: str | bytes | os.PathLike[str] | os.PathLike[bytes]
@@ -61,10 +161,13 @@ class ExtEnvBuilder(venv.EnvBuilder):
     def post_setup(self, context: SimpleNamespace):
         """Install and upgrade packages after created environment."""
         Info("Binary path: " + context.env_exe)
-        pip = PipManager(context.env_exe, self.verbose)
+        pip = PipManager(context.env_exe, self.verbose, self.wheelhouse)
 
         if self.packages:
             Info("Start installing packages...")
-            pip.install(*self.packages, pip_args=self.pip_args)
+            with trace.phase("install packages"), constraint_args(self.constraints) as constraints:
+                pip.install(*self.packages, pip_args=[*constraints, *self.pip_args])
+            self.installed = pip.return_code == 0
 
-        display_activate_cmd(context.env_dir)
+        if self.display_activate:
+            display_activate_cmd(context.env_dir)
@@ -0,0 +1,176 @@
+"""Copy files by the kernel instead of reading them into memory.
+
+A file is cloned by copy-on-write when the file system supports it, then copied
+by `copy_file_range` or `sendfile`, which copy the data in the kernel, and
+finally by reading and writing chunks. Files of a tree are copied by a thread
+pool, the copy system calls release the GIL.
+"""
+
+import errno
+import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from start.core import trace
+
+CHUNK_SIZE = 1024 * 1024
+# max bytes of a copy_file_range or sendfile call, larger values fail on some kernels
+KERNEL_CHUNK_SIZE = 1024**3
+# ioctl request of the linux copy-on-write clone, _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+# errors meaning the copy method is not supported for the files, try the next one
+UNSUPPORTED_ERRORS = {
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.EBADF,
+    errno.ETXTBSY,
+}
+
+
+def clone_fd(src_fd: int, dest_fd: int):
+    """Clone the content of the source file by the copy-on-write ioctl.
+
+    Raises:
+        OSError: The platform or file system doesn't support reflinks
+    """
+    if not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "reflink is only supported on linux")
+    import fcntl
+
+    fcntl.ioctl(dest_fd, FICLONE, src_fd)
+
+
+def reflink(src: str | Path, dest: str | Path):
+    """Clone the file by the copy-on-write ioctl, raise OSError if unsupported."""
+    with open(src, "rb") as src_file, open(dest, "wb") as dest_file:
+        clone_fd(src_file.fileno(), dest_file.fileno())
+    shutil.copystat(src, dest)
+
+
+def _copy_in_kernel(src_fd: int, dest_fd: int) -> bool:
+    """Copy from the current offsets by copy_file_range, then sendfile, the
+    offsets are advanced. False if neither is supported, the rest is not copied.
+    """
+    for name in ("copy_file_range", "sendfile"):
+        if not hasattr(os, name) or (name == "sendfile" and not sys.platform.startswith("linux")):
+            continue
+        try:
+            while True:
+                if name == "copy_file_range":
+                    copied = os.copy_file_range(src_fd, dest_fd, KERNEL_CHUNK_SIZE)
+                else:
+                    copied = os.sendfile(dest_fd, src_fd, None, KERNEL_CHUNK_SIZE)
+                if not copied:
+                    return True
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_ERRORS:
+                raise
+    return False
+
+
+def copy_fd(src_fd: int, dest_fd: int):
+    """Copy the content of the source file to the empty destination file."""
+    try:
+        clone_fd(src_fd, dest_fd)
+        return
+    except OSError as e:
+        if e.errno not in UNSUPPORTED_ERRORS and e.errno != errno.ENOTTY:
+            raise
+    if _copy_in_kernel(src_fd, dest_fd):
+        return
+    while chunk := os.read(src_fd, CHUNK_SIZE):
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(dest_fd, view) :]
+
+
+def copy_file(src: str | Path, dest: str | Path) -> bool:
+    """Copy the file with its permission bits, an existing destination is not
+    overwritten.
+
+    Returns:
+        copied: False if the destination already exists
+    """
+    if (size := _copy_file(src, dest)) is None:
+        return False
+    trace.count("bytes_written", size)
+    return True
+
+
+def _copy_file(src: str | Path, dest: str | Path) -> Optional[int]:
+    """Copy the file as `copy_file`, return the copied size, None if the
+    destination already exists."""
+    src_fd = os.open(src, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        st = os.fstat(src_fd)
+        flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+        try:
+            dest_fd = os.open(dest, flags, st.st_mode & 0o777)
+        except FileExistsError:
+            return None
+        try:
+            copy_fd(src_fd, dest_fd)
+        except BaseException:
+            # don't leave a partial file, it would be kept by the next copy
+            os.close(dest_fd)
+            os.unlink(dest)
+            raise
+        os.close(dest_fd)
+    finally:
+        os.close(src_fd)
+    return st.st_size
+
+
+def copy_tree(src: str | Path, dest: str | Path, jobs: int = 0, exclude: Iterable[str] = ()) -> int:
+    """Copy files, directories and symlinks from source to destination, existing
+    files and symlinks in the destination are kept. Symlinks to directories are
+    copied as directories, other symlinks are recreated with the same target.
+
+    Args:
+        src: Source directory
+        dest: Destination directory, created if it doesn't exist
+        jobs: Number of threads to copy files, 0 for the default of the thread pool
+        exclude: Names of the entries in the source directory to skip, e.g. `.git`
+    Returns:
+        count: Number of copied files
+    """
+    files: List[Tuple[str, str]] = []
+    # directories are walked in the main thread, so they exist before files are copied
+    root, exclude = os.fspath(src), set(exclude)
+    stack = [(root, os.fspath(dest), frozenset())]
+    while stack:
+        src_dir, dest_dir, parents = stack.pop()
+        st = os.stat(src_dir)
+        if (key := (st.st_dev, st.st_ino)) in parents:
+            # a symlink to its parent directory
+            continue
+        os.makedirs(dest_dir, exist_ok=True)
+        with os.scandir(src_dir) as it:
+            for entry in it:
+                if src_dir == root and entry.name in exclude:
+                    continue
+                dest_path = os.path.join(dest_dir, entry.name)
+                if entry.is_dir():
+                    stack.append((entry.path, dest_path, parents | {key}))
+                elif os.path.lexists(dest_path):
+                    continue
+                elif entry.is_symlink():
+                    os.symlink(os.readlink(entry.path), dest_path)
+                elif entry.is_file():
+                    files.append((entry.path, dest_path))
+
+    if len(files) < 2:
+        sizes = [_copy_file(*item) for item in files]
+    else:
+        with ThreadPoolExecutor(max_workers=jobs or None) as executor:
+            sizes = list(executor.map(lambda item: _copy_file(*item), files))
+    copied = [size for size in sizes if size is not None]
+    # counted in this thread, the phases are open in it but not in the workers
+    trace.count("bytes_written", sum(copied))
+    return len(copied)
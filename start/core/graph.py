@@ -0,0 +1,228 @@
+"""Compact requirement graph of packages.
+
+Package names are interned to integer ids and the edges are stored in flat
+arrays (compressed sparse rows), the reverse edges, roots and transitive
+closure are computed once when the graph is built.
+"""
+
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Mapping
+
+# packages never pruned, they are part of the environment instead of the project
+PROTECTED_PACKAGES = frozenset({"pip", "setuptools", "wheel"})
+
+
+def _compress(count: int, edges: Iterable[tuple]) -> tuple:
+    """Offsets and targets of the edges grouped by source, edges are kept in order."""
+    edges = list(edges)
+    offsets = array("I", [0]) * (count + 1)
+    for source, _ in edges:
+        offsets[source + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+    targets = array("I", [0]) * len(edges)
+    position = offsets[:-1]
+    for source, target in edges:
+        targets[position[source]] = target
+        position[source] += 1
+    return offsets, targets
+
+
+class PackageGraph:
+    """Requirement graph of packages.
+
+    Args:
+        requires: Requirements of the packages keyed by the package name,
+            packages only in the requirements are added with no requirements
+    """
+
+    __slots__ = (
+        "names",
+        "ids",
+        "_offsets",
+        "_targets",
+        "_reverse_offsets",
+        "_reverse_targets",
+        "_roots",
+        "_closure",
+    )
+
+    def __init__(self, requires: Mapping[str, Iterable[str]]):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        edges = []
+        for name, children in requires.items():
+            source = self._intern(name)
+            seen = set()
+            for child in children:
+                if (target := self._intern(child)) not in seen:
+                    seen.add(target)
+                    edges.append((source, target))
+        self._offsets, self._targets = _compress(len(self.names), edges)
+        self._reverse_offsets, self._reverse_targets = _compress(
+            len(self.names), ((target, source) for source, target in edges)
+        )
+        self._closure = self._compute_closure()
+        self._roots = self._compute_roots()
+
+    def _intern(self, name: str) -> int:
+        if (index := self.ids.get(name)) is None:
+            index = self.ids[name] = len(self.names)
+            self.names.append(sys.intern(name))
+        return index
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.ids
+
+    def children(self, index: int) -> array:
+        """Ids of the packages which the package requires."""
+        return self._targets[self._offsets[index] : self._offsets[index + 1]]
+
+    def parents(self, index: int) -> array:
+        """Ids of the packages which require the package."""
+        return self._reverse_targets[
+            self._reverse_offsets[index] : self._reverse_offsets[index + 1]
+        ]
+
+    def requires(self, name: str) -> List[str]:
+        """Names of the packages which the package requires."""
+        if (index := self.ids.get(name)) is None:
+            return []
+        return [self.names[child] for child in self.children(index)]
+
+    def required_by(self, name: str) -> List[str]:
+        """Names of the packages which require the package."""
+        if (index := self.ids.get(name)) is None:
+            return []
+        return [self.names[parent] for parent in self.parents(index)]
+
+    def roots(self) -> List[str]:
+        """Packages not required by others. A package of a cycle which is not
+        required by packages outside the cycle is a root as well.
+        """
+        return [self.names[index] for index in self._roots]
+
+    def closure(self, name: str) -> List[str]:
+        """Names of all packages required by the package directly or indirectly,
+        the package itself is included only when it's in a requirement cycle."""
+        if (index := self.ids.get(name)) is None:
+            return []
+        return list(self._names_of(self._closure[index]))
+
+    def _names_of(self, bits: int) -> Iterator[str]:
+        return (self.names[index] for index in self._indexes_of(bits))
+
+    def _bits_of(self, names: Iterable[str]) -> int:
+        bits = 0
+        for name in names:
+            if (index := self.ids.get(name)) is not None:
+                bits |= 1 << index
+        return bits
+
+    def reverse(self) -> "PackageGraph":
+        """Graph of the packages which require each package."""
+        return PackageGraph(
+            {name: [self.names[p] for p in self.parents(i)] for i, name in enumerate(self.names)}
+        )
+
+    def restrict(self, names: Iterable[str]) -> "PackageGraph":
+        """Graph of the packages and their direct requirements, requirements of
+        other packages are dropped."""
+        return PackageGraph({name: self.requires(name) for name in names if name in self})
+
+    def prunable(self, removed: Iterable[str], keep: Iterable[str] = ()) -> List[str]:
+        """Packages which are only required by the removed packages.
+
+        Args:
+            removed: Packages to remove
+            keep: Packages should be kept, e.g. the declared dependencies
+        """
+        removed_bits = self._bits_of(removed)
+        keep_bits = self._bits_of(keep) | self._bits_of(PROTECTED_PACKAGES)
+        candidates = 0
+        for index in self._indexes_of(removed_bits):
+            candidates |= self._closure[index]
+        candidates &= ~removed_bits
+        kept = keep_bits
+        for index in range(len(self.names)):
+            if (keep_bits >> index) & 1 or not ((removed_bits | candidates) >> index) & 1:
+                kept |= self._closure[index]
+        return list(self._names_of(candidates & ~kept))
+
+    def _indexes_of(self, bits: int) -> Iterator[int]:
+        index = 0
+        while bits:
+            if bits & 1:
+                yield index
+            bits >>= 1
+            index += 1
+
+    def _compute_closure(self) -> List[int]:
+        """Transitive requirements of each package as bitsets. Strongly connected
+        components are found by iterative Tarjan's algorithm, which emits a
+        component after all components it requires.
+        """
+        count = len(self.names)
+        closure = [0] * count
+        order = [-1] * count
+        low = [0] * count
+        on_stack = [False] * count
+        stack: List[int] = []
+        counter = 0
+        for start in range(count):
+            if order[start] != -1:
+                continue
+            work = [(start, 0)]
+            while work:
+                node, child_position = work.pop()
+                if child_position == 0:
+                    order[node] = low[node] = counter
+                    counter += 1
+                    stack.append(node)
+                    on_stack[node] = True
+                children = self.children(node)
+                if child_position < len(children):
+                    work.append((node, child_position + 1))
+                    child = children[child_position]
+                    if order[child] == -1:
+                        work.append((child, 0))
+                    elif on_stack[child]:
+                        low[node] = min(low[node], order[child])
+                    continue
+                # all children visited, update the parent and emit the component
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] != order[node]:
+                    continue
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                bits = 0
+                for member in component:
+                    for child in self.children(member):
+                        bits |= (1 << child) | closure[child]
+                for member in component:
+                    closure[member] = bits
+        return closure
+
+    def _compute_roots(self) -> array:
+        roots = array("I")
+        reached = 0
+        for index in range(len(self.names)):
+            if self._reverse_offsets[index] == self._reverse_offsets[index + 1]:
+                roots.append(index)
+                reached |= self._closure[index] | (1 << index)
+        for index in range(len(self.names)):
+            if not (reached >> index) & 1:
+                roots.append(index)
+                reached |= self._closure[index] | (1 << index)
+        return roots
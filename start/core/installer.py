@@ -0,0 +1,510 @@
+"""Backends installing the pinned requirements of a lockfile.
+
+Installers are tried in order, each one installs the requirements it supports
+and passes the others to the next one. Pip is always the last installer, it
+resolves, builds and downloads whatever the others can't install.
+
+`WheelInstaller` unpacks the cached wheels of the pinned versions from the
+wheelhouse into site-packages in this process (PEP 427), so a locked install
+from the cache doesn't pay for starting pip and its resolver. It only installs
+into a virtual environment of the same python version as this interpreter,
+since the bytecode is compiled and the wheel tags are checked by it.
+"""
+
+import base64
+import configparser
+import csv
+import hashlib
+import io
+import os
+import py_compile
+import shutil
+import sys
+import zipfile
+from abc import ABC, abstractmethod
+from email.parser import Parser
+from functools import cached_property
+from importlib.util import cache_from_source
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Set, Tuple
+
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.tags import sys_tags
+from packaging.utils import InvalidWheelFilename, canonicalize_name, parse_wheel_filename
+from packaging.version import InvalidVersion, Version
+
+from start.core import trace
+from start.logger import Info, Success, Warn
+
+if TYPE_CHECKING:
+    from start.core.metadata import EnvMetadata
+    from start.core.pip_manager import PipManager
+    from start.core.wheelhouse import Wheelhouse
+
+# pip install options which don't change the files of a pinned wheel, and whether they take a value
+COMPATIBLE_ARGS = {
+    "-i": True,
+    "--index-url": True,
+    "--extra-index-url": True,
+    "-f": True,
+    "--find-links": True,
+    "--no-index": False,
+    "--trusted-host": True,
+    "--no-deps": False,
+    "--progress-bar": True,
+    "-q": False,
+    "--quiet": False,
+    "-v": False,
+    "--verbose": False,
+    "--no-warn-script-location": False,
+    "--no-warn-conflicts": False,
+    "--no-compile": False,
+    "--require-hashes": False,
+    "--disable-pip-version-check": False,
+}
+CHUNK_SIZE = 1024 * 1024
+SCRIPT_TEMPLATE = """\
+#!{python}
+# -*- coding: utf-8 -*-
+import re
+import sys
+from {module} import {name}
+if __name__ == "__main__":
+    sys.argv[0] = re.sub(r"(-script\\.pyw|\\.exe)?$", "", sys.argv[0])
+    sys.exit({func}())
+"""
+
+
+class InstallError(Exception):
+    """The wheel can't be installed in process, it's passed to the next installer."""
+
+
+class Installer(ABC):
+    """Backend installing pinned requirements into an environment."""
+
+    name = ""
+
+    @abstractmethod
+    def install(self, requirements: List[str], pip_args: List[str]) -> List[str]:
+        """Install the requirements this backend supports.
+
+        Args:
+            requirements: Pinned requirement lines of the lockfile
+            pip_args: Extra arguments to pass to pip install
+        Returns:
+            requirements: Requirements left to the next installer
+        """
+
+
+class PipInstaller(Installer):
+    """Install the requirements by pip without resolving dependencies."""
+
+    name = "pip"
+
+    def __init__(self, pip: "PipManager"):
+        self.pip = pip
+
+    def install(self, requirements: List[str], pip_args: List[str]) -> List[str]:
+        return [] if self.pip.install_locked(requirements, pip_args=pip_args) else requirements
+
+
+def record_hash(data: bytes) -> str:
+    """Hash of a file in RECORD format."""
+    return "sha256=" + base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=").decode()
+
+
+def parse_locked(line: str) -> Tuple[str, List[str]]:
+    """Split the requirement line into the requirement and its hashes."""
+    requirement, *hashes = line.split(" --hash=")
+    return requirement.strip(), [_hash.strip() for _hash in hashes]
+
+
+class WheelInstaller(Installer):
+    """Install the cached wheels of the pinned requirements in process.
+
+    Args:
+        metadata: Metadata of the target environment
+        wheelhouse: Wheelhouse to find the cached wheels
+        compile: Compile the installed modules to bytecode
+    """
+
+    name = "wheel"
+
+    def __init__(self, metadata: "EnvMetadata", wheelhouse: "Wheelhouse", compile: bool = True):
+        self.metadata = metadata
+        self.wheelhouse = wheelhouse
+        self.compile = compile
+
+    def supported(self, pip_args: List[str]) -> bool:
+        """Whether the target environment and pip arguments are supported."""
+        if os.name == "nt" or not self.metadata.env_dir:
+            # console scripts on windows are executable launchers
+            return False
+        if self.metadata.python_version.split(".")[:2] != [str(v) for v in sys.version_info[:2]]:
+            return False
+        skip_value = False
+        for arg in pip_args:
+            if skip_value:
+                skip_value = False
+                continue
+            option = arg.split("=", 1)[0]
+            if option not in COMPATIBLE_ARGS:
+                return False
+            skip_value = COMPATIBLE_ARGS[option] and "=" not in arg
+        return True
+
+    def install(self, requirements: List[str], pip_args: List[str]) -> List[str]:
+        if not self.supported(pip_args):
+            return requirements
+        self.compile = self.compile and "--no-compile" not in pip_args
+        pending, remaining = [], []
+        for line in requirements:
+            requirement, hashes = parse_locked(line)
+            try:
+                req = Requirement(requirement)
+            except InvalidRequirement:
+                remaining.append(line)
+                continue
+            if req.marker and not req.marker.evaluate(self.metadata.marker_environment):
+                continue
+            if found := self.find_wheel(req, hashes):
+                pending.append((line, *found))
+            else:
+                remaining.append(line)
+        if not pending:
+            return remaining
+
+        Info(f"Start install {len(pending)} cached wheels")
+        installed = []
+        with trace.phase("install wheels", wheels=len(pending)):
+            for line, name, version, wheel in pending:
+                try:
+                    self.install_wheel(wheel, name, version)
+                    installed.append(f"{name}-{version}")
+                except (InstallError, OSError, zipfile.BadZipFile, ValueError) as e:
+                    Warn(f"Failed to install {wheel.name} in process, install it by pip: {e}")
+                    remaining.append(line)
+        if installed:
+            Success("Successfully installed " + " ".join(installed))
+        return remaining
+
+    def find_wheel(self, req: Requirement, hashes: List[str]) -> Optional[Tuple[str, str, Path]]:
+        """Find the cached wheel of the pinned requirement, its sha256 must be one
+        of the hashes if any.
+
+        Returns:
+            The canonical name, version and path of the wheel, None if not found
+        """
+        specs = list(req.specifier)
+        if req.url or len(specs) != 1 or specs[0].operator not in ("==", "==="):
+            return None
+        if "*" in specs[0].version:
+            return None
+        try:
+            version = Version(specs[0].version)
+        except InvalidVersion:
+            return None
+        name = canonicalize_name(req.name)
+        digests = {_hash.partition(":")[2] for _hash in hashes if _hash.startswith("sha256:")}
+        for wheel in self.wheels.get((name, version), []):
+            if hashes and self._digest(wheel) not in digests:
+                continue
+            return name, specs[0].version, wheel
+        return None
+
+    @cached_property
+    def wheels(self) -> Dict[Tuple[str, Version], List[Path]]:
+        """Compatible wheels in the wheelhouse keyed by name and version, sorted by
+        the priority of their tags."""
+        priorities = {tag: index for index, tag in enumerate(sys_tags())}
+        found: Dict[Tuple[str, Version], List[Tuple[int, Path]]] = {}
+        if self.wheelhouse.links_dir.is_dir():
+            for path in self.wheelhouse.links_dir.glob("*.whl"):
+                try:
+                    name, version, _, tags = parse_wheel_filename(path.name)
+                except InvalidWheelFilename:
+                    continue
+                priority = min((priorities[tag] for tag in tags if tag in priorities), default=None)
+                if priority is not None:
+                    found.setdefault((name, version), []).append((priority, path))
+        return {key: [path for _, path in sorted(paths)] for key, paths in found.items()}
+
+    @cached_property
+    def blobs(self) -> Dict[Tuple[int, int], str]:
+        """Names of the blobs in the wheelhouse, which are their sha256, keyed by
+        the device and inode."""
+        blobs = {}
+        if self.wheelhouse.blobs_dir.is_dir():
+            with os.scandir(self.wheelhouse.blobs_dir) as entries:
+                for entry in entries:
+                    stat = entry.stat()
+                    blobs[(stat.st_dev, stat.st_ino)] = entry.name
+        return blobs
+
+    def _digest(self, wheel: Path) -> str:
+        """Sha256 of the wheel, the blob hardlinked to it is named by its sha256."""
+        stat = wheel.stat()
+        if digest := self.blobs.get((stat.st_dev, stat.st_ino)):
+            return digest
+        digest = hashlib.sha256()
+        with wheel.open("rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @property
+    def env_dir(self) -> Path:
+        """Directory of the target virtual environment.
+
+        Raises:
+            InstallError: The target is not a virtual environment
+        """
+        if (env_dir := self.metadata.env_dir) is None:
+            raise InstallError("only install into a virtual environment")
+        return env_dir
+
+    @cached_property
+    def site_packages(self) -> Path:
+        version = ".".join(self.metadata.python_version.split(".")[:2])
+        return self.env_dir / "lib" / f"python{version}" / "site-packages"
+
+    def install_wheel(self, wheel: Path, name: str, version: str):
+        """Unpack the wheel into the environment, the installed distribution of
+        the package is removed first.
+
+        Raises:
+            InstallError: The wheel is invalid or not supported
+        """
+        site_packages = self.site_packages
+        with zipfile.ZipFile(wheel) as zf:
+            dist_info = _find_dist_info(zf, name)
+            wheel_info = Parser().parsestr(zf.read(f"{dist_info}/WHEEL").decode("utf-8"))
+            if not wheel_info.get("Wheel-Version", "").startswith("1."):
+                raise InstallError(f"unsupported wheel version {wheel_info.get('Wheel-Version')}")
+            expected = _read_record(zf.read(f"{dist_info}/RECORD").decode("utf-8"))
+            self.uninstall(name)
+
+            written: List[Tuple[Path, str, int]] = []
+            try:
+                data_dir = dist_info.removesuffix(".dist-info") + ".data"
+                for info in zf.infolist():
+                    if info.is_dir() or info.filename.startswith(
+                        tuple(f"{dist_info}/RECORD{suffix}" for suffix in ("", ".jws", ".p7s"))
+                    ):
+                        continue
+                    if info.filename not in expected:
+                        raise InstallError(f"{info.filename} is not in RECORD")
+                    dest, is_script = self._destination(info.filename, data_dir, name)
+                    written.append(
+                        self._extract(zf, info, dest, expected[info.filename], is_script)
+                    )
+                written.extend(self._write_entry_points(zf, dist_info))
+                if self.compile:
+                    written.extend(self._compile([path for path, _, _ in written]))
+                installer_file = site_packages / dist_info / "INSTALLER"
+                installer_file.write_text("start\n", encoding="utf-8")
+                written.append((installer_file, record_hash(b"start\n"), 6))
+            except BaseException:
+                for path, _, _ in written:
+                    path.unlink(missing_ok=True)
+                raise
+            record_file = site_packages / dist_info / "RECORD"
+            with record_file.open("w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f, lineterminator="\n")
+                for path, _hash, size in written:
+                    writer.writerow((_record_path(path, site_packages), _hash, size))
+                writer.writerow((_record_path(record_file, site_packages), "", ""))
+        trace.count("bytes_written", sum(size for _, _, size in written))
+        # the installed distributions are listed again by the next uninstall
+        self.__dict__.pop("installed", None)
+
+    def _destination(self, path: str, data_dir: str, name: str) -> Tuple[Path, bool]:
+        """Destination of the file in the wheel, and whether it's a script."""
+        env_dir = self.env_dir
+        root, relative, is_script = self.site_packages, path, False
+        if path.startswith(data_dir + "/"):
+            scheme, _, relative = path[len(data_dir) + 1 :].partition("/")
+            version = ".".join(self.metadata.python_version.split(".")[:2])
+            roots = {
+                "purelib": self.site_packages,
+                "platlib": self.site_packages,
+                "scripts": env_dir / "bin",
+                "data": env_dir,
+                "headers": env_dir / "include" / "site" / f"python{version}" / name,
+            }
+            if scheme not in roots:
+                raise InstallError(f"unknown scheme {scheme} of {path}")
+            root, is_script = roots[scheme], scheme == "scripts"
+        dest = Path(os.path.normpath(root / relative))
+        if not dest.is_relative_to(env_dir):
+            raise InstallError(f"{path} is outside of the environment")
+        return dest, is_script
+
+    def _extract(
+        self, zf: zipfile.ZipFile, info: zipfile.ZipInfo, dest: Path, expected: str, is_script: bool
+    ) -> Tuple[Path, str, int]:
+        """Extract the file and check its hash in RECORD."""
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        digest, size = hashlib.sha256(), 0
+        with zf.open(info) as src, dest.open("wb") as f:
+            if is_script:
+                content = src.read()
+                digest.update(content)
+                size = len(content)
+                if content.startswith((b"#!python", b"#!pythonw")):
+                    rest = content.partition(b"\n")[2]
+                    content = f"#!{self.metadata.execu}".encode() + b"\n" + rest
+                f.write(content)
+            else:
+                while chunk := src.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+        _hash = "sha256=" + base64.urlsafe_b64encode(digest.digest()).rstrip(b"=").decode()
+        if expected and _hash != expected:
+            dest.unlink()
+            raise InstallError(f"hash of {info.filename} doesn't match RECORD")
+        if is_script or info.external_attr >> 16 & 0o111:
+            dest.chmod(0o755)
+        if is_script:
+            # the shebang is changed, so the hash is of the installed file
+            _hash, size = record_hash(dest.read_bytes()), dest.stat().st_size
+        return dest, _hash, size
+
+    def _write_entry_points(
+        self, zf: zipfile.ZipFile, dist_info: str
+    ) -> List[Tuple[Path, str, int]]:
+        """Generate the console and gui scripts declared in entry_points.txt."""
+        try:
+            text = zf.read(f"{dist_info}/entry_points.txt").decode("utf-8")
+        except KeyError:
+            return []
+        parser = configparser.ConfigParser(delimiters=("=",), interpolation=None)
+        parser.optionxform = str  # type: ignore[assignment,method-assign]
+        parser.read_string(text)
+        env_dir = self.env_dir
+        written = []
+        for section in ("console_scripts", "gui_scripts"):
+            if not parser.has_section(section):
+                continue
+            for script_name, value in parser.items(section):
+                module, _, attr = value.partition(":")
+                attr = attr.split("[")[0].strip()
+                if not attr:
+                    raise InstallError(f"entry point {script_name} has no callable")
+                content = SCRIPT_TEMPLATE.format(
+                    python=self.metadata.execu,
+                    module=module.strip(),
+                    name=attr.split(".")[0],
+                    func=attr,
+                ).encode()
+                dest = env_dir / "bin" / script_name
+                if not dest.is_relative_to(env_dir / "bin") or "/" in script_name:
+                    raise InstallError(f"invalid script name {script_name}")
+                dest.write_bytes(content)
+                dest.chmod(0o755)
+                written.append((dest, record_hash(content), len(content)))
+        return written
+
+    def _compile(self, paths: Sequence[Path]) -> List[Tuple[Path, str, int]]:
+        """Compile the modules in site-packages, modules failed to compile are skipped like pip."""
+        compiled = []
+        site_packages = self.site_packages
+        for path in paths:
+            if path.suffix != ".py" or not path.is_relative_to(site_packages):
+                continue
+            cfile = cache_from_source(str(path))
+            try:
+                py_compile.compile(str(path), cfile=cfile, doraise=True)
+            except (py_compile.PyCompileError, OSError):
+                continue
+            content = Path(cfile).read_bytes()
+            compiled.append((Path(cfile), record_hash(content), len(content)))
+        return compiled
+
+    @cached_property
+    def installed(self) -> Dict[str, List[Path]]:
+        """Dist-info directories in the site-packages keyed by the canonical names."""
+        installed: Dict[str, List[Path]] = {}
+        if self.site_packages.is_dir():
+            for path in self.site_packages.iterdir():
+                if path.suffix in (".dist-info", ".egg-info"):
+                    name = canonicalize_name(path.name.split("-")[0])
+                    installed.setdefault(name, []).append(path)
+        return installed
+
+    def uninstall(self, name: str):
+        """Remove the files of the installed distribution listed in its RECORD.
+
+        Raises:
+            InstallError: The distribution has no RECORD, e.g. installed by setup.py
+        """
+        site_packages = self.site_packages
+        env_dir = self.env_dir
+        for dist_info in self.installed.get(name, []):
+            if not (record_file := dist_info / "RECORD").is_file():
+                raise InstallError(f"{dist_info.name} can't be uninstalled without RECORD")
+            dirs: Set[Path] = set()
+            for path, _, _ in csv.reader(io.StringIO(record_file.read_text(encoding="utf-8"))):
+                file = Path(os.path.normpath(site_packages / path))
+                if not file.is_relative_to(env_dir):
+                    continue
+                if file.suffix == ".py":
+                    Path(cache_from_source(str(file))).unlink(missing_ok=True)
+                file.unlink(missing_ok=True)
+                dirs.add(file.parent)
+            shutil.rmtree(dist_info)
+            # remove the empty directories, deepest first
+            for directory in sorted(dirs, key=lambda d: len(d.parts), reverse=True):
+                while directory != site_packages and directory.is_relative_to(site_packages):
+                    pycache = directory / "__pycache__"
+                    if pycache.is_dir() and not any(pycache.iterdir()):
+                        pycache.rmdir()
+                    try:
+                        directory.rmdir()
+                    except OSError:
+                        break
+                    directory = directory.parent
+
+
+def _find_dist_info(zf: zipfile.ZipFile, name: str) -> str:
+    """The dist-info directory of the package in the wheel."""
+    for entry in zf.namelist():
+        top = entry.split("/", 1)[0]
+        if top.endswith(".dist-info") and canonicalize_name(top.split("-")[0]) == name:
+            return top
+    raise InstallError(f"no dist-info of {name}")
+
+
+def _read_record(text: str) -> Dict[str, str]:
+    """Hashes of the files in RECORD keyed by their paths."""
+    return {row[0]: row[1] for row in csv.reader(io.StringIO(text)) if row}
+
+
+def _record_path(path: Path, site_packages: Path) -> str:
+    return Path(os.path.relpath(path, site_packages)).as_posix()
+
+
+def install_locked(
+    pip: "PipManager",
+    requirements: List[str],
+    pip_args: List[str],
+    backend: str = "auto",
+    wheelhouse: Optional["Wheelhouse"] = None,
+) -> bool:
+    """Install the pinned requirements by the installers of the backend, `auto`
+    installs the cached wheels in process and the others by pip.
+
+    Returns:
+        Whether all requirements were installed
+    """
+    from start.core.metadata import EnvMetadata
+
+    installers: List[Installer] = []
+    if backend == "auto" and wheelhouse:
+        installers.append(WheelInstaller(EnvMetadata(pip.execu), wheelhouse))
+    installers.append(PipInstaller(pip))
+    for installer in installers:
+        if not (requirements := installer.install(requirements, pip_args)):
+            return True
+    return False
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+from urllib.parse import unquote, urlparse
+
+import rtoml
+from packaging.utils import canonicalize_name
+
+from start.core.requirements import constraint_args
+from start.logger import Error, Info, Warn
+
+if TYPE_CHECKING:
+    from start.core.dependency import DependencyManager
+    from start.core.pip_manager import PipManager
+
+LOCK_FILE = "start.lock"
+DEFAULT_GROUP = "default"
+
+
+@dataclass
+class LockedPackage:
+    """A package pinned in the lockfile.
+
+    Args:
+        name: Canonical name of the package
+        version: Exact version resolved by pip
+        url: Url of the resolved distribution
+        hashes: Hashes of the distribution in format `<algorithm>:<digest>`
+        markers: Environment markers declared by the requirement
+        is_direct: Whether the package is required by a direct url
+    """
+
+    name: str
+    version: str
+    url: str = ""
+    hashes: List[str] = field(default_factory=list)
+    markers: str = ""
+    is_direct: bool = False
+
+    @classmethod
+    def from_report(cls, item: Dict, markers: str = "") -> "LockedPackage":
+        """Create from an install item of pip installation report."""
+        download_info = item.get("download_info", {})
+        url = download_info.get("url", "")
+        archive_info = download_info.get("archive_info", {})
+        hashes = archive_info.get("hashes") or {}
+        if not hashes and (legacy_hash := archive_info.get("hash")):
+            algorithm, _, digest = legacy_hash.partition("=")
+            hashes = {algorithm: digest}
+        if not hashes and url.startswith("file://") and "dir_info" not in download_info:
+            hashes = {"sha256": file_hash(unquote(urlparse(url).path))}
+        return cls(
+            name=canonicalize_name(item["metadata"]["name"]),
+            version=item["metadata"]["version"],
+            url=url,
+            hashes=[f"{algorithm}:{digest}" for algorithm, digest in sorted(hashes.items())],
+            markers=markers,
+            is_direct=item.get("is_direct", False),
+        )
+
+    def requirement(self, with_hashes: bool = True) -> str:
+        """Requirement line in requirements.txt format."""
+        line = f"{self.name} @ {self.url}" if self.is_direct else f"{self.name}=={self.version}"
+        if self.markers:
+            line += f" ; {self.markers}"
+        if with_hashes:
+            line += "".join(f" --hash={_hash}" for _hash in self.hashes)
+        return line
+
+
+def file_hash(path: str | Path) -> str:
+    """Sha256 of a local file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_hash(dm: "DependencyManager") -> str:
+    """Hash of the declared dependencies of all groups, to check the lockfile is outdated."""
+    declared: Dict[str, Any] = {
+        group: sorted(map(str, dm.packages(group if group != DEFAULT_GROUP else "")))
+        for group in lock_groups(dm)
+    }
+    # constraints and options of requirements file change the resolution as well
+    if dm.constraints or dm.pip_options:
+        declared = {
+            "groups": declared,
+            "constraints": sorted(dm.constraints),
+            "options": dm.pip_options,
+        }
+    digest = hashlib.sha256(json.dumps(declared, sort_keys=True).encode("utf-8"))
+    return "sha256:" + digest.hexdigest()
+
+
+def lock_groups(dm: "DependencyManager") -> List[str]:
+    """Groups to lock, the default group is the project dependencies."""
+    groups = [DEFAULT_GROUP]
+    if dm.is_toml_file:
+        groups.extend(dm.project.get("optional-dependencies", {}))
+    return groups
+
+
+class Lockfile:
+    """Exact pins, hashes and markers of the resolved dependencies of each group.
+
+    Each optional group is resolved together with the project dependencies, so
+    a group contains every package needed to install it on top of the project.
+
+    Args:
+        path: Path of the lockfile
+    """
+
+    version = 1
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.content_hash = ""
+        self.python = ""
+        self.platform = ""
+        self.groups: Dict[str, List[LockedPackage]] = {}
+
+    @classmethod
+    def for_config(cls, config_file: str | Path) -> "Lockfile":
+        """The lockfile next to the dependency file."""
+        return cls(Path(config_file).with_name(LOCK_FILE))
+
+    def exists(self) -> bool:
+        return self.path.is_file()
+
+    def load(self) -> "Lockfile":
+        """Load pinned packages from the lockfile."""
+        data = rtoml.load(self.path)
+        if data.get("version") != self.version:
+            Error(f"Unsupported lockfile version: {data.get('version')}")
+            return self
+        self.content_hash = data.get("content-hash", "")
+        self.python = data.get("python", "")
+        self.platform = data.get("platform", "")
+        self.groups = {
+            group: [LockedPackage(**package) for package in packages]
+            for group, packages in data.get("groups", {}).items()
+        }
+        return self
+
+    def save(self):
+        """Write the lockfile atomically."""
+        data = {
+            "version": self.version,
+            "content-hash": self.content_hash,
+            "python": self.python,
+            "platform": self.platform,
+            "groups": {
+                group: [asdict(package) for package in packages]
+                for group, packages in self.groups.items()
+            },
+        }
+        tmp_file = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        rtoml.dump(data, tmp_file, pretty=True)
+        os.replace(tmp_file, self.path)
+
+    def is_fresh(self, dm: "DependencyManager", environment: Dict[str, str]) -> bool:
+        """Whether the lockfile matches the declared dependencies and the environment.
+
+        Args:
+            dm: Dependency manager of the declared dependencies
+            environment: Marker environment of the target interpreter
+        """
+        return (
+            self.content_hash == content_hash(dm)
+            and self.python in ("", environment["python_version"])
+            and self.platform in ("", environment["sys_platform"])
+        )
+
+    def requirements(
+        self, group: str = DEFAULT_GROUP, skip: Optional[Callable[[str], bool]] = None
+    ) -> List[str]:
+        """Requirement lines of the pinned packages in the group. Hashes are
+        only included when all packages have hashes, which enables pip's
+        hash-checking mode.
+
+        Args:
+            group: Group of the packages
+            skip: Skip the package if return True, receive the requirement without hashes
+        """
+        packages = self.groups.get(group or DEFAULT_GROUP, [])
+        with_hashes = all(package.hashes for package in packages)
+        return [
+            package.requirement(with_hashes)
+            for package in packages
+            if not (skip and skip(package.requirement(with_hashes=False)))
+        ]
+
+    def lock(self, dm: "DependencyManager", pip: "PipManager", pip_args: List[str]) -> bool:
+        """Resolve the dependencies of every group by pip and pin the result.
+
+        Returns:
+            Whether all groups were resolved
+        """
+        groups: Dict[str, List[LockedPackage]] = {}
+        for group in lock_groups(dm):
+            Info(f"Resolving dependencies of group '{group}'")
+            declared = dm.packages()
+            if group != DEFAULT_GROUP:
+                declared += dm.packages(group)
+            if not declared:
+                groups[group] = []
+                continue
+            with constraint_args(dm.constraints) as constraints:
+                args = [*constraints, *dm.pip_options, *pip_args]
+                report = pip.resolve(*map(str, declared), pip_args=args)
+            if report is None:
+                Error(f"Failed to resolve dependencies of group '{group}'")
+                return False
+            markers = {canonicalize_name(dep.name): dep.markers for dep in declared if dep.name}
+            packages = []
+            for item in report.get("install", []):
+                name = canonicalize_name(item["metadata"]["name"])
+                packages.append(LockedPackage.from_report(item, markers.get(name, "")))
+            groups[group] = sorted(packages, key=lambda package: package.name)
+            if not all(package.hashes for package in packages):
+                Warn(f"Some packages in group '{group}' have no hash, hash checking is disabled")
+            environment = report.get("environment", {})
+            self.python = environment.get("python_version", self.python)
+            self.platform = environment.get("sys_platform", self.platform)
+        self.groups = groups
+        self.content_hash = content_hash(dm)
+        return True
+
+
+def find_lockfile(config_file: Optional[Path]) -> Optional[Lockfile]:
+    """Find the lockfile next to the dependency file."""
+    if config_file and (lockfile := Lockfile.for_config(config_file)).exists():
+        return lockfile.load()
+    return None
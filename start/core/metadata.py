@@ -0,0 +1,309 @@
+import hashlib
+import json
+import os
+import site
+import sys
+import sysconfig
+from functools import cached_property
+from importlib.metadata import Distribution, PathDistribution
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from packaging.markers import default_environment
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+
+from start.core import warm
+from start.core.config import DATA_DIR
+from start.core.graph import PackageGraph
+from start.utils import find_executable, read_env_config
+
+# Fields displayed by `start show`, same order as `pip show`
+SHOW_FIELDS = ("Name", "Version", "Summary", "Home-page", "Author", "Author-email", "License")
+INDEX_DIR = DATA_DIR / "cache" / "graph"
+
+
+class EnvMetadata:
+    """Read the metadata of installed packages directly from the site-packages
+    of an environment, so that inspecting packages doesn't need to start pip.
+
+    Args:
+        executable: The python executable path of the environment
+    """
+
+    def __init__(self, executable: str | None = None):
+        self.execu = executable or find_executable()
+
+    @cached_property
+    def env_dir(self) -> Optional[Path]:
+        """The virtual environment directory of the executable, None if it's not in a venv."""
+        env_dir = Path(self.execu).absolute().parent.parent
+        return env_dir if (env_dir / "pyvenv.cfg").is_file() else None
+
+    @cached_property
+    def config(self) -> Dict[str, str]:
+        """Key-value pairs in pyvenv.cfg of the environment."""
+        return read_env_config(self.env_dir) if self.env_dir else {}
+
+    @cached_property
+    def python_version(self) -> str:
+        """Full python version of the environment, e.g. 3.11.7"""
+        version = self.config.get("version_info") or self.config.get("version")
+        if not version:
+            return ".".join(map(str, sys.version_info[:3]))
+        return ".".join(version.split(".")[:3])
+
+    @cached_property
+    def site_packages(self) -> List[Path]:
+        """Site-packages directories of the environment, in the order of sys.path."""
+        if not self.env_dir:
+            paths = [*site.getsitepackages(), site.getusersitepackages()]
+        else:
+            paths = [
+                *self.env_dir.glob("lib/python*/site-packages"),
+                *self.env_dir.glob("lib64/python*/site-packages"),
+                self.env_dir / "Lib" / "site-packages",
+            ]
+            if self.config.get("include-system-site-packages", "").lower() == "true":
+                paths.extend(self._system_site_packages())
+
+        found, seen = [], set()
+        for path in map(Path, paths):
+            if path.is_dir() and (real_path := path.resolve()) not in seen:
+                seen.add(real_path)
+                found.append(path)
+        return found
+
+    def _system_site_packages(self) -> List[str]:
+        """Site-packages of the base interpreter which the environment created from."""
+        if not (home := self.config.get("home")):
+            return []
+        base = str(Path(home).parent) if os.name != "nt" else home
+        version = ".".join(self.python_version.split(".")[:2])
+        config_vars = {
+            "base": base,
+            "platbase": base,
+            "installed_base": base,
+            "installed_platbase": base,
+            "py_version_short": version,
+            "py_version_nodot": version.replace(".", ""),
+        }
+        return [sysconfig.get_path(key, vars=config_vars) for key in ("purelib", "platlib")]
+
+    @cached_property
+    def fingerprint(self) -> tuple:
+        """Mtimes of pyvenv.cfg and the site-packages, they change when packages
+        are installed or removed, used to validate the warm caches."""
+        config = [self.env_dir / "pyvenv.cfg"] if self.env_dir else []
+        return (self.execu, *warm.fingerprint([*config, *self.site_packages]))
+
+    @cached_property
+    def marker_environment(self) -> Dict[str, str]:
+        """Environment to evaluate the requirement markers in the target environment."""
+        environment = default_environment()
+        environment["python_full_version"] = self.python_version
+        environment["python_version"] = ".".join(self.python_version.split(".")[:2])
+        environment["extra"] = ""
+        return environment
+
+    @cached_property
+    def installed(self) -> Dict[str, Dict]:
+        """All installed packages keyed by the canonical package name, each value
+        contains the metadata path, version and requirements of the package.
+        """
+        if warm.enabled() and (cached := warm.get("installed", self.execu, self.fingerprint)):
+            return cached
+        installed: Dict[str, Dict] = {}
+        for path, entry in RequirementIndex(self).load().items():
+            if entry["name"]:
+                # the first found distribution will be imported, same as sys.path
+                installed.setdefault(entry["name"], {**entry, "path": path})
+        if warm.enabled():
+            warm.put("installed", self.execu, self.fingerprint, installed)
+        return installed
+
+    def parse_distribution(self, path: str) -> Dict:
+        """Parse the name, version and requirements from the metadata directory.
+        The requirements of extras and mismatched markers are ignored like `pip show`.
+        """
+        dist = PathDistribution(Path(path))
+        requires: Dict[str, None] = {}
+        for line in dist.requires or []:
+            try:
+                requirement = Requirement(line)
+            except InvalidRequirement:
+                continue
+            if requirement.marker and not requirement.marker.evaluate(self.marker_environment):
+                continue
+            requires[canonicalize_name(requirement.name)] = None
+        name = dist.metadata["Name"]
+        return {
+            "name": canonicalize_name(name) if name else "",
+            "version": dist.version or "",
+            "requires": list(requires),
+        }
+
+    def packages(self) -> List[str]:
+        """Get the canonical names of all installed packages."""
+        return sorted(self.installed)
+
+    def get(self, package: str) -> Optional[Distribution]:
+        """Get the installed distribution by package name."""
+        if not (entry := self.installed.get(canonicalize_name(package))):
+            return None
+        return PathDistribution(Path(entry["path"]))
+
+    @cached_property
+    def graph(self) -> PackageGraph:
+        """Requirement graph of the installed packages, keyed by the canonical names."""
+        if warm.enabled() and (cached := warm.get("graph", self.execu, self.fingerprint)):
+            return cached
+        graph = PackageGraph({name: self.installed[name]["requires"] for name in self.packages()})
+        if warm.enabled():
+            warm.put("graph", self.execu, self.fingerprint, graph)
+        return graph
+
+    def requires(self, package: str) -> List[str]:
+        """Get the canonical names of packages which the package requires."""
+        if canonicalize_name(package) not in self.installed:
+            return []
+        return self.graph.requires(canonicalize_name(package))
+
+    def required_by(self, package: str) -> List[str]:
+        """Get the canonical names of installed packages which require the package."""
+        return self.graph.required_by(canonicalize_name(package))
+
+    def is_satisfied(self, requirement: str, _seen: Optional[set] = None) -> bool:
+        """Check whether the requirement is satisfied by installed packages.
+        Requirements of the extras are checked recursively, direct urls and
+        unparsable requirements are treated as unsatisfied and left to pip.
+
+        Args:
+            requirement: Requirement string in PEP 508 format
+        """
+        try:
+            req = Requirement(requirement)
+        except InvalidRequirement:
+            return False
+        if req.marker and not req.marker.evaluate(self.marker_environment):
+            return True
+        name = canonicalize_name(req.name)
+        if req.url or not (entry := self.installed.get(name)):
+            return False
+        if not req.specifier.contains(entry["version"], prereleases=True):
+            return False
+        if not req.extras:
+            return True
+
+        seen = _seen if _seen is not None else set()
+        if (key := (name, tuple(sorted(req.extras)))) in seen:
+            return True
+        seen.add(key)
+        for line in PathDistribution(Path(entry["path"])).requires or []:
+            try:
+                extra_req = Requirement(line)
+            except InvalidRequirement:
+                continue
+            if not extra_req.marker or not any(
+                extra_req.marker.evaluate({**self.marker_environment, "extra": extra})
+                for extra in req.extras
+            ):
+                continue
+            extra_req.marker = None
+            if not self.is_satisfied(str(extra_req), seen):
+                return False
+        return True
+
+    def show(self, package: str) -> Optional[Dict[str, str]]:
+        """Get the information of the package like `pip show`.
+
+        Args:
+            package: Package name
+        Returns:
+            info: Field name and value of package information, None if not installed.
+        """
+        if not (dist := self.get(package)):
+            return None
+        info = {field: dist.metadata[field] or "" for field in SHOW_FIELDS}
+        info["Location"] = str(Path(str(dist.locate_file(""))))
+        info["Requires"] = ", ".join(self.requires(package))
+        info["Required-by"] = ", ".join(self.required_by(package))
+        return info
+
+
+class RequirementIndex:
+    """On-disk index of the installed packages' requirements in an environment.
+
+    Entries are keyed by the metadata directory and its mtime, so only added or
+    changed packages will be parsed again and removed packages will be dropped
+    when loading the index.
+
+    Args:
+        metadata: Metadata of the environment to index
+        cache_dir: Directory to store the index file, default to $START_DATA_DIR/cache/graph
+    """
+
+    format_version = 1
+
+    def __init__(self, metadata: EnvMetadata, cache_dir: Path | None = None):
+        self.metadata = metadata
+        site_packages = "\n".join(str(path.resolve()) for path in metadata.site_packages)
+        key = hashlib.sha1(site_packages.encode("utf-8")).hexdigest()[:16]
+        self.path = (cache_dir or INDEX_DIR) / f"{key}.json"
+
+    def read(self) -> Dict[str, Dict]:
+        """Read the cached entries, return empty dict if the index is invalid."""
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if (
+            not isinstance(index, dict)
+            or index.get("version") != self.format_version
+            or index.get("python_version") != self.metadata.python_version
+        ):
+            return {}
+        return index.get("entries", {})
+
+    def write(self, entries: Dict[str, Dict]):
+        """Write the entries to the index file atomically."""
+        index = {
+            "version": self.format_version,
+            "python_version": self.metadata.python_version,
+            "entries": entries,
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_file.write_text(json.dumps(index), encoding="utf-8")
+            os.replace(tmp_file, self.path)
+        except OSError:
+            # the index is only a cache, fail to write it shouldn't break the command
+            pass
+
+    def load(self) -> Dict[str, Dict]:
+        """Load the index and update the changed entries.
+
+        Returns:
+            entries: Package's name, version and requirements keyed by metadata path
+        """
+        cached = self.read()
+        entries, changed = {}, False
+        for site_packages in self.metadata.site_packages:
+            with os.scandir(site_packages) as it:
+                for item in it:
+                    if not item.name.endswith((".dist-info", ".egg-info")):
+                        continue
+                    mtime = item.stat().st_mtime_ns
+                    if (entry := cached.get(item.path)) and entry.get("mtime") == mtime:
+                        entries[item.path] = entry
+                        continue
+                    entries[item.path] = {
+                        "mtime": mtime,
+                        **self.metadata.parse_distribution(item.path),
+                    }
+                    changed = True
+        if changed or len(entries) != len(cached):
+            self.write(entries)
+        return entries
@@ -1,23 +1,157 @@
+import asyncio
+import json
 import os
 import re
+import tempfile
+from asyncio.subprocess import PIPE
+from dataclasses import dataclass
 from functools import cached_property
-from subprocess import PIPE, Popen, check_output
-from threading import Lock, Thread
-from typing import Dict, Generator, List, Optional, Tuple
+from subprocess import DEVNULL, CalledProcessError, check_output
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlparse
 
+from packaging.utils import canonicalize_name
+
+from start.core import trace, warm
 from start.core.dependency import Dependency
+from start.core.metadata import EnvMetadata
 from start.logger import Error, Info, Success, Warn
 from start.utils import find_executable
 
+if TYPE_CHECKING:
+    from start.core.wheelhouse import Wheelhouse
+
 # subprocess use gbk in PIPE decoding and can't to change, due to
 # UnicodeDecodeError when some package's meta data contains invalid characters.
 # Refer: https://github.com/python/cpython/issues/50385
 os.environ["PYTHONIOENCODING"] = "utf-8"
 
-BRANCH = "├─"
-END = "└─"
-LINE = "│ "
-INDENT = "  "
+# first pip version supports `pip install --report`
+REPORT_PIP_VERSION = (22, 2)
+# max length of an output line, pip may print long lines like the dependency conflicts
+LINE_LIMIT = 1024 * 1024
+
+
+def decode(output: bytes) -> str:
+    """Decode the output to utf8 or gbk."""
+    try:
+        return output.decode("utf8")
+    except UnicodeDecodeError:
+        return output.decode("gbk")
+
+
+@dataclass
+class InstalledPackage:
+    """A package installed by pip install.
+
+    Args:
+        name: Canonical name of the package
+        version: Installed version
+        requested: Whether the package was requested, not installed as a dependency
+        download_size: Size of the archive in bytes, None if it's not a local file
+    """
+
+    name: str
+    version: str
+    requested: bool = False
+    download_size: Optional[int] = None
+
+    @classmethod
+    def from_report(cls, item: Dict) -> "InstalledPackage":
+        """Create from an install item of pip installation report."""
+        url = item.get("download_info", {}).get("url", "")
+        download_size = None
+        if url.startswith("file://") and os.path.isfile(path := unquote(urlparse(url).path)):
+            download_size = os.path.getsize(path)
+        return cls(
+            name=canonicalize_name(item["metadata"]["name"]),
+            version=item["metadata"]["version"],
+            requested=item.get("requested", False),
+            download_size=download_size,
+        )
+
+
+class PipProcess:
+    """A pip command running in the event loop, iterate it to get the output
+    lines as `(stream_name, line)` when they are written, stream name is
+    `stdout` or `stderr`. The outputs are also collected in `stdout` and
+    `stderr`, `return_code` is set when the iteration finished.
+
+    The process is killed if the iteration is cancelled, closed early or
+    exceeded the timeout, and the output readers are always joined.
+
+    Args:
+        cmd: Command to run
+        timeout: Seconds to wait for the process, raise `asyncio.TimeoutError` after it
+    """
+
+    def __init__(self, cmd: List[str], timeout: Optional[float] = None):
+        self.cmd = cmd
+        self.timeout = timeout
+        self.stdout: List[str] = []
+        self.stderr: List[str] = []
+        self.return_code: Optional[int] = None
+
+    def __aiter__(self) -> AsyncIterator[Tuple[str, str]]:
+        return self._stream()
+
+    def __await__(self):
+        return self.wait().__await__()
+
+    async def wait(self) -> "PipProcess":
+        """Wait for the process to finish and collect all outputs."""
+        async for _ in self:
+            pass
+        return self
+
+    async def _stream(self) -> AsyncIterator[Tuple[str, str]]:
+        trace.count("subprocesses")
+        process = await asyncio.create_subprocess_exec(
+            *self.cmd, stdout=PIPE, stderr=PIPE, limit=LINE_LIMIT
+        )
+        queue: asyncio.Queue[Tuple[str, Optional[str]]] = asyncio.Queue()
+
+        async def read(name: str, reader: asyncio.StreamReader):
+            try:
+                async for line in reader:
+                    await queue.put((name, decode(line).rstrip("\r\n")))
+            finally:
+                # the stream is closed even if reading failed, e.g. a line over the limit
+                queue.put_nowait((name, None))
+
+        assert process.stdout and process.stderr, "stdout and stderr should be set here"
+        readers = {
+            "stdout": asyncio.create_task(read("stdout", process.stdout)),
+            "stderr": asyncio.create_task(read("stderr", process.stderr)),
+        }
+        loop = asyncio.get_running_loop()
+        deadline = None if self.timeout is None else loop.time() + self.timeout
+
+        def remaining() -> Optional[float]:
+            return None if deadline is None else max(0, deadline - loop.time())
+
+        try:
+            opened = len(readers)
+            while opened:
+                name, line = await asyncio.wait_for(queue.get(), remaining())
+                if line is None:
+                    # raise the error of the reader if it failed
+                    await readers[name]
+                    opened -= 1
+                    continue
+                (self.stdout if name == "stdout" else self.stderr).append(line)
+                yield name, line
+            self.return_code = await asyncio.wait_for(process.wait(), remaining())
+        finally:
+            if process.returncode is None:
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+                await process.wait()
+            for reader in readers.values():
+                reader.cancel()
+            await asyncio.gather(*readers.values(), return_exceptions=True)
 
 
 class PipManager:
@@ -26,64 +160,215 @@ class PipManager:
     Args:
         executable: The python executable path
         verbose: Whether to display the pip execution progress
+        wheelhouse: Save the wheels to and install packages from the wheelhouse
     """
 
     stdout: List[str]
     stderr: List[str]
     return_code: int
-
-    def __init__(self, executable: str | None = None, verbose: bool = False):
+    installed: List["InstalledPackage"]
+
+    def __init__(
+        self,
+        executable: str | None = None,
+        verbose: bool = False,
+        wheelhouse: Optional["Wheelhouse"] = None,
+    ):
         if not executable:
             executable = find_executable()
 
         self.cmd = [executable, "-m", "pip"]
         self.execu = executable
         self.verbose = verbose
+        self.wheelhouse = wheelhouse
         if self.verbose and (not self.version or self.version[0] < 24):
             Warn("Option '--verbose' is only supported in pip version >= 24")
             self.verbose = False
 
     @cached_property
     def version(self) -> Optional[tuple[int, int]]:
-        """Get the pip version."""
-        output = check_output(self.cmd + ["--version"], text=True)
+        """Get the pip version, None if pip is not available."""
+        if warm.enabled():
+            fingerprint = EnvMetadata(self.execu).fingerprint
+            if version := warm.get("pip_version", self.execu, fingerprint):
+                return version
+        try:
+            trace.count("subprocesses")
+            output = check_output(self.cmd + ["--version"], text=True, stderr=DEVNULL)
+        except (CalledProcessError, OSError):
+            return None
         if _match := re.search(r"(\d+)\.(\d+)(\.(\d+))?", output):
-            return int(_match.group(1)), int(_match.group(2))
+            version = int(_match.group(1)), int(_match.group(2))
+            if warm.enabled():
+                warm.put("pip_version", self.execu, fingerprint, version)
+            return version
         return None
 
-    def execute(self, cmd: List[str]):
-        """Execute the pip command."""
-        cmd = self.cmd + cmd
-        with Popen(cmd, stdout=PIPE, stderr=PIPE, bufsize=1, universal_newlines=True) as process:
-            if self.verbose:
-                self.capture_outputs(process)
-            else:
-                stdout, stderr = process.communicate()
-                self.stdout = stdout.strip().split("\n")
-                self.stderr = stderr.strip().split("\n")
-        self.return_code = process.returncode
+    def stream(self, cmd: List[str], timeout: Optional[float] = None) -> "PipProcess":
+        """Run the pip command and stream the output, iterate the returned
+        process in an event loop to get the output lines.
+
+        Args:
+            cmd: Arguments of the pip command
+            timeout: Seconds to wait for the command, the process will be killed after it
+        """
+        return PipProcess(self.cmd + cmd, timeout)
+
+    async def execute_async(self, cmd: List[str], timeout: Optional[float] = None) -> "PipProcess":
+        """Execute the pip command in the running event loop, several commands
+        can be executed concurrently by `asyncio.gather`. The outputs of the
+        last finished command are also set to the manager.
+
+        Returns:
+            process: The finished pip process with its outputs and return code
+        """
+        process = self.stream(cmd, timeout)
+        progress = task = None
+        try:
+            async for name, line in process:
+                if not self.verbose:
+                    continue
+                if name == "stderr":
+                    Error(line)
+                elif match := re.match(r"Progress (\d+) of (\d+)", line):
+                    if progress is None:
+                        from rich.progress import Progress
+
+                        progress = Progress()
+                        progress.start()
+                        task = progress.add_task(description="\t", total=int(match.group(2)))
+                    progress.update(task, completed=int(match.group(1)))
+                else:
+                    if progress is not None:
+                        progress.stop()
+                        progress = None
+                    print(line)
+        finally:
+            if progress is not None:
+                progress.stop()
+        self.stdout, self.stderr = process.stdout, process.stderr
+        self.return_code = process.return_code
+        return process
+
+    def execute(self, cmd: List[str], timeout: Optional[float] = None):
+        """Execute the pip command, a blocking wrapper of `execute_async`."""
+        with trace.phase(f"pip {cmd[0]}" if cmd else "pip"):
+            asyncio.run(self.execute_async(cmd, timeout))
         return self
 
-    def install(self, *packages: str, pip_args: list[str]) -> List[str]:
-        """Install packages.
+    @property
+    def supports_report(self) -> bool:
+        """Whether pip supports the installation report, added in pip 22.2."""
+        return bool(self.version and self.version >= REPORT_PIP_VERSION)
+
+    def install(
+        self, *packages: str, pip_args: list[str], editable: Sequence[str] = ()
+    ) -> List[str]:
+        """Install packages, the installed packages are set to `installed`.
 
         Args:
             packages: Packages to install
-            upgrade: Upgrade packages
+            pip_args: Extra arguments to pass to pip install
+            editable: Local projects to install in editable mode in the same pip call
         Returns:
-            packages: Success installed packages
+            packages: Packages installed or already satisfied
         """
-        if not packages:
+        if not packages and not editable:
             return []
         if self.verbose and not any(arg.startswith("--progress-bar") for arg in pip_args):
             pip_args.append("--progress-bar=raw")
-        Info("Start install packages: " + ", ".join(packages))
-        self.execute(["install", *packages, *pip_args]).show_output()
+        Info("Start install packages: " + ", ".join([*packages, *editable]))
+        if self.wheelhouse and packages:
+            filled = self.wheelhouse.fill(self, *packages, pip_args=pip_args)
+            pip_args = [*pip_args, *self.wheelhouse.pip_args(no_index=filled)]
+        editable_args = [arg for path in editable for arg in ("-e", path)]
+        self._install([*packages, *editable_args, *pip_args], requested=packages)
+        if self.return_code == 0:
+            return list(packages)
+        metadata = EnvMetadata(self.execu)
+        return [package for package in packages if metadata.is_satisfied(package)]
+
+    def install_locked(self, requirements: List[str], pip_args: list[str]) -> bool:
+        """Install the pinned requirements without resolving dependencies,
+        the installed packages are set to `installed`.
 
-        installed_packages = set(
-            package for line in self.stdout for package in self.parse_output(line)
-        )
-        return [package for package in packages if Dependency(package).name in installed_packages]
+        Args:
+            requirements: Requirement lines with exact versions, hashes and markers
+        Returns:
+            Whether the requirements were installed successfully
+        """
+        if not requirements:
+            return True
+        Info(f"Start install {len(requirements)} locked packages")
+        with tempfile.TemporaryDirectory(prefix="start-") as tmp_dir:
+            require_file = os.path.join(tmp_dir, "requirements.txt")
+            with open(require_file, "w", encoding="utf-8") as f:
+                f.write("\n".join(requirements))
+            install_args = ["--no-deps", "-r", require_file]
+            if self.wheelhouse:
+                filled = self.wheelhouse.fill(self, *install_args, pip_args=pip_args)
+                pip_args = [*pip_args, *self.wheelhouse.pip_args(no_index=filled)]
+            self._install([*install_args, *pip_args], requested=requirements)
+        return self.return_code == 0
+
+    def _install(self, args: List[str], requested: Sequence[str]):
+        """Run pip install and collect the installed packages from the
+        installation report, or from the output if pip is too old to report.
+        """
+        use_report = self.supports_report and "--report" not in args
+        with tempfile.TemporaryDirectory(prefix="start-") as tmp_dir:
+            report_file = os.path.join(tmp_dir, "report.json")
+            report_args = ["--report", report_file] if use_report else []
+            self.execute(["install", *args, *report_args]).show_output()
+            if not use_report:
+                self.installed = self.parse_installed(requested)
+                return
+            try:
+                with open(report_file, encoding="utf-8") as f:
+                    report = json.load(f)
+            except (OSError, ValueError):
+                # pip failed before resolving
+                report = {}
+        self.installed = [InstalledPackage.from_report(item) for item in report.get("install", [])]
+        if self.return_code != 0 and self.installed:
+            # the report is written before installing, keep packages really installed
+            installed = EnvMetadata(self.execu).installed
+            self.installed = [
+                package
+                for package in self.installed
+                if installed.get(package.name, {}).get("version") == package.version
+            ]
+
+    def resolve(self, *packages: str, pip_args: list[str]) -> Optional[Dict]:
+        """Resolve the packages and their dependencies without installing them.
+
+        Args:
+            packages: Packages to resolve
+        Returns:
+            report: pip installation report, None if failed to resolve
+        """
+        if not self.supports_report:
+            Error("Resolving packages requires pip version >= 22.2")
+            return None
+        with tempfile.TemporaryDirectory(prefix="start-") as tmp_dir:
+            report_file = os.path.join(tmp_dir, "report.json")
+            self.execute(
+                [
+                    "install",
+                    "--dry-run",
+                    "--ignore-installed",
+                    "--quiet",
+                    "--report",
+                    report_file,
+                    *packages,
+                    *pip_args,
+                ]
+            )
+            if self.return_code != 0:
+                Error("\n".join(self.stderr))
+                return None
+            with open(report_file, encoding="utf-8") as f:
+                return json.load(f)
 
     def uninstall(self, *packages: str, pip_args: list[str]) -> List[str]:
         """Uninstall packages.
@@ -98,54 +383,9 @@ class PipManager:
         self.execute(["uninstall", *packages, *pip_args]).show_output()
         return [*packages]
 
-    def capture_outputs(self, process: Popen):
-        """Set the outputs that to be parse.
-        Thanks to StackOverflow:
-            https://stackoverflow.com/questions/2715847/read-streaming-input-from-subprocess-communicate/17698359
-        """
-
-        self.stdout, self.stderr = [], []
-        _lock = Lock()
-        assert process.stdout and process.stderr, "stdout and stderr should be set here"
-
-        def read_stdout():
-            from rich.progress import Progress
-
-            assert process.stdout is not None
-            # wait for the first data to read
-            current_task = None
-            with Progress() as progress:
-                for line in process.stdout:
-                    if match := re.match(r"Progress (\d+) of (\d+)", line):
-                        if current_task is None:
-                            current_task = progress.add_task(
-                                description="\t", total=int(match.group(2))
-                            )
-                        progress.update(current_task, completed=int(match.group(1)))
-                    else:
-                        if current_task is not None:
-                            progress.remove_task(current_task)
-                            current_task = None
-                        with _lock:
-                            print(line, end="")
-                        self.stdout.append(line.strip())
-
-        # Guess stdout and stderr will close  together when the process is closed
-        # So don't need to join this thread here
-        Thread(target=read_stdout).start()
-
-        for line in process.stderr:
-            line = line.strip()
-            with _lock:
-                Error(line)
-            self.stderr.append(line)
-
     def decode(self, output: bytes):
         """Decode the output to utf8 or gbk."""
-        try:
-            return output.decode("utf8")
-        except UnicodeDecodeError:
-            return output.decode("gbk")
+        return decode(output)
 
     def show_output(self):
         """Display the pip command output"""
@@ -161,75 +401,25 @@ class PipManager:
         if self.stderr:
             Error("\n".join(self.stderr))
 
-    def parse_output(self, output: str) -> List[str]:
-        """Parse the output of pip to extract the installed package name."""
-        output = output.strip()
-        if output.startswith("Successfully installed"):
-            return [name.rsplit("-", 1)[0] for name in output.split()[2:]]
-        if output.startswith("Requirement already satisfied:"):
-            return [output.split()[3].split("=")[0]]
-        return []
-
-    def parse_list_output(self) -> List[str]:
-        """Parse the pip list output to get the installed packages' name."""
-        return [package.lower().split()[0] for package in self.stdout[2:]]
-
-    def analyze_packages_require(self, *packages: str) -> List[Dict]:
-        """Analyze the packages require by pip show output, display as tree.
+    def parse_installed(self, requested: Sequence[str]) -> List["InstalledPackage"]:
+        """Parse the installed packages from the output of pip install, which is
+        the fallback of the installation report for pip < 22.2.
 
         Args:
-            packages: Packages to analyze
-        Returns:
-            analyzed_packages: Requirement analyzed packages.
+            requested: Requirements passed to pip install
         """
-        self.execute(["show", *packages])
-
-        # format of pip show output:
-        packages_require, name = {}, ""
+        requested_names = {canonicalize_name(Dependency(package).name) for package in requested}
+        installed = []
         for line in self.stdout:
-            if line.startswith("Name"):
-                name = Dependency(line.lstrip("Name:").strip()).name
-            if line.startswith("Requires") and name:
-                requires = line.lstrip("Requires:").strip().split(", ")
-                packages_require[name] = [Dependency(r).name for r in requires if r]
-
-        # parse require tree
-        requires_set = set(packages_require.keys())
-        for name, requires in packages_require.items():
-            for i, require in enumerate(requires):
-                if require in requires_set:
-                    requires_set.remove(require)
-                requires[i] = {require: packages_require.get(require, [])}
-
-        return [{name: info} for name, info in packages_require.items() if name in requires_set]
-
-    @classmethod
-    def generate_dependency_tree(
-        cls,
-        name: str,
-        dependencies: List[Dict],
-        last_item: bool = False,
-        prev_prefix: str = "",
-    ) -> Generator[Tuple[str, str], None, None]:
-        """Display dependencies as a tree
+            line = line.strip()
+            if not line.startswith("Successfully installed"):
+                continue
+            for item in line.split()[2:]:
+                name, _, version = item.rpartition("-")
+                name = canonicalize_name(name)
+                installed.append(InstalledPackage(name, version, name in requested_names))
+        return installed
 
-        Args:
-            name: Current package name.
-            dependencies: Current package's dependencies.
-            last_item: Whether current package is lats item in tree.
-            prev_prefix: Tree prefix of previous level's package
-        Return:
-            Package name and Corresponding string of package in tree.
-        """
-        if prev_prefix.endswith(END):
-            prev_prefix = prev_prefix.replace(END, INDENT)
-        if prev_prefix.endswith(BRANCH):
-            prev_prefix = prev_prefix.replace(BRANCH, LINE)
-        prefix = prev_prefix + (END if last_item else BRANCH)
-        yield name, prefix
-
-        for i, dependency in enumerate(dependencies):
-            for name, sub_dependencies in dependency.items():
-                yield from cls.generate_dependency_tree(
-                    name, sub_dependencies, i == len(dependencies) - 1, prefix
-                )
+    def parse_list_output(self) -> List[str]:
+        """Parse the pip list output to get the installed packages' name."""
+        return [package.lower().split()[0] for package in self.stdout[2:]]
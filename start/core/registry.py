@@ -0,0 +1,189 @@
+"""Registry of the virtual environments in the data directory.
+
+The registry is a json file in the cache of data directory, so listing and finding
+environments don't need to probe every directory, which is slow on network
+storage. It's updated when an environment is created and refreshed
+incrementally by the mtime of the data directory and the site-packages.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from start.core.config import DEFAULT_ENV
+from start.utils import is_env_dir, read_env_config
+
+REGISTRY_FILE = "registry.json"
+# last used time is only written when it's older than the interval, so
+# activating an environment doesn't always write the registry
+TOUCH_INTERVAL = 60
+
+
+# fields of a record, the packages and size are computed when the mtime of
+# site-packages changed
+RECORD_FIELDS = ("name", "path", "python", "created", "last_used", "packages", "size", "mtime")
+
+
+def site_packages_dir(env_dir: Path) -> Optional[Path]:
+    """Site-packages directory of the environment, None if not found."""
+    if os.name == "nt":
+        return env_dir / "Lib" / "site-packages"
+    return next((env_dir / "lib").glob("python*/site-packages"), None)
+
+
+def _dir_size(path: Path) -> int:
+    """Total size of the files in the directory, symlinks are not followed."""
+    size, stack = 0, [str(path)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        size += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            continue
+    return size
+
+
+class EnvRegistry:
+    """Registry of the environments in the data directory. Each record is a
+    dict with the name and absolute path of the environment, python version,
+    created and last used timestamps, number of packages, size in bytes and
+    the mtime of site-packages when the packages and size were computed.
+
+    Args:
+        data_dir: Data directory of start
+    """
+
+    format_version = 1
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = Path(data_dir)
+        # not in the data directory itself, so writing it doesn't change the
+        # mtime of the data directory
+        self.path = self.data_dir / "cache" / REGISTRY_FILE
+        self.data_dir_mtime = 0
+        self.envs: Dict[str, Dict] = {}
+        self._changed = False
+        self.read()
+
+    def read(self):
+        """Read the registry, an invalid registry is treated as empty."""
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                registry = json.load(f)
+            if registry.get("version") != self.format_version:
+                return
+            self.envs = {
+                name: record
+                for name, record in registry["envs"].items()
+                if all(field in record for field in RECORD_FIELDS)
+            }
+            self.data_dir_mtime = registry.get("data_dir_mtime", 0)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            self.envs = {}
+
+    def save(self):
+        """Write the registry atomically if it's changed."""
+        if not self._changed:
+            return
+        registry = {
+            "version": self.format_version,
+            "data_dir_mtime": self.data_dir_mtime,
+            "envs": dict(sorted(self.envs.items())),
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            tmp_file.write_text(json.dumps(registry, indent=2), encoding="utf-8")
+            os.replace(tmp_file, self.path)
+        except OSError:
+            # the registry can be rebuilt by scanning, fail to write it shouldn't break the command
+            return
+        self._changed = False
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(sorted(self.envs.values(), key=lambda record: record["name"]))
+
+    def register(self, env_dir: Path, name: str = "") -> Dict:
+        """Add or update the environment, the last used time is kept for existing record."""
+        env_dir = Path(env_dir).absolute()
+        name = name or env_dir.name
+        try:
+            created = (env_dir / "pyvenv.cfg").stat().st_mtime
+        except OSError:
+            created = time.time()
+        record = dict.fromkeys(RECORD_FIELDS, 0)
+        record.update(name=name, path=str(env_dir), python="", created=created)
+        if (old := self.envs.get(name)) and old["path"] == record["path"]:
+            record["last_used"] = old["last_used"]
+        self._update_stats(record)
+        self.envs[name] = record
+        self._changed = True
+        return record
+
+    def _update_stats(self, record: Dict) -> bool:
+        """Update the python version, packages and size if the site-packages changed."""
+        env_dir = Path(record["path"])
+        site_packages = site_packages_dir(env_dir)
+        try:
+            mtime = site_packages.stat().st_mtime_ns if site_packages else 0
+        except OSError:
+            mtime = 0
+        if mtime and mtime == record["mtime"]:
+            return False
+        config = read_env_config(env_dir)
+        record["python"] = config.get("version") or config.get("version_info", "")
+        record["packages"] = 0
+        if site_packages and site_packages.is_dir():
+            record["packages"] = sum(
+                1 for item in os.scandir(site_packages) if item.name.endswith(".dist-info")
+            )
+        record["size"] = _dir_size(env_dir)
+        record["mtime"] = mtime
+        return True
+
+    def lookup(self, name: str) -> Optional[Path]:
+        """Path of the registered environment, None if it isn't registered or
+        was removed. Last used time is updated when found."""
+        if not (record := self.envs.get(name)) or not is_env_dir(path := Path(record["path"])):
+            return None
+        if time.time() - record["last_used"] > TOUCH_INTERVAL:
+            record["last_used"] = time.time()
+            self._changed = True
+            self.save()
+        return path
+
+    def refresh(self) -> List[Dict]:
+        """Drop removed environments, update the changed ones and register the
+        new directories. The data directory is only scanned when its mtime changed.
+
+        Returns:
+            All registered environments sorted by name
+        """
+        for name, record in list(self.envs.items()):
+            if not is_env_dir(Path(record["path"])):
+                del self.envs[name]
+                self._changed = True
+            elif self._update_stats(record):
+                self._changed = True
+        try:
+            mtime = self.data_dir.stat().st_mtime_ns
+        except OSError:
+            mtime = 0
+        if mtime != self.data_dir_mtime:
+            self.data_dir_mtime = mtime
+            self._changed = True
+            for item in self.data_dir.iterdir() if mtime else []:
+                if item.name in self.envs or not item.is_dir():
+                    continue
+                for env in (".", *DEFAULT_ENV):
+                    if is_env_dir(env_dir := item / env):
+                        self.register(env_dir, name=item.name)
+                        break
+        self.save()
+        return list(self)
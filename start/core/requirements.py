@@ -0,0 +1,182 @@
+import os
+import re
+import shlex
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Literal, Optional, Set, Tuple
+
+from typer import Exit
+
+from start.logger import Error
+
+# options to include other files, the value is the kind of included lines
+INCLUDE_OPTIONS: Dict[str, Literal["requirement", "constraint"]] = {
+    "-r": "requirement",
+    "--requirement": "requirement",
+    "-c": "constraint",
+    "--constraint": "constraint",
+}
+# same as pip, a comment starts with # at the beginning or after whitespace
+COMMENT_PATTERN = re.compile(r"(^|\s+)#.*$")
+ENV_VAR_PATTERN = re.compile(r"\$\{(?P<name>[A-Z0-9_]+)\}")
+
+
+@dataclass
+class FileEntries:
+    """Lines parsed from a single requirements file, includes are not followed.
+
+    Args:
+        requirements: Requirement strings without per-requirement options
+        includes: Kind and path of the included files, in the order of lines
+        options: Global pip options, e.g. --index-url, -e
+    """
+
+    requirements: List[str] = field(default_factory=list)
+    includes: List[Tuple[Literal["requirement", "constraint"], str]] = field(default_factory=list)
+    options: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ParsedRequirements:
+    """Requirements of a requirements file and all files it includes.
+
+    Args:
+        requirements: Requirements from the file and the included requirement files
+        constraints: Constraints from the included constraint files
+        options: Global pip options of all files
+        files: Resolved paths of all files in the include graph
+    """
+
+    requirements: List[str] = field(default_factory=list)
+    constraints: List[str] = field(default_factory=list)
+    options: List[str] = field(default_factory=list)
+    files: List[Path] = field(default_factory=list)
+
+
+# parsed entries of files keyed by the resolved path, validated by mtime and size
+_cache: Dict[Path, Tuple[Tuple[int, int], FileEntries]] = {}
+
+
+def logical_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Join the continuation lines, strip comments and expand `${VAR}`."""
+    buffer = ""
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.endswith("\\") and not COMMENT_PATTERN.search(line):
+            buffer += line[:-1]
+            continue
+        content = COMMENT_PATTERN.sub("", buffer + line).strip()
+        buffer = ""
+        if content:
+            yield ENV_VAR_PATTERN.sub(lambda m: os.getenv(m["name"], m.group()), content)
+    if content := COMMENT_PATTERN.sub("", buffer).strip():
+        yield content
+
+
+def strip_requirement_options(line: str) -> str:
+    """Remove per-requirement options like `--hash`, which can't be passed to pip as argument."""
+    return re.split(r"\s+(?=--?[a-zA-Z])", line, maxsplit=1)[0]
+
+
+def parse_line(line: str, entries: FileEntries):
+    """Parse a logical line into the entries."""
+    if not line.startswith("-"):
+        entries.requirements.append(strip_requirement_options(line))
+        return
+    args = shlex.split(line)
+    option, value = args[0], args[1] if len(args) > 1 else ""
+    if option.startswith("--") and "=" in option:
+        option, value = option.split("=", 1)
+    elif option[:2] in INCLUDE_OPTIONS and len(option) > 2:
+        option, value = option[:2], option[2:]
+    if option in INCLUDE_OPTIONS and value and "://" not in value:
+        entries.includes.append((INCLUDE_OPTIONS[option], value))
+    else:
+        entries.options.extend(args)
+
+
+def read_entries(path: Path) -> FileEntries:
+    """Stream the lines of a requirements file, the result is cached by path and mtime."""
+    stat = path.stat()
+    version = (stat.st_mtime_ns, stat.st_size)
+    if (cached := _cache.get(path)) and cached[0] == version:
+        return cached[1]
+    entries = FileEntries()
+    with path.open(encoding="utf-8") as f:
+        for line in logical_lines(f):
+            parse_line(line, entries)
+    _cache[path] = (version, entries)
+    return entries
+
+
+def iter_requirements(
+    path: str | Path, visited: Optional[Dict[Path, None]] = None
+) -> Iterator[Tuple[Literal["requirement", "constraint", "option"], str, Path]]:
+    """Walk the include graph depth first and yield the lines as `(kind, value, source)`.
+    Lines in constraint files and files included by them are all constraints.
+    A file included by multiple files is only walked once.
+
+    Args:
+        path: Path of the requirements file
+        visited: Collect the resolved paths of walked files in order
+    Raises:
+        Exit: An included file doesn't exist or files include each other
+    """
+    visited = {} if visited is None else visited
+    root = Path(path).absolute().resolve()
+
+    def walk(path: Path, kind: str, stack: Tuple[Path, ...]) -> Iterator:
+        if path in stack:
+            chain = " -> ".join(str(p) for p in (*stack[stack.index(path) :], path))
+            Error(f"Circular include of requirements files: {chain}")
+            raise Exit(1)
+        if path in visited:
+            return
+        visited[path] = None
+        try:
+            entries = read_entries(path)
+        except OSError:
+            source = f" included by {stack[-1]}" if stack else ""
+            Error(f"Requirements file {path} not found{source}.")
+            raise Exit(1)
+        for requirement in entries.requirements:
+            yield kind, requirement, path
+        for option in entries.options:
+            yield "option", option, path
+        for include_kind, include in entries.includes:
+            include_path = (path.parent / os.path.expanduser(include)).resolve()
+            yield from walk(
+                include_path, "constraint" if kind == "constraint" else include_kind, (*stack, path)
+            )
+
+    yield from walk(root, "requirement", ())
+
+
+def parse_requirements(path: str | Path) -> ParsedRequirements:
+    """Parse the requirements file and all files it includes."""
+    parsed = ParsedRequirements()
+    files: Dict[Path, None] = {}
+    seen: Set[Tuple[str, str]] = set()
+    for kind, value, _ in iter_requirements(path, files):
+        if kind == "option":
+            parsed.options.append(value)
+        elif (kind, value) not in seen:
+            seen.add((kind, value))
+            (parsed.requirements if kind == "requirement" else parsed.constraints).append(value)
+    parsed.files = list(files)
+    return parsed
+
+
+@contextmanager
+def constraint_args(constraints: List[str]) -> Iterator[List[str]]:
+    """Write the constraints to a temporary file and yield the pip arguments to use it."""
+    if not constraints:
+        yield []
+        return
+    with tempfile.TemporaryDirectory(prefix="start-") as tmp_dir:
+        constraint_file = os.path.join(tmp_dir, "constraints.txt")
+        with open(constraint_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(constraints) + "\n")
+        yield ["-c", constraint_file]
@@ -1,11 +1,19 @@
+import hashlib
 import os
+import shutil
 import subprocess
+import tempfile
+import time
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterable
 
 from typer import Exit
 
-from start.logger import Error
+from start.core import trace
+from start.core.config import DATA_DIR
+from start.core.fastcopy import copy_tree
+from start.logger import Error, Warn
 from start.utils import get_user_info
 
 SETUP_PY = """
@@ -40,23 +48,101 @@ class Test{Camel}(unittest.TestCase):
     pass
 """.lstrip()
 
-TEMPLATES_DIR = Path(os.getenv("START_DATA_DIR", "~/.start")).expanduser() / "templates"
+TEMPLATES_DIR = DATA_DIR / "templates"
 TEMPLATES_DIR.mkdir(exist_ok=True, parents=True)
+# shallow clones of the remote templates, named by the hash of the url
+REMOTE_TEMPLATES_DIR = TEMPLATES_DIR / ".remote"
+# seconds to use a cached remote template without fetching, override by $START_TEMPLATE_TTL
+DEFAULT_TEMPLATE_TTL = 3600
+# touched in the git directory of a cached template after it's fetched
+FETCHED_FILE = "start-fetched"
 
 
-def copy_template(src: Path, dest: Path):
-    """Copy files, folders, and symlinks from source to destination."""
-    if not dest.exists():
-        dest.mkdir(parents=True)
+def copy_template(src: Path, dest: Path, exclude: Iterable[str] = ()):
+    """Copy files, folders, and symlinks from source to destination, existing
+    files are kept. Files are copied in the kernel by a thread pool.
+
+    Args:
+        src: Template directory
+        dest: Project directory
+        exclude: Names of the entries in the template directory to skip
+    """
+    with trace.phase("copy template", src=str(src)):
+        copy_tree(src, dest, exclude=exclude)
+
+
+def git(*args: str, cwd: Path | None = None) -> str:
+    """Run the git command and return the output, raise CalledProcessError if failed."""
+    trace.count("subprocesses")
+    return subprocess.check_output(
+        ["git", *args], cwd=cwd, stderr=subprocess.STDOUT, encoding="utf-8"
+    )
+
+
+def template_ttl() -> float:
+    """Seconds to use a cached remote template from $START_TEMPLATE_TTL, the
+    default is used if it's not a number."""
+    value = os.getenv("START_TEMPLATE_TTL", "")
+    try:
+        return float(value) if value else DEFAULT_TEMPLATE_TTL
+    except ValueError:
+        Warn(f"Invalid START_TEMPLATE_TTL '{value}', use {DEFAULT_TEMPLATE_TTL} seconds.")
+        return DEFAULT_TEMPLATE_TTL
 
-    for item in src.iterdir():
-        if item.is_dir():
-            copy_template(item, dest / item.name)
-        elif not (dest_item := dest / item.name).exists():
-            if item.is_symlink():
-                dest_item.symlink_to(item.readlink())
-            elif item.is_file():
-                dest_item.write_bytes(item.read_bytes())
+
+def cached_remote_template(url: str, offline: bool = False, ttl: float | None = None) -> Path:
+    """Shallow clone of the remote template in the cache. The cache is updated by
+    fetching the latest commit when it's older than the ttl, the cached template
+    is used if fetching failed.
+
+    Args:
+        url: Url of the git repository
+        offline: Only use the cached template
+        ttl: Seconds to use the cache without fetching, default to $START_TEMPLATE_TTL or 1 hour
+    Returns:
+        The directory of the cached template
+    Raises:
+        Exit: The template is not cached and can't be cloned
+    """
+    cache_dir = REMOTE_TEMPLATES_DIR / hashlib.sha256(url.encode()).hexdigest()[:16]
+    fetched_file = cache_dir / ".git" / FETCHED_FILE
+    if ttl is None:
+        ttl = template_ttl()
+
+    if fetched_file.exists():
+        if offline or time.time() - fetched_file.stat().st_mtime < ttl:
+            return cache_dir
+        try:
+            git("fetch", "--depth", "1", "origin", "HEAD", cwd=cache_dir)
+            git("reset", "--hard", "FETCH_HEAD", cwd=cache_dir)
+            git("clean", "-ffdx", cwd=cache_dir)
+            fetched_file.touch()
+        except (subprocess.CalledProcessError, OSError) as e:
+            Warn(f"Failed to update template {url}, use the cached one.")
+            if isinstance(e, subprocess.CalledProcessError):
+                Warn(e.output.strip())
+        return cache_dir
+
+    if offline:
+        Error(f"Template {url} is not cached, can't clone it offline.")
+        raise Exit(1)
+    REMOTE_TEMPLATES_DIR.mkdir(parents=True, exist_ok=True)
+    # clone to a temporary directory, so an interrupted clone is never used
+    tmp_dir = Path(tempfile.mkdtemp(prefix=".clone-", dir=REMOTE_TEMPLATES_DIR))
+    try:
+        git("clone", "--depth", "1", "--quiet", url, str(tmp_dir))
+        (tmp_dir / ".git" / FETCHED_FILE).touch()
+        if cache_dir.exists():
+            # cloned by another process, or a broken cache
+            shutil.rmtree(cache_dir)
+        os.replace(tmp_dir, cache_dir)
+    except subprocess.CalledProcessError as e:
+        Error(f"Error cloning template: {url}")
+        Error(e.output.strip())
+        raise Exit(1)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return cache_dir
 
 
 @dataclass
@@ -67,10 +153,12 @@ class Template:
         project_name: Name of the project
         vname: Name of the virtual environment
         template_name: Name or git repo for the template
+        offline: Only use the cached remote templates
     """
 
     project_name: str
     template_name: str = ""
+    offline: bool = False
 
     def __post_init__(self):
         self.template_name = self.template_name.strip("/")
@@ -101,19 +189,17 @@ class Template:
         if not (init_file := Path(self.project_name, "tests", "__init__.py")).exists():
             init_file.touch()
         if not (test_file := Path(self.project_name, "tests", f"test_{project_name}.py")).exists():
-            test_file.write_text(
-                TEST_PY.format(Camel="".join(w.capitalize() for w in project_name.split("_")))
-            )
+            camel = "".join(w.capitalize() for w in project_name.split("_"))
+            trace.count("bytes_written", test_file.write_text(TEST_PY.format(Camel=camel)))
 
         if not (setup_file := Path(self.project_name, "setup.py")).exists():
-            setup_file.write_text(SETUP_PY)
+            trace.count("bytes_written", setup_file.write_text(SETUP_PY))
         if not (pyproject_file := Path(self.project_name, "pyproject.toml")).exists():
             username, email = get_user_info()
-            pyproject_file.write_text(
-                PYPROJECT_TOML.format(project=project_name, username=username, email=email)
-            )
+            pyproject = PYPROJECT_TOML.format(project=project_name, username=username, email=email)
+            trace.count("bytes_written", pyproject_file.write_text(pyproject))
         if not (main_file := Path(self.project_name, "main.py")).exists():
-            main_file.write_text(MAIN_PY.format(project_name))
+            trace.count("bytes_written", main_file.write_text(MAIN_PY.format(project_name)))
         if not (readme_file := Path(self.project_name, "README.md")).exists():
             readme_file.touch()
 
@@ -125,16 +211,10 @@ class Template:
         copy_template(template_folder, Path(self.project_name))
 
     def create_by_remote_template(self):
-        try:
-            subprocess.check_output(
-                ["git", "clone", self.template_name, self.project_name],
-                stderr=subprocess.STDOUT,
-                encoding="utf-8",
-            )
-        except subprocess.CalledProcessError as e:
-            Error(f"Error cloning template: {self.template_name}")
-            Error(e.output.strip())
-            raise Exit(1)
+        """Create project template from the cached clone of a git repository."""
+        template_folder = cached_remote_template(self.template_name, self.offline)
+        # the project doesn't inherit the history of the cached clone
+        copy_template(template_folder, Path(self.project_name), exclude=(".git",))
 
     def create(self):
         """Create project template at specified path.
@@ -143,9 +223,12 @@ class Template:
             path: Path to create the template
             skip_template: Skip template creation
         """
-        if not self.template_name:
-            self.create_default()
-        elif self.template_name.startswith(("http", "git")) or self.template_name.endswith(".git"):
-            self.create_by_remote_template()
-        else:
-            self.create_by_local_template()
+        with trace.phase("create template", template=self.template_name or "default"):
+            if not self.template_name:
+                self.create_default()
+            elif self.template_name.startswith(("http", "git")) or self.template_name.endswith(
+                ".git"
+            ):
+                self.create_by_remote_template()
+            else:
+                self.create_by_local_template()
@@ -0,0 +1,346 @@
+"""Patch arrays of a toml document in place, so that the comments and the
+formatting of the rest of the document are kept.
+
+Only the layout to locate the arrays is scanned, values are not parsed
+except the arrays to patch.
+"""
+
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import rtoml
+
+from start.core import trace
+
+KeyPath = Tuple[str, ...]
+
+_BARE_KEY = re.compile(r"[A-Za-z0-9_-]+")
+DEFAULT_INDENT = "    "
+
+
+@dataclass
+class Layout:
+    """Positions of the tables and arrays in a toml document.
+
+    Args:
+        arrays: Span of the array values, keyed by the full key path
+        keys: Full key paths of all other values
+        tables: End of the last key-value line of each table, keyed by table path
+        line_starts: Start of the line which defines the array, keyed by the full key path
+    """
+
+    arrays: Dict[KeyPath, Tuple[int, int]] = field(default_factory=dict)
+    keys: Set[KeyPath] = field(default_factory=set)
+    tables: Dict[KeyPath, int] = field(default_factory=dict)
+    line_starts: Dict[KeyPath, int] = field(default_factory=dict)
+
+
+class _Scanner:
+    """Scan the structure of a toml document."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def skip_spaces(self, pos: int) -> int:
+        while pos < len(self.text) and self.text[pos] in " \t":
+            pos += 1
+        return pos
+
+    def skip_line(self, pos: int) -> int:
+        """Position after the end of current line."""
+        end = self.text.find("\n", pos)
+        return len(self.text) if end == -1 else end + 1
+
+    def skip_string(self, pos: int) -> int:
+        """Position after the string starts at pos."""
+        quote = self.text[pos]
+        delimiter = quote * 3 if self.text.startswith(quote * 3, pos) else quote
+        end = pos + len(delimiter)
+        while True:
+            end = self.text.index(delimiter, end)
+            if quote == "'" or not self._escaped(end):
+                break
+            end += 1
+        end += len(delimiter)
+        if len(delimiter) == 3:
+            # up to two quotes are allowed next to the closing delimiter
+            for _ in range(2):
+                if end < len(self.text) and self.text[end] == quote:
+                    end += 1
+        return end
+
+    def _escaped(self, pos: int) -> bool:
+        backslashes = 0
+        while self.text[pos - 1 - backslashes] == "\\":
+            backslashes += 1
+        return backslashes % 2 == 1
+
+    def parse_key(self, pos: int) -> Tuple[KeyPath, int]:
+        """Parse the dotted key, return the key parts and the position after it."""
+        parts = []
+        while True:
+            pos = self.skip_spaces(pos)
+            if pos < len(self.text) and self.text[pos] in "\"'":
+                end = self.skip_string(pos)
+                parts.append(rtoml.loads(f"k = {self.text[pos:end]}")["k"])
+            elif match := _BARE_KEY.match(self.text, pos):
+                end = match.end()
+                parts.append(match.group())
+            else:
+                raise ValueError(f"Invalid key at {pos}")
+            pos = self.skip_spaces(end)
+            if pos < len(self.text) and self.text[pos] == ".":
+                pos += 1
+                continue
+            return tuple(parts), pos
+
+    def skip_value(self, pos: int) -> int:
+        """Position after the value starts at pos, nested arrays and inline tables are skipped."""
+        depth = 0
+        while pos < len(self.text):
+            char = self.text[pos]
+            if char in "\"'":
+                pos = self.skip_string(pos)
+                continue
+            if char == "#":
+                if depth == 0:
+                    return pos
+                pos = self.skip_line(pos)
+                continue
+            if char == "\n" and depth == 0:
+                return pos
+            if char in "[{":
+                depth += 1
+            elif char in "]}":
+                depth -= 1
+                if depth == 0:
+                    return pos + 1
+            pos += 1
+        return pos
+
+    def scan(self) -> Layout:
+        layout = Layout()
+        table: KeyPath = ()
+        layout.tables[table] = 0
+        pos = 0
+        while pos < len(self.text):
+            line_start = pos
+            pos = self.skip_spaces(pos)
+            if pos >= len(self.text) or self.text[pos] in "\r\n#":
+                pos = self.skip_line(pos)
+                continue
+            if self.text[pos] == "[":
+                is_array_table = self.text.startswith("[[", pos)
+                table, pos = self.parse_key(pos + (2 if is_array_table else 1))
+                pos = self.skip_line(pos)
+                # tables in array of tables can't be extended
+                if not is_array_table:
+                    layout.tables[table] = pos
+                continue
+            key, pos = self.parse_key(pos)
+            if self.text[pos] != "=":
+                raise ValueError(f"Expect '=' at {pos}")
+            value_start = self.skip_spaces(pos + 1)
+            pos = self.skip_value(value_start)
+            full_key = table + key
+            if self.text[value_start] == "[":
+                layout.arrays[full_key] = (value_start, pos)
+                layout.line_starts[full_key] = line_start
+            else:
+                layout.keys.add(full_key)
+            pos = self.skip_line(pos)
+            if table in layout.tables:
+                layout.tables[table] = pos
+        return layout
+
+
+def scan(text: str) -> Optional[Layout]:
+    """Scan the layout of the toml document, None if it's invalid."""
+    try:
+        return _Scanner(text).scan()
+    except (ValueError, IndexError, rtoml.TomlParsingError):
+        return None
+
+
+@dataclass
+class _Item:
+    """A string item in array with its comments."""
+
+    token: str
+    value: str
+    comments: List[str] = field(default_factory=list)
+    trailing: str = ""
+
+
+def _parse_items(array: str) -> Optional[Tuple[List[_Item], List[str]]]:
+    """Parse the string items of the array and the comments attached to them.
+    A comment on its own line belongs to the next item, a comment on the same
+    line belongs to the previous item.
+
+    Returns:
+        Items and the dangling comments after the last item, None if the
+        array contains other than strings
+    """
+    scanner = _Scanner(array)
+    try:
+        values = rtoml.loads(f"v = {array}")["v"]
+    except rtoml.TomlParsingError:
+        return None
+    if not all(isinstance(value, str) for value in values):
+        return None
+    items: List[_Item] = []
+    comments: List[str] = []
+    pos, line_has_item = 1, False
+    while pos < len(array) - 1:
+        char = array[pos]
+        if char in "\"'":
+            end = scanner.skip_string(pos)
+            items.append(_Item(array[pos:end], values[len(items)], comments))
+            comments, line_has_item, pos = [], True, end
+        elif char == "#":
+            end = array.find("\n", pos)
+            end = len(array) - 1 if end == -1 else end
+            comment = array[pos:end].rstrip()
+            if line_has_item and items and not items[-1].trailing:
+                # keep the spaces between the item and the comment
+                before = array[:pos].rstrip(",")
+                items[-1].trailing = (before[len(before.rstrip()) :] or " ") + comment
+            else:
+                comments.append(comment)
+            pos = end
+        else:
+            if char == "\n":
+                line_has_item = False
+            pos += 1
+    return items, comments
+
+
+def render_array(
+    values: List[str],
+    old: str = "",
+    indent: str = "",
+    key: Optional[Callable[[str], str]] = None,
+) -> Optional[str]:
+    """Render the array of strings, reuse the tokens and comments of old array.
+
+    Args:
+        values: Strings of the new array
+        old: Old array text, its layout is kept
+        indent: Indent of the line which defines the array
+        key: Function to match the new values with the old items, whose comments
+            are kept when the value is changed. Default to match the same value
+    Returns:
+        Array text, None if the old array can't be patched
+    """
+    items, dangling = [], []
+    if old:
+        if (parsed := _parse_items(old)) is None:
+            return None
+        items, dangling = parsed
+    key = key or (lambda value: value)
+    old_items = {key(item.value): item for item in items}
+    new_items = []
+    for value in values:
+        item = _Item(json.dumps(value), value)
+        if old_item := old_items.get(key(value)):
+            if old_item.value == value:
+                item.token = old_item.token
+            item.comments, item.trailing = old_item.comments, old_item.trailing
+        new_items.append(item)
+
+    multiline = "\n" in old or not old
+    if not new_items and not dangling:
+        return "[]"
+    if not multiline and not any(item.comments or item.trailing for item in new_items):
+        return "[" + ", ".join(item.token for item in new_items) + "]"
+
+    item_indent = indent + DEFAULT_INDENT
+    if match := re.search(r"\n([ \t]*)[^\s\]]", old):
+        item_indent = match.group(1)
+    lines = ["["]
+    for item in new_items:
+        lines.extend(item_indent + comment for comment in item.comments)
+        lines.append(f"{item_indent}{item.token},{item.trailing}")
+    lines.extend(item_indent + comment for comment in dangling)
+    lines.append(indent + "]")
+    return "\n".join(lines)
+
+
+def patch_arrays(
+    text: str,
+    arrays: Dict[KeyPath, List[str]],
+    key: Optional[Callable[[str], str]] = None,
+) -> Optional[str]:
+    """Replace or insert the arrays of strings in the toml document. Missing
+    arrays are appended to their tables, missing tables are appended to the end.
+
+    Args:
+        text: Toml document
+        arrays: New values of the arrays keyed by the full key path
+        key: Function to match the new values with the old items, see `render_array`
+    Returns:
+        Patched document, None if any array can't be patched in place,
+        e.g. it's defined in an inline table
+    """
+    if text and not text.endswith("\n"):
+        text += "\n"
+    if (layout := scan(text)) is None:
+        return None
+    replacements: List[Tuple[int, int, str]] = []
+    new_tables: Dict[KeyPath, List[str]] = {}
+    for path, values in arrays.items():
+        if path in layout.arrays:
+            start, end = layout.arrays[path]
+            line = text[layout.line_starts[path] : start]
+            indent = line[: len(line) - len(line.lstrip(" \t"))]
+            if (rendered := render_array(values, text[start:end], indent, key)) is None:
+                return None
+            replacements.append((start, end, rendered))
+            continue
+        # the value or any of its parents is defined by other type, e.g. inline table
+        if any(path[:i] in layout.keys for i in range(1, len(path) + 1)):
+            return None
+        rendered = render_array(values) or "[]"
+        table = path[:-1]
+        if table not in layout.tables and not any(
+            key[: len(table)] == table for key in (*layout.arrays, *layout.keys)
+        ):
+            new_tables.setdefault(table, []).append(f"{_format_key(path[-1])} = {rendered}")
+            continue
+        # append to the table, or the nearest parent table when the table is
+        # defined by dotted keys
+        parent = max((t for t in layout.tables if path[: len(t)] == t), key=len)
+        dotted_key = ".".join(_format_key(part) for part in path[len(parent) :])
+        end = layout.tables[parent]
+        replacements.append((end, end, f"{dotted_key} = {rendered}\n"))
+
+    # replace from the end, so the positions before are not moved, and the
+    # arrays inserted to the same position keep their order
+    for _, (start, end, rendered) in sorted(
+        enumerate(replacements), key=lambda r: (r[1][0], r[0]), reverse=True
+    ):
+        text = text[:start] + rendered + text[end:]
+    for table, lines in new_tables.items():
+        header = ".".join(_format_key(part) for part in table)
+        text = (text.rstrip("\n") + "\n\n" if text.strip() else "") + f"[{header}]\n"
+        text += "\n".join(lines) + "\n"
+    return text
+
+
+def _format_key(key: str) -> str:
+    return key if _BARE_KEY.fullmatch(key) else json.dumps(key)
+
+
+def write_atomic(path: Path, text: str):
+    """Write the text to a temporary file and replace the target file."""
+    with trace.phase("write config", file=path.name):
+        tmp_file = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with tmp_file.open("w", encoding="utf-8", newline="") as f:
+            trace.count("bytes_written", f.write(text))
+        if path.exists():
+            os.chmod(tmp_file, path.stat().st_mode)
+        os.replace(tmp_file, path)
@@ -0,0 +1,242 @@
+"""Record the time spent in each phase of a command.
+
+Tracing is enabled by `start --profile` or the `START_TRACE` environment
+variable, then `phase` records nested timings and `count` adds the started
+subprocesses and written bytes to the open phases. Both are no-ops when
+tracing is disabled, so they can be put in the hot paths.
+
+The trace is exported as JSON, with the phases nested and their durations
+totaled by path like `create/ensurepip` to be compared between runs, or as
+Chrome trace events to be viewed in `chrome://tracing` or Perfetto.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# counters recorded for each phase
+COUNTERS = ("subprocesses", "bytes_written")
+TRACE_VERSION = 1
+
+
+class Span:
+    """A phase of the command, times are seconds from the start of the trace."""
+
+    __slots__ = ("name", "start", "end", "tid", "args", "counters", "children")
+
+    def __init__(self, name: str, start: float, tid: int, args: Dict[str, Any]):
+        self.name = name
+        self.start = start
+        self.end = start
+        self.tid = tid
+        self.args = args
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.children: List["Span"] = []
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration": round(self.duration, 6),
+            **self.counters,
+            **({"args": self.args} if self.args else {}),
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class Tracer:
+    """Collect the phases of a command, each thread has its own stack of open phases.
+
+    Args:
+        command: The traced command line
+    """
+
+    def __init__(self, command: str = ""):
+        self.command = command
+        self.started = time.time()
+        self.origin = time.perf_counter()
+        # seconds from the origin when the trace is finished
+        self.ended: Optional[float] = None
+        self.roots: List[Span] = []
+        self.totals = dict.fromkeys(COUNTERS, 0)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> List[Span]:
+        if (stack := getattr(self._local, "stack", None)) is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def phase(self, name: str, **args: Any) -> Iterator[Span]:
+        stack = self._stack()
+        span = Span(name, time.perf_counter() - self.origin, threading.get_ident(), args)
+        with self._lock:
+            (stack[-1].children if stack else self.roots).append(span)
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter() - self.origin
+            stack.pop()
+
+    def count(self, counter: str, value: int = 1):
+        """Add the value to the counter of the open phases in this thread."""
+        with self._lock:
+            self.totals[counter] += value
+            for span in self._stack():
+                span.counters[counter] += value
+
+    @property
+    def duration(self) -> float:
+        return self.ended if self.ended is not None else time.perf_counter() - self.origin
+
+    def phases(self) -> Dict[str, float]:
+        """Total seconds of the phases keyed by their paths, phases with the same
+        path, e.g. in a loop, are summed."""
+        totals: Dict[str, float] = {}
+
+        def walk(spans: List[Span], prefix: str):
+            for span in spans:
+                path = f"{prefix}{span.name}"
+                totals[path] = totals.get(path, 0) + span.duration
+                walk(span.children, path + "/")
+
+        walk(self.roots, "")
+        return {path: round(seconds, 6) for path, seconds in totals.items()}
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "version": TRACE_VERSION,
+            "command": self.command,
+            "started": self.started,
+            "duration": round(self.duration, 6),
+            **self.totals,
+            "phases": self.phases(),
+            "spans": [span.to_dict() for span in self.roots],
+        }
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Complete events of the trace event format, timestamps are microseconds."""
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": self.command}}
+        ]
+
+        def walk(spans: List[Span]):
+            for span in spans:
+                args = {**span.args, **span.counters}
+                events.append(
+                    {
+                        "name": span.name,
+                        "ph": "X",
+                        "ts": round(span.start * 1e6, 3),
+                        "dur": round(span.duration * 1e6, 3),
+                        "pid": pid,
+                        "tid": span.tid,
+                        "args": args,
+                    }
+                )
+                walk(span.children)
+
+        walk(self.roots)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path: str | Path, format: str = "json"):
+        """Write the trace to the file in `json` or `chrome` format."""
+        data = self.to_chrome() if format == "chrome" else self.to_json()
+        Path(path).write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+    def summary(self) -> str:
+        """Phases as an indented table with the durations and counters."""
+        lines = [f"{'Phase':<40} {'Time':>9} {'Procs':>6} {'Written':>10}"]
+
+        def walk(spans: List[Span], depth: int):
+            for span in spans:
+                name = ("  " * depth + span.name)[:40]
+                lines.append(
+                    f"{name:<40} {span.duration * 1000:>7.1f}ms "
+                    f"{span.counters['subprocesses']:>6} {_format_size(span.counters['bytes_written']):>10}"
+                )
+                walk(span.children, depth + 1)
+
+        walk(self.roots, 0)
+        lines.append(
+            f"{'total':<40} {self.duration * 1000:>7.1f}ms "
+            f"{self.totals['subprocesses']:>6} {_format_size(self.totals['bytes_written']):>10}"
+        )
+        return "\n".join(lines)
+
+
+def _format_size(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+_tracer: Optional[Tracer] = None
+
+
+def enable(command: str = "") -> Tracer:
+    """Start a new trace, the previous one is dropped."""
+    global _tracer
+    _tracer = Tracer(command)
+    return _tracer
+
+
+def disable() -> Optional[Tracer]:
+    """Stop tracing, return the finished trace."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer and tracer.ended is None:
+        tracer.ended = time.perf_counter() - tracer.origin
+    return tracer
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+@contextmanager
+def phase(name: str, **args: Any) -> Iterator[Optional[Span]]:
+    """Record the time of the block as a phase nested in the open phase."""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.phase(name, **args) as span:
+        yield span
+
+
+def count(counter: str, value: int = 1):
+    """Add to a counter of the open phases, e.g. `count("subprocesses")`."""
+    if _tracer is not None:
+        _tracer.count(counter, value)
+
+
+def regressions(
+    baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.2, minimum: float = 0.01
+) -> Dict[str, tuple]:
+    """Phases of the current JSON trace slower than the baseline by more than
+    the tolerance, phases faster than the minimum seconds are ignored as noise.
+
+    Returns:
+        regressions: Baseline and current seconds keyed by the phase path
+    """
+    slower = {}
+    for path, seconds in current.get("phases", {}).items():
+        before = baseline.get("phases", {}).get(path)
+        if before is None or max(before, seconds) < minimum:
+            continue
+        if seconds > before * (1 + tolerance):
+            slower[path] = (before, seconds)
+    return slower
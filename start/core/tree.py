@@ -0,0 +1,134 @@
+"""Render the requirement graph of packages as a tree.
+
+Each package is expanded once, later occurrences are marked as repeated and
+requirement cycles are cut, so the output grows with the number of edges
+instead of the number of paths in the graph.
+"""
+
+import json
+from collections import deque
+from typing import Dict, Iterator, List, NamedTuple, Optional, TextIO
+
+from start.core.graph import PackageGraph
+
+BRANCH = "├─"
+END = "└─"
+LINE = "│ "
+INDENT = "  "
+
+# markers of the package whose requirements are not expanded again
+REPEATED = " (*)"
+CYCLE = " (cycle)"
+
+
+class TreeLine(NamedTuple):
+    """A line of the rendered tree.
+
+    Args:
+        name: Package name
+        prefix: Tree prefix before the name
+        depth: Depth of the package, 0 for the roots
+        marker: REPEATED, CYCLE or empty string
+    """
+
+    name: str
+    prefix: str
+    depth: int
+    marker: str = ""
+
+
+class DependencyTree:
+    """Tree view of the requirement graph of packages.
+
+    Args:
+        graph: Requirement graph of the packages
+    """
+
+    def __init__(self, graph: PackageGraph):
+        self.graph = graph
+
+    def roots(self) -> List[str]:
+        return self.graph.roots()
+
+    def reverse(self) -> "DependencyTree":
+        """Tree of the packages which require the package, the roots are the
+        packages have no requirements."""
+        return DependencyTree(self.graph.reverse())
+
+    def render(self, depth: Optional[int] = None) -> Iterator[TreeLine]:
+        """Render the tree iteratively, lines are yielded in display order.
+
+        Args:
+            depth: Max depth to expand, None for unlimited
+        """
+        graph = self.graph
+        roots = [graph.ids[root] for root in graph.roots()]
+        expanded = bytearray(len(graph))
+        on_path = bytearray(len(graph))
+        ancestors: List[int] = []
+        # None marks leaving the requirements of the last ancestor
+        stack: List[Optional[tuple]] = [
+            (root, "", i == len(roots) - 1, 0) for i, root in enumerate(roots)
+        ][::-1]
+        while stack:
+            if (item := stack.pop()) is None:
+                on_path[ancestors.pop()] = 0
+                continue
+            index, parent_prefix, last, level = item
+            children = graph.children(index)
+            marker = ""
+            if on_path[index]:
+                marker = CYCLE
+            elif children and expanded[index]:
+                marker = REPEATED
+            prefix = parent_prefix + (END if last else BRANCH)
+            yield TreeLine(graph.names[index], prefix, level, marker)
+            if marker or not children or (depth is not None and level >= depth):
+                continue
+            expanded[index] = on_path[index] = 1
+            ancestors.append(index)
+            stack.append(None)
+            prefix = parent_prefix + (INDENT if last else LINE)
+            stack.extend(
+                (child, prefix, i == len(children) - 1, level + 1)
+                for i, child in reversed(list(enumerate(children)))
+            )
+
+    def subgraph(self, depth: Optional[int] = None) -> Dict[str, List[str]]:
+        """Requirements of the packages within the depth from the roots, in breadth
+        first order. Requirements of the packages at the max depth are empty."""
+        graph = self.graph
+        levels = dict.fromkeys((graph.ids[root] for root in graph.roots()), 0)
+        queue = deque(levels)
+        while queue:
+            index = queue.popleft()
+            if depth is not None and levels[index] >= depth:
+                continue
+            for child in graph.children(index):
+                if child not in levels:
+                    levels[child] = levels[index] + 1
+                    queue.append(child)
+        return {
+            graph.names[index]: []
+            if depth is not None and level >= depth
+            else [graph.names[child] for child in graph.children(index)]
+            for index, level in levels.items()
+        }
+
+    def write_json(self, file: TextIO, depth: Optional[int] = None):
+        """Write the roots and the requirements of the packages as json."""
+        data = {"roots": self.roots(), "packages": self.subgraph(depth)}
+        json.dump(data, file, indent=2)
+        file.write("\n")
+
+    def iter_dot(self, depth: Optional[int] = None) -> Iterator[str]:
+        """Lines of the graph in graphviz dot format."""
+        yield "digraph dependencies {"
+        graph = self.subgraph(depth)
+        required = {child for children in graph.values() for child in children}
+        for name, children in graph.items():
+            if not children and name not in required:
+                yield f"    {json.dumps(name)};"
+            for child in children:
+                yield f"    {json.dumps(name)} -> {json.dumps(child)};"
+        yield "}"
@@ -0,0 +1,55 @@
+"""Caches kept across commands in a long-lived process like the daemon.
+
+Each value is stored with a fingerprint of the files it's computed from, e.g.
+the mtimes of site-packages, and is dropped when the fingerprint changed. The
+caches are disabled by default, a single command computes everything once and
+the on-disk indexes already cover it.
+"""
+
+import os
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+_caches: Optional[Dict[Tuple[str, Hashable], Tuple[Hashable, Any]]] = None
+
+
+def enable():
+    """Keep the values in this process."""
+    global _caches
+    if _caches is None:
+        _caches = {}
+
+
+def disable():
+    """Drop all values and stop caching."""
+    global _caches
+    _caches = None
+
+
+def enabled() -> bool:
+    return _caches is not None
+
+
+def get(namespace: str, key: Hashable, fingerprint: Hashable) -> Any:
+    """The cached value if its fingerprint is unchanged, otherwise None."""
+    if _caches is None or (cached := _caches.get((namespace, key))) is None:
+        return None
+    return cached[1] if cached[0] == fingerprint else None
+
+
+def put(namespace: str, key: Hashable, fingerprint: Hashable, value: Any) -> Any:
+    """Cache the value if caching is enabled, return the value."""
+    if _caches is not None:
+        _caches[(namespace, key)] = (fingerprint, value)
+    return value
+
+
+def fingerprint(paths: Iterable[str | os.PathLike]) -> tuple:
+    """Mtimes of the files or directories, a directory's mtime changes when
+    entries are added, removed or renamed in it."""
+    stamps = []
+    for path in paths:
+        try:
+            stamps.append((os.fspath(path), os.stat(path).st_mtime_ns))
+        except OSError:
+            stamps.append((os.fspath(path), None))
+    return tuple(stamps)
@@ -0,0 +1,388 @@
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from email.parser import Parser
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.tags import sys_tags
+from packaging.utils import InvalidWheelFilename, canonicalize_name, parse_wheel_filename
+from packaging.version import Version
+
+from start.core.config import DATA_DIR
+from start.core.metadata import EnvMetadata
+from start.logger import Error, Warn
+
+if TYPE_CHECKING:
+    from start.core.pip_manager import PipManager
+
+WHEELHOUSE_DIR = DATA_DIR / "wheels"
+DEFAULT_MAX_SIZE = "5G"
+# seconds a blob without links is kept, it may be being added by another process
+BLOB_GRACE_PERIOD = 300
+# pip install options which are not accepted by pip wheel, and whether they take a value
+INSTALL_ONLY_ARGS = {
+    "-U": False,
+    "--upgrade": False,
+    "--upgrade-strategy": True,
+    "--force-reinstall": False,
+    "-I": False,
+    "--ignore-installed": False,
+    "--user": False,
+    "-t": True,
+    "--target": True,
+    "--root": True,
+    "--prefix": True,
+    "--compile": False,
+    "--no-compile": False,
+    "--no-warn-script-location": False,
+    "--no-warn-conflicts": False,
+    "--break-system-packages": False,
+    "--dry-run": False,
+    "--report": True,
+    "-y": False,
+    "--yes": False,
+}
+
+
+def parse_size(size: str | int) -> int:
+    """Parse size string like 500M, 5G to bytes."""
+    if isinstance(size, int):
+        return size
+    size = size.strip().upper().removesuffix("B")
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+
+def format_size(size: float) -> str:
+    """Format bytes to human readable string."""
+    for unit in ("B", "K", "M", "G"):
+        if size < 1024:
+            return f"{size:.1f}{unit}" if unit != "B" else f"{int(size)}B"
+        size /= 1024
+    return f"{size:.1f}T"
+
+
+def filter_wheel_args(pip_args: List[str]) -> List[str]:
+    """Remove the pip install options which can't be passed to pip wheel."""
+    wheel_args, skip_value = [], False
+    for arg in pip_args:
+        if skip_value:
+            skip_value = False
+            continue
+        option = arg.split("=", 1)[0]
+        if option in INSTALL_ONLY_ARGS:
+            skip_value = INSTALL_ONLY_ARGS[option] and "=" not in arg
+            continue
+        wheel_args.append(arg)
+    return wheel_args
+
+
+class Wheelhouse:
+    """Content-addressed wheel storage shared by all environments.
+
+    Wheels are stored in `blobs/` and named by their sha256, then hardlinked into
+    `links/` with the original filename, which is passed to pip by `--find-links`.
+    The mtime of a wheel is updated when it's used, so the least recently used
+    wheels are evicted first when the wheelhouse exceeds its max size.
+
+    Args:
+        root: Directory of the wheelhouse, default to $START_DATA_DIR/wheels
+        offline: Install packages only from the wheelhouse, never access the index
+        max_size: Max size of the wheelhouse, default to $START_WHEELHOUSE_SIZE or 5G
+    """
+
+    def __init__(
+        self, root: Path | None = None, offline: bool = False, max_size: str | int | None = None
+    ):
+        self.root = Path(root or WHEELHOUSE_DIR)
+        self.blobs_dir = self.root / "blobs"
+        self.links_dir = self.root / "links"
+        self.offline = offline
+        self.max_size = parse_size(max_size or os.getenv("START_WHEELHOUSE_SIZE", DEFAULT_MAX_SIZE))
+
+    def ensure_dirs(self):
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.links_dir.mkdir(parents=True, exist_ok=True)
+
+    def add(self, wheel: Path) -> Path:
+        """Add a wheel file into the wheelhouse, the wheel file will be moved.
+
+        Returns:
+            The path of wheel in links directory
+        """
+        self.ensure_dirs()
+        digest = hashlib.sha256()
+        with wheel.open("rb") as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+        blob = self.blobs_dir / digest.hexdigest()
+        link = self.links_dir / wheel.name
+        while True:
+            try:
+                # the mtime is shared by the blob and its links, it marks the wheel
+                # as used and keeps prune from removing the blob before it's linked
+                if blob.exists():
+                    os.utime(blob)
+                else:
+                    os.utime(wheel)
+                    shutil.move(wheel, blob)
+                if not link.exists() or not link.samefile(blob):
+                    # link to a temporary name then replace, other processes may read it
+                    tmp_link = self.links_dir / f".{wheel.name}.{os.getpid()}.tmp"
+                    tmp_link.unlink(missing_ok=True)
+                    os.link(blob, tmp_link)
+                    os.replace(tmp_link, link)
+                return link
+            except FileNotFoundError:
+                # the existing blob was removed by a concurrent prune, move the wheel
+                if not wheel.exists():
+                    raise
+
+    def wheels(self) -> List[Dict]:
+        """Wheels in the wheelhouse, sorted by last used time."""
+        if not self.links_dir.is_dir():
+            return []
+        wheels = []
+        with os.scandir(self.links_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".whl") and entry.is_file():
+                    stat = entry.stat()
+                    wheels.append(
+                        {"name": entry.name, "size": stat.st_size, "last_used": stat.st_mtime}
+                    )
+        return sorted(wheels, key=lambda wheel: wheel["last_used"])
+
+    def size(self) -> int:
+        """Total size of the blobs in the wheelhouse."""
+        if not self.blobs_dir.is_dir():
+            return 0
+        return sum(blob.stat().st_size for blob in self.blobs_dir.iterdir())
+
+    def prune(self, max_size: str | int | None = None) -> List[str]:
+        """Evict the least recently used wheels until the wheelhouse is smaller
+        than max size, the blobs of the evicted wheels are removed with them.
+        Other blobs without any link are removed unless they were used in the
+        grace period, since another process may be adding them.
+
+        Returns:
+            Names of the evicted wheels
+        """
+        max_size = self.max_size if max_size is None else parse_size(max_size)
+        evicted, total = [], sum(wheel["size"] for wheel in self.wheels())
+        evicted_inodes = set()
+        for wheel in self.wheels():
+            if total <= max_size:
+                break
+            link = self.links_dir / wheel["name"]
+            try:
+                evicted_inodes.add(link.stat().st_ino)
+                link.unlink()
+            except FileNotFoundError:
+                continue
+            evicted.append(wheel["name"])
+            total -= wheel["size"]
+        if self.blobs_dir.is_dir():
+            expired = time.time() - BLOB_GRACE_PERIOD
+            for blob in self.blobs_dir.iterdir():
+                try:
+                    stat = blob.stat()
+                except FileNotFoundError:
+                    continue
+                if stat.st_nlink == 1 and (
+                    stat.st_ino in evicted_inodes or stat.st_mtime < expired
+                ):
+                    blob.unlink(missing_ok=True)
+        return evicted
+
+    def clear(self):
+        """Remove all wheels in the wheelhouse."""
+        shutil.rmtree(self.links_dir, ignore_errors=True)
+        shutil.rmtree(self.blobs_dir, ignore_errors=True)
+
+    def fill(self, pip: "PipManager", *packages: str, pip_args: List[str]) -> bool:
+        """Build or download wheels of packages and their dependencies into the
+        wheelhouse, the wheels already in wheelhouse are reused. Nothing is built
+        when the pinned packages are already cached, or the index isn't used.
+
+        Returns:
+            Whether all wheels required by the packages are in the wheelhouse
+        """
+        if self.offline or "--no-index" in pip_args:
+            return True
+        if (requirements := _requirement_lines(packages)) is not None and self.cached(
+            requirements,
+            EnvMetadata(pip.execu).marker_environment,
+            deps="--no-deps" not in (*packages, *pip_args),
+        ):
+            return True
+        self.ensure_dirs()
+        with tempfile.TemporaryDirectory(dir=self.root, prefix=".build-") as wheel_dir:
+            pip.execute(
+                [
+                    "wheel",
+                    "--wheel-dir",
+                    wheel_dir,
+                    "--find-links",
+                    str(self.links_dir),
+                    *packages,
+                    *filter_wheel_args(pip_args),
+                ]
+            )
+            for wheel in Path(wheel_dir).glob("*.whl"):
+                self.add(wheel)
+        if pip.return_code != 0:
+            Warn("Failed to save packages to wheelhouse, install them from index.")
+            if any(pip.stderr):
+                Error("\n".join(pip.stderr))
+            return False
+        self.prune()
+        return True
+
+    def cached(
+        self, requirements: Iterable[str], environment: Dict[str, str], deps: bool = True
+    ) -> bool:
+        """Whether the wheels of the pinned requirements are in the wheelhouse,
+        so they can be installed with `--no-index`. The cached dependencies read
+        from the wheels must satisfy all requirements on them, the used wheels
+        are marked as recently used.
+
+        Args:
+            requirements: Requirement lines pinned by `==`, hashes are ignored
+            environment: Marker environment of the target environment, which must
+                have the python version of this interpreter to match the wheel tags
+            deps: Check the dependencies of the requirements too
+        """
+        running = ".".join(map(str, sys.version_info[:2]))
+        if environment.get("python_version") != running:
+            return False
+        wheels = self._compatible_wheels()
+        chosen: Dict[str, Tuple[Version, Path]] = {}
+        pending: List[Tuple[Requirement, bool]] = []
+        for line in requirements:
+            if not (line := line.split(" --hash=")[0].split("#")[0].strip()):
+                continue
+            try:
+                req = Requirement(line)
+            except InvalidRequirement:
+                return False
+            specs = list(req.specifier)
+            if req.url or len(specs) != 1 or specs[0].operator != "==" or "*" in specs[0].version:
+                return False
+            if not req.marker or req.marker.evaluate({**environment, "extra": ""}):
+                pending.append((req, True))
+        seen = set()
+        while pending:
+            req, pinned = pending.pop()
+            extras = sorted(req.extras) or [""]
+            name = canonicalize_name(req.name)
+            if name in chosen:
+                if not req.specifier.contains(chosen[name][0], prereleases=True):
+                    return False
+            else:
+                versions = list(req.specifier.filter(wheels.get(name, {}), prereleases=pinned))
+                if not versions:
+                    return False
+                version = max(versions)
+                chosen[name] = version, wheels[name][version]
+            if deps and (name, tuple(extras)) not in seen:
+                seen.add((name, tuple(extras)))
+                if (requires := _read_requires(chosen[name][1])) is None:
+                    return False
+                pending.extend(
+                    (dep, False)
+                    for dep in requires
+                    if not dep.marker
+                    or any(dep.marker.evaluate({**environment, "extra": e}) for e in extras)
+                )
+        for _, wheel in chosen.values():
+            os.utime(wheel)
+        return True
+
+    def _compatible_wheels(self) -> Dict[str, Dict[Version, Path]]:
+        """Wheels in the wheelhouse supported by this interpreter, keyed by the
+        canonical name and version, the wheel with the most specific tags is kept."""
+        priorities = {tag: index for index, tag in enumerate(sys_tags())}
+        found: Dict[str, Dict[Version, Tuple[int, Path]]] = {}
+        if self.links_dir.is_dir():
+            for path in self.links_dir.glob("*.whl"):
+                try:
+                    name, version, _, tags = parse_wheel_filename(path.name)
+                except InvalidWheelFilename:
+                    continue
+                priority = min((priorities[tag] for tag in tags if tag in priorities), default=None)
+                versions = found.setdefault(name, {})
+                if priority is not None and (
+                    version not in versions or priority < versions[version][0]
+                ):
+                    versions[version] = priority, path
+        return {
+            name: {version: path for version, (_, path) in versions.items()}
+            for name, versions in found.items()
+        }
+
+    def pip_args(self, no_index: bool) -> List[str]:
+        """Arguments for pip install to install packages from the wheelhouse.
+
+        Args:
+            no_index: Don't access the package index, install only from the wheelhouse
+        """
+        args = ["--find-links", str(self.links_dir)]
+        if self.offline or no_index:
+            args.append("--no-index")
+        return args
+
+
+def _requirement_lines(packages: Sequence[str]) -> Optional[List[str]]:
+    """Requirement lines of the pip arguments, read from the requirement files
+    of `-r`. None if any argument isn't a requirement or `--no-deps`."""
+    lines, args = [], iter(packages)
+    for arg in args:
+        if arg in ("-r", "--requirement"):
+            try:
+                lines.extend(Path(next(args, "")).read_text(encoding="utf-8").splitlines())
+            except OSError:
+                return None
+        elif arg == "--no-deps":
+            continue
+        elif arg.startswith("-"):
+            return None
+        else:
+            lines.append(arg)
+    if any(line.strip().startswith("-") for line in lines):
+        return None
+    return lines
+
+
+def _read_requires(wheel: Path) -> Optional[List[Requirement]]:
+    """Requirements in the metadata of the wheel, None if it can't be read."""
+    try:
+        with zipfile.ZipFile(wheel) as zf:
+            names = [
+                name
+                for name in zf.namelist()
+                if name.count("/") == 1 and name.endswith(".dist-info/METADATA")
+            ]
+            if len(names) != 1:
+                return None
+            metadata = Parser().parsestr(zf.read(names[0]).decode("utf-8"), headersonly=True)
+        return [Requirement(require) for require in metadata.get_all("Requires-Dist") or []]
+    except (OSError, zipfile.BadZipFile, UnicodeDecodeError, InvalidRequirement):
+        return None
+
+
+def get_wheelhouse(enabled: bool, offline: bool = False) -> Optional[Wheelhouse]:
+    """Get the wheelhouse if it's enabled, offline mode always uses the wheelhouse."""
+    if not (enabled or offline):
+        return None
+    wheelhouse = Wheelhouse(offline=offline)
+    if offline and not wheelhouse.links_dir.is_dir():
+        Warn(f"Wheelhouse {wheelhouse.root} is empty, packages can't be installed offline.")
+    return wheelhouse
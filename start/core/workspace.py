@@ -0,0 +1,227 @@
+"""Workspace of several projects installed into one environment.
+
+The root `pyproject.toml` lists the member projects by glob patterns:
+
+```toml
+[tool.start.workspace]
+members = ["packages/*"]
+exclude = ["packages/legacy"]
+```
+
+Dependencies of all groups of the members are merged by canonical name, so
+they are resolved by one pip call with the members installed as editable.
+Requirements on other members are satisfied by the editable installs.
+"""
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+
+import rtoml
+from packaging.specifiers import InvalidSpecifier, SpecifierSet
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion, Version
+from typer import Exit
+
+from start.core.dependency import Dependency, DependencyManager
+from start.logger import Error
+
+if TYPE_CHECKING:
+    from start.core.metadata import EnvMetadata
+
+CONFIG_FILE = "pyproject.toml"
+
+
+@dataclass
+class Member:
+    """A project in the workspace."""
+
+    name: str
+    path: Path
+    dm: DependencyManager
+
+
+@dataclass
+class MergedRequirement:
+    """Requirements of a package from all members.
+
+    Args:
+        name: Canonical name of the package
+        extras: Union of the extras
+        specifier: Intersection of the version specifiers
+        url: Direct url of the package
+        sources: Requirement strings keyed by the member requiring it
+    """
+
+    name: str
+    extras: Set[str] = field(default_factory=set)
+    specifier: SpecifierSet = field(default_factory=SpecifierSet)
+    url: str = ""
+    sources: Dict[str, List[str]] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        extras = f"[{','.join(sorted(self.extras))}]" if self.extras else ""
+        if self.url:
+            return f"{self.name}{extras} @ {self.url}"
+        return f"{self.name}{extras}{self.specifier}"
+
+    def describe(self) -> str:
+        """The requirements and their members, to report the conflict."""
+        return ", ".join(
+            f"{requirement} ({member})"
+            for member, requirements in self.sources.items()
+            for requirement in requirements
+        )
+
+
+def _candidates(specifier: SpecifierSet) -> List[Version]:
+    """Versions to test whether the specifier can be satisfied: the versions in
+    the specifier, one below, one above and one just after each of them."""
+    bounds = set()
+    for spec in specifier:
+        try:
+            bounds.add(Version(spec.version.removesuffix(".*")))
+        except InvalidVersion:
+            continue
+    if not bounds:
+        return []
+    length = max(len(bound.release) for bound in bounds)
+    candidates = [Version("0"), *bounds, Version(str(max(bounds).release[0] + 1))]
+    for bound in bounds:
+        # after the bound but before any other version of the same length
+        padding = (0,) * (length - len(bound.release))
+        candidates.append(Version(".".join(map(str, (*bound.release, *padding, 1)))))
+        if bound.pre:
+            candidates.append(Version(f"{bound.base_version}{bound.pre[0]}{bound.pre[1] + 1}"))
+    return candidates
+
+
+def is_satisfiable(specifier: SpecifierSet) -> bool:
+    """Whether any version matches all the specifiers, `===` is always assumed satisfiable."""
+    if not specifier or any(spec.operator == "===" for spec in specifier):
+        return True
+    return any(specifier.contains(version, prereleases=True) for version in _candidates(specifier))
+
+
+class Workspace:
+    """Projects listed in the root config.
+
+    Args:
+        root_config: The root `pyproject.toml` with `[tool.start.workspace]`
+    """
+
+    def __init__(self, root_config: str | Path):
+        self.root_config = Path(root_config).absolute()
+        self.root = self.root_config.parent
+        config = rtoml.load(self.root_config)
+        workspace = config.get("tool", {}).get("start", {}).get("workspace")
+        if not isinstance(workspace, dict):
+            Error(f"No [tool.start.workspace] in {root_config}")
+            raise Exit(1)
+        self.patterns: List[str] = workspace.get("members", [])
+        self.exclude: List[str] = workspace.get("exclude", [])
+        self.has_project = "project" in config
+        self.members = self._find_members()
+
+    def _find_members(self) -> List[Member]:
+        excluded = {path.resolve() for pattern in self.exclude for path in self.root.glob(pattern)}
+        members, seen = [], set()
+        for pattern in self.patterns:
+            for path in sorted(self.root.glob(pattern)):
+                if (path := path.resolve()) in excluded or path in seen:
+                    continue
+                if not (config_file := path / CONFIG_FILE).is_file():
+                    continue
+                seen.add(path)
+                dm = DependencyManager(config_file)
+                name = canonicalize_name(dm.project.get("name") or path.name)
+                members.append(Member(name, path, dm))
+        return members
+
+    def requirements(self, environment: Optional[Dict[str, str]] = None) -> List[MergedRequirement]:
+        """Dependencies and optional dependencies of the root project and all
+        members merged by canonical name, requirements on the members and
+        requirements whose markers don't match the environment are dropped.
+
+        Args:
+            environment: Environment to evaluate the markers, default to the current one
+        """
+        names = {member.name for member in self.members}
+        projects = [(member.name, member.dm) for member in self.members]
+        if self.has_project:
+            projects.insert(0, (self.root.name, DependencyManager(self.root_config)))
+
+        merged: Dict[str, MergedRequirement] = {}
+        for project, dm in projects:
+            groups = ["", *dm.project.get("optional-dependencies", {})]
+            for dependency in (dep for group in groups for dep in dm.packages(group)):
+                if (name := canonicalize_name(dependency.name)) in names:
+                    continue
+                if dependency.markers and not _evaluate(dependency, environment):
+                    continue
+                requirement = merged.setdefault(name, MergedRequirement(name))
+                requirement.sources.setdefault(project, []).append(str(dependency))
+                if dependency.extra:
+                    requirement.extras.update(e.strip() for e in dependency.extra.split(","))
+                # a different url is a conflict, the first one is kept
+                requirement.url = requirement.url or dependency.url
+                try:
+                    requirement.specifier &= SpecifierSet(dependency.version)
+                except InvalidSpecifier:
+                    continue
+        return sorted(merged.values(), key=lambda requirement: requirement.name)
+
+    @staticmethod
+    def conflicts(requirements: List[MergedRequirement]) -> List[MergedRequirement]:
+        """Requirements which can't be satisfied together, different urls or no
+        version matches all specifiers."""
+        conflicts = []
+        for requirement in requirements:
+            urls = {
+                Dependency(source).url
+                for sources in requirement.sources.values()
+                for source in sources
+            }
+            if len(urls - {""}) > 1 or not is_satisfiable(requirement.specifier):
+                conflicts.append(requirement)
+        return conflicts
+
+
+def _evaluate(dependency: Dependency, environment: Optional[Dict[str, str]]) -> bool:
+    from packaging.markers import InvalidMarker, Marker
+
+    try:
+        return Marker(dependency.markers).evaluate(environment)
+    except InvalidMarker:
+        return True
+
+
+def find_workspace(start_dir: Optional[Path] = None) -> Optional[Path]:
+    """Find the nearest root config with `[tool.start.workspace]` in the
+    directory or its parents."""
+    start_dir = (start_dir or Path.cwd()).absolute()
+    for directory in (start_dir, *start_dir.parents):
+        if not (config_file := directory / CONFIG_FILE).is_file():
+            continue
+        try:
+            config = rtoml.load(config_file)
+        except (OSError, rtoml.TomlParsingError):
+            continue
+        if isinstance(config.get("tool", {}).get("start", {}).get("workspace"), dict):
+            return config_file
+    return None
+
+
+def is_editable_install(metadata: "EnvMetadata", member: Member) -> bool:
+    """Whether the member is installed as editable from its directory, checked
+    by `direct_url.json` of the distribution (PEP 610)."""
+    if not (dist := metadata.get(member.name)):
+        return False
+    try:
+        direct_url = json.loads(dist.read_text("direct_url.json") or "{}")
+    except ValueError:
+        return False
+    if not direct_url.get("dir_info", {}).get("editable"):
+        return False
+    return direct_url.get("url") == member.path.as_uri()
@@ -1,23 +1,29 @@
 import sys
-from typing import TextIO, Union
+from typing import Union
 
-import colorama
-
-RESET = colorama.Style.RESET_ALL
+# ANSI escape codes of colors
+RESET = "\033[0m"
+RED = "\033[31m"
+GREEN = "\033[32m"
+YELLOW = "\033[33m"
+BLUE = "\033[34m"
+MAGENTA = "\033[35m"
+CYAN = "\033[36m"
 
 
 class Color:
-    """An wrapper class for colorama that allows for easy colorization of text."""
+    """An wrapper class for ANSI escape codes that allows for easy colorization of text."""
 
     color: str
-    out: TextIO = sys.stdout
+    # name of the stream in sys, looked up when printing so it can be redirected
+    out: str = "stdout"
 
     def __init__(self, msg: Union[str, "Color"], display: bool = True):
         # remove the reset code from the end of the message
         # add color code after each reset code in the message
         self.msg = str(msg).removesuffix(RESET).replace(RESET, RESET + self.color)
         if display:
-            print(self, file=self.out)
+            print(self, file=getattr(sys, self.out))
 
     def __repr__(self) -> str:
         return f"{self.color}{self.msg}{RESET}"
@@ -30,25 +36,25 @@ class Color:
 
 
 class Success(Color):
-    color: str = colorama.Fore.GREEN
+    color: str = GREEN
 
 
 class Error(Color):
-    color: str = colorama.Fore.RED
-    out = sys.stderr
+    color: str = RED
+    out = "stderr"
 
 
 class Detail(Color):
-    color: str = colorama.Fore.YELLOW
+    color: str = YELLOW
 
 
 class Warn(Color):
-    color: str = colorama.Fore.BLUE
+    color: str = BLUE
 
 
 class Prompt(Color):
-    color: str = colorama.Fore.MAGENTA
+    color: str = MAGENTA
 
 
 class Info(Color):
-    color: str = colorama.Fore.CYAN
+    color: str = CYAN
@@ -1,16 +1,14 @@
 import os
+import shutil
 import sys
-import sysconfig
 from pathlib import Path
 from subprocess import CalledProcessError, check_call, check_output
 from typing import Optional
 
-from typer import Exit
-
-from start.core.config import DEFAULT_ENV
+from start.core.config import DATA_DIR, DEFAULT_ENV
 from start.logger import Error, Info, Prompt, Warn
 
-_script_dir_name = Path(sysconfig.get_path("scripts")).name
+_script_dir_name = "Scripts" if os.name == "nt" else "bin"
 
 
 def display_activate_cmd(env_dir: Path | str, prompt: bool = True) -> str:
@@ -35,6 +33,8 @@ def display_activate_cmd(env_dir: Path | str, prompt: bool = True) -> str:
     if not shell and os.name == "nt":
         shell = "Powershell"
     if not shell:
+        from typer import Exit
+
         Warn("Unknown shell, decide for yourself how to activate the virtual environment.")
         raise Exit(1)
     bin_path = script_dir / active_scripts[shell]
@@ -63,12 +63,17 @@ def try_git_init(repo_dir: Path):
 
 def get_user_info() -> tuple[str, str]:
     """Get user info from git config"""
-    try:
-        user_name = check_output(["git", "config", "user.name"]).decode("utf-8").strip()
-        user_email = check_output(["git", "config", "user.email"]).decode("utf-8").strip()
-        return user_name, user_email
-    except (OSError, CalledProcessError):
-        return "", ""
+    from start.core import trace
+
+    with trace.phase("git user info"):
+        try:
+            trace.count("subprocesses")
+            user_name = check_output(["git", "config", "user.name"]).decode("utf-8").strip()
+            trace.count("subprocesses")
+            user_email = check_output(["git", "config", "user.email"]).decode("utf-8").strip()
+            return user_name, user_email
+        except (OSError, CalledProcessError):
+            return "", ""
 
 
 def update_config_with_default(config: dict, default: dict):
@@ -132,3 +137,91 @@ def find_executable() -> str:
 def is_env_dir(path: Path | str):
     """Check path is a virtual environment directory."""
     return Path(path, _script_dir_name, "activate").is_file()
+
+
+def read_env_config(env_dir: str | Path) -> dict[str, str]:
+    """Read key-value pairs from pyvenv.cfg of the virtual environment."""
+    config = {}
+    cfg_file = Path(env_dir, "pyvenv.cfg")
+    if not cfg_file.is_file():
+        return config
+    for line in cfg_file.read_text(encoding="utf-8").splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            config[key.strip().lower()] = value.strip()
+    return config
+
+
+def activated_environ(env_dir: Path | str, environ: Optional[dict] = None) -> dict[str, str]:
+    """Environment variables as the activate script sets them: `VIRTUAL_ENV`,
+    `VIRTUAL_ENV_PROMPT` and `PATH` are set and `PYTHONHOME` is unset.
+
+    Args:
+        env_dir: Path to the virtual environment directory
+        environ: Variables to start from, default to `os.environ`
+    """
+    env_dir = os.path.abspath(env_dir)
+    environ = dict(os.environ if environ is None else environ)
+    environ.pop("PYTHONHOME", None)
+    environ["VIRTUAL_ENV"] = env_dir
+    environ["VIRTUAL_ENV_PROMPT"] = read_env_config(env_dir).get("prompt") or os.path.basename(
+        env_dir
+    )
+    path = environ.get("PATH")
+    bin_dir = os.path.join(env_dir, _script_dir_name)
+    environ["PATH"] = os.pathsep.join((bin_dir, path)) if path else bin_dir
+    return environ
+
+
+def exec_in_env(env_dir: Path | str, commands: list[str]) -> int:
+    """Run the command in the virtual environment without a shell, the current
+    process is replaced by the command except on Windows.
+
+    Args:
+        env_dir: Path to the virtual environment directory
+        commands: The executable and its arguments, passed as is
+    Returns:
+        return_code: Return code of the command, only returned on Windows
+    Raises:
+        FileNotFoundError: The executable is not found in PATH
+    """
+    environ = activated_environ(env_dir)
+    if os.name == "nt":
+        import subprocess
+
+        # the executable is found in PATH of the current process by CreateProcess
+        executable = shutil.which(commands[0], path=environ["PATH"]) or commands[0]
+        return subprocess.call([executable, *commands[1:]], env=environ)
+    os.execvpe(commands[0], commands, environ)
+
+
+def find_env(env_name: str, data_dir: Path = DATA_DIR) -> Optional[Path]:
+    """Find the virtual environment by name in the registry, then in the data
+    directory and current directory, the default environment names will be
+    checked in each directory.
+
+    Args:
+        env_name: Name or path of the virtual environment
+        data_dir: Data directory of start
+    Returns:
+        The path of the virtual environment if found, otherwise None
+    """
+    from start.core.registry import EnvRegistry
+
+    if env_path := EnvRegistry(data_dir).lookup(env_name):
+        return env_path
+    for base_dir in (data_dir, Path.cwd()):
+        for env in (".", *DEFAULT_ENV):
+            if is_env_dir(env_path := base_dir / env_name / env):
+                return env_path
+    return None
+
+
+def link_or_copy(src: Path | str, dest: Path | str):
+    """Hardlink src to dest, fall back to copy when hardlink is not supported,
+    e.g. across devices or on some network file systems.
+    """
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
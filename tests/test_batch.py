@@ -0,0 +1,55 @@
+from pathlib import Path
+
+from start.core.batch import EnvSpec, create_envs, load_manifest
+from tests.base import TestBase
+
+OPTIONS = {"with_pip": False, "upgrade_core": False}
+
+
+class TestBatch(TestBase):
+    def setUp(self) -> None:
+        self.data_dir = Path(self.tmp_dir, self._testMethodName)
+        self.log_dir = self.data_dir / "logs"
+
+    def test_load_manifest(self):
+        self.data_dir.mkdir()
+        manifest = self.data_dir / "envs.toml"
+        manifest.write_text(
+            "[envs.first]\n"
+            'packages = ["pytest"]\n'
+            'require = "requirements.txt"\n'
+            "[envs.second]\n"
+            'from-base = "first"\n'
+        )
+        self.assertEqual(
+            load_manifest(manifest),
+            [
+                EnvSpec("first", ["pytest"], str(self.data_dir.absolute() / "requirements.txt")),
+                EnvSpec("second", from_base="first"),
+            ],
+        )
+
+    def test_create_envs(self):
+        specs = [
+            EnvSpec("cloned", from_base="base"),
+            EnvSpec("base"),
+            EnvSpec("other"),
+            EnvSpec("missing_base", from_base="nonexistent"),
+            EnvSpec("loop", from_base="loop"),
+        ]
+        results = create_envs(specs, self.data_dir, jobs=2, options=OPTIONS, log_dir=self.log_dir)
+        self.assertEqual([result.name for result in results], [spec.name for spec in specs])
+        self.assertEqual([result.success for result in results], [True, True, True, False, False])
+        for name in ("base", "cloned", "other"):
+            self.assertTrue((self.data_dir / name / "pyvenv.cfg").is_file())
+            self.assertTrue((self.log_dir / f"{name}.log").is_file())
+        self.assertIn("Cloning virtual environment", (self.log_dir / "cloned.log").read_text())
+        self.assertEqual(results[3].error, "base environment nonexistent not found")
+        self.assertEqual(results[4].error, "circular base environment")
+
+        with self.subTest(test="Existing environments fail"):
+            (result,) = create_envs(
+                [EnvSpec("base")], self.data_dir, options=OPTIONS, log_dir=self.log_dir
+            )
+            self.assertFalse(result.success)
+            self.assertIn("already exists", (self.log_dir / "base.log").read_text())
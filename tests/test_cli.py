@@ -1,3 +1,4 @@
+import json
 import os
 import subprocess
 from pathlib import Path
@@ -7,6 +8,8 @@ from typer.testing import CliRunner
 
 from start.cli import app
 from start.core.dependency import Dependency
+from start.core.graph import PackageGraph
+from start.utils import display_activate_cmd
 from tests.base import TestBase
 
 test_project = "test_project"
@@ -45,22 +48,105 @@ class TestProject(TestBase, InvokeMixin):
             f"Virtual environment {env_dir.resolve()} already exists, use --force to override"
         )
 
-    @patch("start.cli.project.DependencyManager")
-    @patch("start.cli.project.PipManager")
-    def test_install(self, mock_pip_manager: MagicMock, mock_dependency_manager: MagicMock):
+    @patch("start.core.metadata.EnvMetadata")
+    @patch("start.core.dependency.DependencyManager")
+    @patch("start.core.pip_manager.PipManager")
+    def test_install(
+        self,
+        mock_pip_manager: MagicMock,
+        mock_dependency_manager: MagicMock,
+        mock_metadata: MagicMock,
+    ):
         import os
 
+        mock_metadata.return_value.is_satisfied.return_value = False
         Path(test_project).mkdir()
         os.chdir(test_project)
 
         mock_dependency_manager.return_value.packages.return_value = [test_package]
+        mock_dependency_manager.return_value.constraints = []
+        mock_dependency_manager.return_value.pip_options = []
         dep_file = Path("pyproject.toml").resolve()
         dep_file.write_text(f"[project]\ndependencies = [{test_package}]")
         self.invoke(["install"])
         mock_dependency_manager.assert_called_once_with(dep_file)
-        mock_pip_manager.assert_called_with(verbose=False)
+        mock_pip_manager.assert_called_with(verbose=False, wheelhouse=None)
         mock_pip_manager.return_value.install.assert_called_once_with(test_package, pip_args=[])
 
+        with self.subTest(test="All requirements satisfied"):
+            mock_metadata.return_value.is_satisfied.return_value = True
+            result = self.invoke(["install"])
+            self.assertEqual(result.exit_code, 0)
+            mock_pip_manager.return_value.install.assert_called_once()
+
+        with self.subTest(test="Reinstall satisfied requirements"):
+            result = self.invoke(["install", "--upgrade"])
+            self.assertEqual(result.exit_code, 0)
+            mock_pip_manager.return_value.install.assert_called_with(
+                test_package, pip_args=["--upgrade"]
+            )
+
+    @patch("start.core.metadata.EnvMetadata")
+    @patch("start.core.pip_manager.PipManager")
+    def test_install_with_lock(self, mock_pip_manager: MagicMock, mock_metadata: MagicMock):
+        from start.core.dependency import DependencyManager
+        from start.core.lock import LockedPackage, Lockfile, content_hash
+
+        project_dir = Path(self.tmp_dir, "locked_project")
+        project_dir.mkdir()
+        os.chdir(project_dir)
+        Path("pyproject.toml").write_text(f'[project]\ndependencies = ["{test_package}"]')
+        lockfile = Lockfile.for_config("pyproject.toml")
+        lockfile.groups["default"] = [LockedPackage(test_package, "0.5", hashes=["sha256:abc"])]
+        lockfile.content_hash = content_hash(DependencyManager("pyproject.toml"))
+        lockfile.save()
+        mock_metadata.return_value.marker_environment = {
+            "python_version": "3.11",
+            "sys_platform": "linux",
+        }
+        mock_metadata.return_value.is_satisfied.return_value = False
+        mock_pip = mock_pip_manager.return_value
+
+        result = self.invoke(["install"])
+        self.assertEqual(result.exit_code, 0)
+        mock_pip.install_locked.assert_called_once_with(
+            [f"{test_package}==0.5 --hash=sha256:abc"], pip_args=[]
+        )
+        mock_pip.install.assert_not_called()
+
+        result = self.invoke(["install", "--no-lock"])
+        self.assertEqual(result.exit_code, 0)
+        mock_pip.install.assert_called_once_with(test_package, pip_args=[])
+
+    @patch("start.core.metadata.EnvMetadata")
+    @patch("start.core.pip_manager.PipManager")
+    def test_install_workspace(self, mock_pip_manager: MagicMock, mock_metadata: MagicMock):
+        from tests.test_workspace import ENVIRONMENT, make_workspace
+
+        root = Path(self.tmp_dir, "workspace")
+        make_workspace(
+            root, {"app": (["requests>=2", "lib"], {}), "lib": (["requests<3"], {"dev": ["six"]})}
+        )
+        os.chdir(root / "packages" / "app")
+        mock_metadata.return_value.marker_environment = ENVIRONMENT
+        mock_metadata.return_value.is_satisfied.side_effect = lambda package: package == "six"
+        mock_metadata.return_value.get.return_value = None
+        mock_pip = mock_pip_manager.return_value
+
+        result = self.invoke(["install", "--workspace"])
+        self.assertEqual(result.exit_code, 0)
+        members = [str((root / "packages" / name).resolve()) for name in ("app", "lib")]
+        mock_pip.install.assert_called_once_with("requests<3,>=2", pip_args=[], editable=members)
+
+        with self.subTest(test="Conflicts are reported before pip runs"):
+            mock_pip.install.reset_mock()
+            (root / "packages" / "lib" / "pyproject.toml").write_text(
+                '[project]\nname = "lib"\ndependencies = ["requests<2"]'
+            )
+            result = self.invoke(["install", "--workspace"])
+            self.assertEqual(result.exit_code, 1)
+            mock_pip.install.assert_not_called()
+
 
 class TestModify(TestBase, InvokeMixin):
     def setUp(self) -> None:
@@ -68,8 +154,8 @@ class TestModify(TestBase, InvokeMixin):
         self.dep_file = Path("requirements.txt")
         self.dep_file.write_text("")
 
-    @patch("start.cli.modify.DependencyManager")
-    @patch("start.cli.modify.PipManager")
+    @patch("start.core.dependency.DependencyManager")
+    @patch("start.core.pip_manager.PipManager")
     def test_modify_add(self, mock_pip_manager, mock_dependency_manager):
         mock_pip = mock_pip_manager.return_value
         mock_dm = mock_dependency_manager.return_value
@@ -82,7 +168,7 @@ class TestModify(TestBase, InvokeMixin):
             with self.subTest(method=method):
                 res = self.invoke([method, *packages])
                 self.assertEqual(res.exit_code, 0)
-                mock_pip_manager.assert_called_with(verbose=False)
+                mock_pip_manager.assert_called_with(verbose=False, wheelhouse=None)
                 mock_method.assert_called_with(*packages, pip_args=[])
                 mock_dm.modify_dependencies.assert_called_with(
                     method=method,
@@ -95,7 +181,7 @@ class TestModify(TestBase, InvokeMixin):
                     [method, *packages, "-g", group, "-d", self.dep_file, *pip_args, "-v"]
                 )
                 self.assertEqual(res.exit_code, 0)
-                mock_pip_manager.assert_called_with(verbose=True)
+                mock_pip_manager.assert_called_with(verbose=True, wheelhouse=None)
                 mock_method.assert_called_with(*packages, pip_args=pip_args)
                 mock_dependency_manager.assert_called_with(str(self.dep_file))
                 mock_dm.modify_dependencies.assert_called_with(
@@ -105,49 +191,89 @@ class TestModify(TestBase, InvokeMixin):
                     save=True,
                 )
 
+    @patch("start.core.metadata.EnvMetadata")
+    @patch("start.core.dependency.DependencyManager")
+    @patch("start.core.pip_manager.PipManager")
+    def test_remove_prune(self, mock_pip_manager, mock_dependency_manager, mock_metadata):
+        mock_pip = mock_pip_manager.return_value
+        mock_pip.uninstall.side_effect = lambda *packages, pip_args: list(packages)
+        mock_dm = mock_dependency_manager.return_value
+        mock_dm.project = {"optional-dependencies": {"dev": ["dep2"]}}
+        mock_dm.packages.side_effect = lambda group="": [Dependency("dep2")] if group else []
+        metadata = mock_metadata.return_value
+        metadata.graph = PackageGraph({"package1": ["dep1", "dep2"], "dep1": ["not-installed"]})
+        metadata.installed = {"package1": {}, "dep1": {}, "dep2": {}}
+
+        res = self.invoke(["remove", "package1", "--prune"])
+        self.assertEqual(res.exit_code, 0)
+        mock_pip.uninstall.assert_has_calls(
+            [call("package1", pip_args=[]), call("dep1", pip_args=[])]
+        )
+
 
 class TestInspect(TestBase, InvokeMixin):
-    @patch("start.cli.inspect.PipManager")
-    def test_show_packages(self, mock_pip_manager: MagicMock):
-        mock_pip = mock_pip_manager.return_value
+    @patch("start.cli.inspect.Error")
+    @patch("start.cli.inspect.Detail")
+    @patch("start.core.metadata.EnvMetadata")
+    def test_show_packages(
+        self, mock_metadata: MagicMock, mock_detail: MagicMock, mock_error: MagicMock
+    ):
+        mock_metadata.return_value.show.side_effect = [
+            {"Name": "package1", "Version": "1.0"},
+            None,
+        ]
 
         result = self.invoke(["show", "package1", "package2"])
         self.assertEqual(result.exit_code, 0)
-        mock_pip.execute.assert_called_with(["show", "package1", "package2"])
+        mock_metadata.return_value.show.assert_has_calls([call("package1"), call("package2")])
+        mock_detail.assert_called_with("Name: package1\nVersion: 1.0")
+        mock_error.assert_called_with("Package(s) not found: package2")
 
     @patch("start.cli.inspect.Detail")
-    @patch("start.cli.inspect.PipManager")
-    def test_list_packages(self, mock_pip_manager: MagicMock, mock_detail: MagicMock):
+    @patch("start.core.metadata.EnvMetadata")
+    @patch("start.core.pip_manager.PipManager")
+    def test_list_packages(
+        self, mock_pip_manager: MagicMock, mock_metadata: MagicMock, mock_detail: MagicMock
+    ):
         mock_packages = ["package1", "package2"]
-        mock_pip = mock_pip_manager.return_value
-        mock_pip.execute.return_value.parse_list_output.return_value = mock_packages
+        mock_metadata.return_value.packages.return_value = mock_packages
 
         result = self.invoke(["list"])
 
         self.assertEqual(result.exit_code, 0)
-        mock_pip.execute.assert_called_with(["list"])
-        mock_pip.execute.return_value.parse_list_output.assert_called_once()
+        mock_metadata.assert_called_with(mock_pip_manager.return_value.execu)
+        mock_metadata.return_value.packages.assert_called_once()
+        mock_pip_manager.return_value.execute.assert_not_called()
         mock_detail.assert_called_with("\n".join("- " + package for package in mock_packages))
 
-    @patch("start.cli.inspect.PipManager")
-    def test_list_packages_with_tree(self, mock_pip_manager: MagicMock):
+    @patch("start.core.metadata.EnvMetadata")
+    @patch("start.core.pip_manager.PipManager")
+    def test_list_packages_with_tree(self, mock_pip_manager: MagicMock, mock_metadata: MagicMock):
         mock_pip = mock_pip_manager.return_value
-        mock_pip.execute.return_value.parse_list_output.return_value = ["package1", "package2"]
-        mock_pip.analyze_packages_require.return_value = [
-            {"package1": ["dep1"]},
-            {"package2": ["dep2"]},
-        ]
-        mock_pip.generate_dependency_tree.return_value = [
-            ("package1", "tree_string1"),
-            ("package2", "tree_string2"),
-        ]
+        mock_pip.execu = "python"
+        mock_metadata.return_value.packages.return_value = ["package1", "package2", "dep1"]
+        mock_metadata.return_value.graph = PackageGraph(
+            {"package1": ["dep1"], "package2": ["dep1"], "dep1": ["dep2"]}
+        )
 
-        self.invoke(["list", "-t"])
+        result = self.invoke(["list", "-t"])
 
-        mock_pip.execute.assert_called_with(["list"])
-        mock_pip.execute.return_value.parse_list_output.assert_called_once()
-        mock_pip.analyze_packages_require.assert_called_with("package1", "package2")
-        mock_pip.generate_dependency_tree.assert_called()
+        mock_metadata.return_value.packages.assert_called_once()
+        mock_pip.execute.assert_not_called()
+        lines = [line for line in result.output.splitlines() if "─" in line]
+        self.assertEqual(len(lines), 5)
+        self.assertIn("dep1\x1b[0m\x1b[33m (*)", lines[-1])
+
+        with self.subTest(test="Reverse with depth"):
+            result = self.invoke(["list", "--reverse", "--depth", "1", "--format", "json"])
+            self.assertEqual(
+                json.loads(result.output),
+                {"roots": ["dep2"], "packages": {"dep2": ["dep1"], "dep1": []}},
+            )
+
+        with self.subTest(test="Dot format"):
+            result = self.invoke(["list", "--format", "dot"])
+            self.assertIn('    "package1" -> "dep1";', result.output.splitlines())
 
     @patch("start.cli.inspect.ensure_path")
     def test_dependency_file_not_found(self, mock_ensure_path: MagicMock):
@@ -157,7 +283,7 @@ class TestInspect(TestBase, InvokeMixin):
         self.assertEqual(result.exit_code, 1)
         mock_ensure_path.assert_called_with(filename)
 
-    @patch("start.cli.inspect.DependencyManager")
+    @patch("start.core.dependency.DependencyManager")
     @patch("start.cli.inspect.ensure_path")
     def test_list_packages_with_dependency(
         self, mock_ensure_path: MagicMock, mock_dependency_manager: MagicMock
@@ -182,6 +308,32 @@ class TestInspect(TestBase, InvokeMixin):
             mock_dm.packages.assert_called_with("test_group")
 
 
+class TestCache(TestBase, InvokeMixin):
+    @patch("start.cli.cache.Success")
+    @patch("start.cli.cache.Detail")
+    def test_cache(self, mock_detail: MagicMock, mock_success: MagicMock):
+        from start.core.wheelhouse import Wheelhouse
+
+        wheelhouse_dir = Path(self.tmp_dir, "wheels")
+        with patch("start.core.wheelhouse.WHEELHOUSE_DIR", wheelhouse_dir):
+            wheel = Path("a-1.0-py3-none-any.whl")
+            wheel.write_bytes(b"wheel")
+            Wheelhouse().add(wheel)
+
+            result = self.invoke(["cache", "list"])
+            self.assertEqual(result.exit_code, 0)
+            self.assertIn("- a-1.0-py3-none-any.whl (5B", mock_detail.call_args.args[0])
+
+            result = self.invoke(["cache", "prune", "--max-size", "0"])
+            self.assertEqual(result.exit_code, 0)
+            mock_detail.assert_called_with("- a-1.0-py3-none-any.whl")
+            mock_success.assert_called_with("Removed 1 wheels, 0B left.")
+
+            result = self.invoke(["cache", "clear"])
+            self.assertEqual(result.exit_code, 0)
+            self.assertFalse((wheelhouse_dir / "links").exists())
+
+
 class TestEnvironmentCreate(TestBase, InvokeMixin):
     def setUp(self) -> None:
         from start.cli import environment
@@ -206,6 +358,13 @@ class TestEnvironmentCreate(TestBase, InvokeMixin):
             self.assertEqual(result.exit_code, 0)
             mock_info.assert_called_with(f"{env_name}({env_path})")
 
+        with self.subTest(test="Test list environments with details"):
+            result = self.invoke(["env", "list", "--details"])
+            self.assertEqual(result.exit_code, 0)
+            self.assertRegex(result.output, r"python [\d.]+, \d+ packages, .*last used never")
+            mock_info.assert_called_with(mock_info.call_args.args[0])
+            self.assertTrue(mock_info.call_args.args[0].startswith("Total: 1 environments"))
+
         with self.subTest(test="Test activate command"):
             result = self.invoke(["env", "activate", env_name])
             self.assertEqual(result.exit_code, 0)
@@ -214,6 +373,92 @@ class TestEnvironmentCreate(TestBase, InvokeMixin):
             result = self.invoke(["env", "activate", "nonexistent_env"])
             self.assertNotEqual(result.exit_code, 0)
 
+    def test_create_from_base(self):
+        base_env, env_name = "base_env", "cloned_env"
+        result = self.invoke(["env", "create", base_env, "--without-pip", "--without-upgrade"])
+        self.assertEqual(result.exit_code, 0)
+        base_dir = Path(self.tmp_dir, base_env)
+        bin_name = "Scripts" if os.name == "nt" else "bin"
+        site_packages = next(base_dir.glob("**/site-packages"))
+        (site_packages / "fake_module.py").write_text("")
+        (base_dir / bin_name / "fake-script").write_text(f"#!{base_dir / bin_name}/python\n")
+
+        result = self.invoke(["env", "create", env_name, "--from-base", base_env])
+        self.assertEqual(result.exit_code, 0)
+        env_dir = Path(self.tmp_dir, env_name)
+        cloned_module = env_dir / site_packages.relative_to(base_dir) / "fake_module.py"
+        self.assertTrue(cloned_module.samefile(site_packages / "fake_module.py"))
+        self.assertEqual(
+            (env_dir / bin_name / "fake-script").read_text(), f"#!{env_dir / bin_name}/python\n"
+        )
+        self.assertIn(str(env_dir), (env_dir / bin_name / "activate").read_text())
+        self.assertTrue((env_dir / "pyvenv.cfg").is_file())
+
+        result = self.invoke(["env", "create", "other_env", "--from-base", "nonexistent_env"])
+        self.assertEqual(result.exit_code, 1)
+
+    def test_create_many(self):
+        with patch("start.core.batch.LOG_DIR", Path(self.tmp_dir, "logs")):
+            result = self.invoke(
+                [
+                    "env",
+                    "create-many",
+                    "batch_one",
+                    "batch_two",
+                    "--without-pip",
+                    "--without-upgrade",
+                    "-j",
+                    "2",
+                ]
+            )
+            self.assertEqual(result.exit_code, 0)
+            self.assertTrue(Path(self.tmp_dir, "batch_one", "pyvenv.cfg").is_file())
+            self.assertTrue(Path(self.tmp_dir, "batch_two", "pyvenv.cfg").is_file())
+            self.assertTrue(Path(self.tmp_dir, "logs", "batch_one.log").is_file())
+
+            # existing environment fails, others are still created
+            result = self.invoke(
+                [
+                    "env",
+                    "create-many",
+                    "batch_one",
+                    "batch_three",
+                    "--without-pip",
+                    "--without-upgrade",
+                ]
+            )
+            self.assertEqual(result.exit_code, 1)
+            self.assertTrue(Path(self.tmp_dir, "batch_three", "pyvenv.cfg").is_file())
+
+        result = self.invoke(["env", "create-many"])
+        self.assertEqual(result.exit_code, 1)
+        result = self.invoke(["env", "create-many", "batch_one", "batch_one"])
+        self.assertEqual(result.exit_code, 1)
+
+    def test_dedupe(self):
+        content = b"identical\n" * 1024
+        modules = []
+        for name in ("dedupe_one", "dedupe_two"):
+            result = self.invoke(["env", "create", name, "--without-pip", "--without-upgrade"])
+            self.assertEqual(result.exit_code, 0)
+            modules.append(next(Path(self.tmp_dir, name).glob("**/site-packages")) / "module.py")
+            modules[-1].write_bytes(content)
+
+        result = self.invoke(["env", "dedupe", "dedupe_one", "dedupe_two", "--dry-run"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertFalse(modules[0].samefile(modules[1]))
+
+        result = self.invoke(["env", "dedupe"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertTrue(modules[0].samefile(modules[1]))
+
+        result = self.invoke(["env", "dedupe", "dedupe_two", "--restore"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertFalse(modules[0].samefile(modules[1]))
+
+        result = self.invoke(["env", "dedupe", "nonexistent_env"])
+        self.assertEqual(result.exit_code, 1)
+
     def test_run_with_env(self):
         result = self.invoke(["env", "create", test_env, "--without-pip", "--without-upgrade"])
         self.assertEqual(result.exit_code, 0)
@@ -226,3 +471,57 @@ class TestEnvironmentCreate(TestBase, InvokeMixin):
         self.assertEqual(
             Path("out").read_text().strip(), f"{Path(test_env, 'bin/python3').resolve()}"
         )
+
+        with self.subTest(test="Run without shell"):
+            code = "import os, sys;print(os.environ['VIRTUAL_ENV'], *sys.argv[1:])"
+            output = subprocess.check_output(
+                ["start", "run", "-n", test_env, "--direct", "--", "python", "-c", code, "a b"],
+                env={**os.environ, "SHELL": ""},
+                text=True,
+            )
+            self.assertEqual(output.strip(), f"{Path(test_env).absolute()} a b")
+
+
+class TestStartup(TestBase):
+    def test_activate_fast_path(self):
+        from start.__main__ import activate_fast_path
+
+        subprocess.check_call(["python", "-m", "venv", test_env, "--without-pip"])
+        self.assertFalse(activate_fast_path(["env", "activate", "--help"]))
+        self.assertFalse(activate_fast_path(["env", "create", test_env]))
+        self.assertFalse(activate_fast_path(["env", "activate", "nonexistent_env"]))
+        # activate command should not import the cli framework
+        code = (
+            "import sys;from start.__main__ import activate_fast_path;"
+            f"assert activate_fast_path(['env', 'activate', '{test_env}']);"
+            "assert 'typer' not in sys.modules and 'start.cli' not in sys.modules"
+        )
+        output = subprocess.check_output(["python", "-c", code], text=True)
+        self.assertEqual(output.strip(), display_activate_cmd(Path(test_env), prompt=False))
+
+    def test_run_fast_path(self):
+        from start.__main__ import run_fast_path
+
+        subprocess.check_call(["python", "-m", "venv", test_env, "--without-pip"])
+        self.assertFalse(run_fast_path(["run", "-n", test_env, "python"]))
+        self.assertFalse(run_fast_path(["run", "--direct", "-n", test_env]))
+        self.assertFalse(run_fast_path(["run", "--direct", "-n", "nonexistent_env", "python"]))
+        # run command should not import the cli framework
+        code = (
+            "import sys;from start.__main__ import run_fast_path;"
+            f"run_fast_path(['run', '-n', '{test_env}', '--direct', 'python', '-c', "
+            "'import sys;print(sys.prefix)'])"
+        )
+        output = subprocess.check_output(["python", "-c", code], text=True)
+        self.assertEqual(output.strip(), str(Path(test_env).absolute()))
+
+        with self.subTest(test="Options of run after the command are passed to it"):
+            command = ["python", "-c", "import sys;print(sys.argv[1:])", "-n", "4", "--help"]
+            args = ["run", "--direct", "-n", test_env, *command]
+            entries = {
+                "fast path": ["-m", "start"],
+                "cli": ["-c", "import sys;from start.cli import app;sys.argv[0]='start';app()"],
+            }
+            for name, entry in entries.items():
+                output = subprocess.check_output(["python", *entry, *args], text=True)
+                self.assertEqual(output.strip(), "['-n', '4', '--help']", name)
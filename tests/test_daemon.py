@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+from pathlib import Path
+
+from start.client import forward, request, subcommand
+from tests.base import TestBase
+
+
+@unittest.skipIf(os.name == "nt", "The daemon is not supported on Windows")
+class TestDaemon(TestBase):
+    def setUp(self) -> None:
+        self.data_dir = Path(self.tmp_dir, "data")
+        self.socket = str(self.data_dir / "daemon.sock")
+        self.env = {**os.environ, "START_DATA_DIR": str(self.data_dir), "START_DAEMON": "1"}
+        subprocess.check_call(
+            [sys.executable, "-m", "venv", self.data_dir / "env1", "--without-pip"]
+        )
+        self.daemon = subprocess.Popen(
+            [sys.executable, "-m", "start.core.daemon", "60"],
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+        )
+        self.addCleanup(self.daemon.kill)
+        deadline = time.monotonic() + 30
+        while request({"command": "status"}, self.socket) is None:
+            self.assertLess(time.monotonic(), deadline, "daemon not started")
+            time.sleep(0.05)
+
+    def start(self, *args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [sys.executable, "-m", "start", *args], env=self.env, capture_output=True, text=True
+        )
+
+    def test_daemon(self):
+        result = self.start("env", "list")
+        self.assertEqual(result.returncode, 0)
+        self.assertIn(f"env1({self.data_dir / 'env1'})", result.stdout)
+
+        result = self.start("env", "activate", "nonexistent_env")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Virtual environment nonexistent_env not found.", result.stderr)
+
+        # commands were run by the daemon
+        self.assertEqual(request({"command": "status"}, self.socket)["commands"], 2)
+
+        result = self.start("daemon", "stop")
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(self.daemon.wait(10), 0)
+        self.assertFalse(os.path.exists(self.socket))
+
+        # fall back to run the command in the client
+        result = self.start("env", "list")
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("env1", result.stdout)
+
+    def test_local_commands(self):
+        self.assertEqual(subcommand(["--trace", "t.json", "--trace-format=chrome", "run"]), "run")
+        self.assertIsNone(subcommand(["--profile", "--help"]))
+
+        # start run replaces the process, so it's run by the client
+        command = ["run", "--direct", "-n", "env1", "python", "-c", "print('in client')"]
+        result = self.start("--profile", *command)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "in client")
+
+        # the daemon refuses to run it even if the client sends it
+        self.assertIsNone(forward(["--profile", *command], self.socket))
+        status = request({"command": "status"}, self.socket)
+        self.assertEqual(status["pid"], self.daemon.pid)
+        self.assertTrue(os.path.exists(self.socket))
@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+from start.core import dedupe
+from start.core.dedupe import Deduplicator
+from tests.base import TestBase
+
+CONTENT = b"identical content\n" * 100
+
+
+class TestDeduplicator(TestBase):
+    def setUp(self) -> None:
+        self.root = Path(self.tmp_dir, self._testMethodName)
+        self.envs = [self.root / name for name in ("one", "two", "three")]
+        for env in self.envs:
+            (env / "pkg").mkdir(parents=True)
+            (env / "pkg" / "module.py").write_bytes(CONTENT)
+            (env / "pkg" / "small.py").write_bytes(b"small")
+        (self.envs[0] / "pkg" / "other.py").write_bytes(CONTENT.upper())
+        (self.envs[2] / "pkg" / "module.py").write_bytes(CONTENT.upper())
+        self.state_dir = self.root / "cache"
+
+    def test_dedupe(self):
+        deduplicator = Deduplicator(self.state_dir, jobs=2)
+        result = deduplicator.dedupe(self.envs, dry_run=True)
+        self.assertEqual((result.groups, result.files, result.saved), (2, 2, 2 * len(CONTENT)))
+        self.assertFalse(deduplicator.path.exists())
+
+        result = Deduplicator(self.state_dir, jobs=2).dedupe(self.envs)
+        self.assertEqual((result.files, result.saved, result.skipped), (2, 2 * len(CONTENT), 0))
+        one, two, three = (env / "pkg" / "module.py" for env in self.envs)
+        self.assertTrue(one.samefile(two))
+        self.assertTrue((self.envs[0] / "pkg" / "other.py").samefile(three))
+        self.assertFalse(one.samefile(three))
+        # small files are ignored
+        self.assertFalse(
+            (self.envs[0] / "pkg" / "small.py").samefile(self.envs[1] / "pkg" / "small.py")
+        )
+        journal = json.loads(deduplicator.path.read_text())
+        self.assertEqual(len(journal["links"]), 2)
+
+        with self.subTest(test="Cached digests are reused"):
+            with patch.object(dedupe, "file_digest") as mock_digest:
+                result = Deduplicator(self.state_dir).dedupe(self.envs)
+                mock_digest.assert_not_called()
+            self.assertEqual((result.groups, result.files), (0, 0))
+
+        with self.subTest(test="Restore hardlinked files"):
+            count = Deduplicator(self.state_dir).restore([self.envs[1]])
+            self.assertEqual(count, 1)
+            self.assertFalse(one.samefile(two))
+            self.assertEqual(two.read_bytes(), CONTENT)
+            self.assertEqual(len(Deduplicator(self.state_dir).links), 1)
+
+    def test_reflink(self):
+        one, two = (env / "pkg" / "module.py" for env in self.envs[:2])
+        result = Deduplicator(self.state_dir).dedupe(self.envs, reflink=True)
+        # files are skipped on the filesystems which can't clone
+        self.assertEqual(result.files + result.skipped, 2)
+        self.assertFalse(one.samefile(two))
+        self.assertEqual(two.read_bytes(), CONTENT)
+        self.assertEqual(Deduplicator(self.state_dir).links, {})
+        self.assertEqual(list(two.parent.glob("*.dedupe")), [])
+
+        with self.subTest(test="Cloned files replace the duplicates"):
+            with patch.object(dedupe, "clone_file", wraps=shutil.copy2) as mock_clone:
+                result = Deduplicator(self.root / "cloned").dedupe(self.envs, reflink=True)
+            self.assertEqual(mock_clone.call_count, 2)
+            self.assertEqual((result.files, result.skipped), (2, 0))
+            self.assertFalse(one.samefile(two))
+
+    def test_changed_file(self):
+        deduplicator = Deduplicator(self.state_dir)
+        groups = deduplicator.find_duplicates(self.envs)
+        self.assertEqual(len(groups), 2)
+        # a file modified after hashing is not replaced
+        target = Path(groups[0][1].path)
+        os.utime(target, ns=(0, groups[0][1].mtime + 1_000_000_000))
+        with patch.object(Deduplicator, "find_duplicates", return_value=groups):
+            result = deduplicator.dedupe(self.envs)
+        self.assertEqual((result.files, result.skipped), (1, 1))
+        self.assertNotIn(str(target), deduplicator.links)
+        self.assertFalse(target.samefile(groups[0][0].path))
@@ -1,8 +1,10 @@
 import os
+import tempfile
 import unittest
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import rtoml
 import typer
 
 from start.core.config import DEFAULT_TOML_FILE_CONFIG
@@ -36,6 +38,24 @@ cases = [
         'python_version < "2.7"',
     ),
 ]
+pep508_cases = [
+    ("zope.interface[a.b]>=5", "zope.interface", ">=5", "a.b", ""),
+    ("SomeProject (>=1.0, <2.0)", "SomeProject", ">=1.0, <2.0", "", ""),
+    (
+        "SomeProject>1; python_version >= '3.8' and (os_name == 'nt' or extra == 'test')",
+        "SomeProject",
+        ">1",
+        "",
+        "python_version >= '3.8' and (os_name == 'nt' or extra == 'test')",
+    ),
+    (
+        "SomeProject[extra] @ https://example.com/SomeProject-1.0.whl ; os_name == 'posix'",
+        "SomeProject",
+        "",
+        "extra",
+        "os_name == 'posix'",
+    ),
+]
 vcs_cases = [
     ("MyProject@svn+https://svn.example.com/MyProject.git", "MyProject", "", "", ""),
     ("MyProject@git+file:///home/user/projects/MyProject", "MyProject", "", "", ""),
@@ -51,6 +71,24 @@ vcs_cases = [
 ]
 
 
+PYPROJECT = """# project config
+[project]
+name = "demo"
+dependencies = [
+    # runtime
+    "requests>=2.0",  # http
+    'typer',
+]
+
+[project.optional-dependencies]
+dev = ["pytest", "ruff"]
+# tools
+
+[tool.ruff]
+line-length = 100
+"""
+
+
 class TestDependency(unittest.TestCase):
     def test_dependency(self):
         for case, *meta in cases:
@@ -58,6 +96,21 @@ class TestDependency(unittest.TestCase):
             with self.subTest(case=case):
                 self.assertEqual([dep.name, dep.version, dep.extra, dep.markers], meta)
 
+    def test_pep508_dependency(self):
+        for case, *meta in pep508_cases:
+            dep = Dependency(case)
+            with self.subTest(case=case):
+                self.assertEqual([dep.name, dep.version, dep.extra, dep.markers], meta)
+        dep = Dependency(pep508_cases[-1][0])
+        self.assertEqual(dep.url, "https://example.com/SomeProject-1.0.whl")
+
+    def test_dependency_cache(self):
+        dep, other = Dependency("Some_Project.Name >= 1.0"), Dependency("Some_Project.Name >= 1.0")
+        self.assertEqual(dep.key, "some-project-name")
+        self.assertIs(dep.name, other.name)
+        self.assertEqual(Dependency("some-project.name"), dep)
+        self.assertEqual(len({dep, other, Dependency("SOME_PROJECT_NAME")}), 1)
+
     def test_svc_dependency(self):
         for case, *meta in vcs_cases:
             dep = Dependency(case)
@@ -112,16 +165,51 @@ class TestDependency(unittest.TestCase):
         self.assertTrue(self.dependency_manager._changed)
         self.assertEqual(self.dependency_manager.project["dependencies"], ["package2[extra]"])
 
-    @patch("pathlib.Path.open")
-    @patch("start.core.dependency.rtoml.dump")
-    def test_save(self, mock_dump: MagicMock, mock_open: MagicMock):
-        self.dependency_manager._changed = True
-        self.dependency_manager.save()
-        mock_dump.assert_called_once_with(
-            self.dependency_manager.config, self.config_file, pretty=True
-        )
-
-        self.dependency_manager.is_toml_file = False
-        self.dependency_manager._changed = True
-        self.dependency_manager.save()
-        mock_open.assert_called_once_with("w", encoding="utf-8")
+    def test_save(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_file = Path(tmp_dir, "pyproject.toml")
+            config_file.write_text(PYPROJECT)
+            dm = DependencyManager(config_file)
+            dm.modify_dependencies("add", ["numpy"], save=True)
+            self.assertEqual(
+                config_file.read_text(),
+                PYPROJECT.replace("    # runtime\n", '    "numpy",\n    # runtime\n'),
+            )
+
+            requirements = Path(tmp_dir, "requirements.txt")
+            requirements.write_text("# pinned\n--index-url https://example.com\nrequests\nflask\n")
+            dm = DependencyManager(requirements)
+            dm.add(["Flask>=3"], save=True)
+            dm.remove(["requests"], save=True)
+            self.assertEqual(
+                requirements.read_text(), "# pinned\n--index-url https://example.com\nFlask>=3\n"
+            )
+            self.assertEqual(sorted(os.listdir(tmp_dir)), ["pyproject.toml", "requirements.txt"])
+
+    def test_batch(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_file = Path(tmp_dir, "pyproject.toml")
+            config_file.write_text(PYPROJECT)
+            dm = DependencyManager(config_file)
+            with patch("start.core.dependency.write_atomic") as mock_write:
+                with dm.batch() as edit:
+                    edit.add(["Requests>=2.1", "attrs"]).remove(["pytest"], group="dev")
+                    edit.add(["mkdocs"], group="docs")
+                    edit.remove(["attrs"])
+                mock_write.assert_called_once()
+                text = mock_write.call_args.args[1]
+
+            self.assertEqual(
+                text,
+                PYPROJECT.replace('"requests>=2.0",  # http', '"Requests>=2.1",  # http')
+                .replace('dev = ["pytest", "ruff"]', 'dev = ["ruff"]')
+                .replace("# tools\n", 'docs = [\n    "mkdocs",\n]\n# tools\n'),
+            )
+            self.assertEqual(
+                rtoml.loads(text)["project"],
+                {
+                    "name": "demo",
+                    "dependencies": ["Requests>=2.1", "typer"],
+                    "optional-dependencies": {"dev": ["ruff"], "docs": ["mkdocs"]},
+                },
+            )
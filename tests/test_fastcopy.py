@@ -0,0 +1,98 @@
+import errno
+import os
+from contextlib import ExitStack
+from pathlib import Path
+from unittest.mock import patch
+
+from start.core import fastcopy, trace
+from start.core.fastcopy import copy_file, copy_tree
+from tests.base import TestBase
+
+CONTENT = os.urandom(3 * 1024 * 1024 + 7)
+
+
+def unsupported(*args, **kwargs):
+    raise OSError(errno.EOPNOTSUPP, "not supported")
+
+
+class TestFastCopy(TestBase):
+    def setUp(self) -> None:
+        self.root = Path(self.tmp_dir, self._testMethodName)
+        self.root.mkdir()
+        self.src = self.root / "src.bin"
+        self.src.write_bytes(CONTENT)
+        self.src.chmod(0o750)
+
+    def test_copy_file(self):
+        dest = self.root / "dest.bin"
+        self.assertTrue(copy_file(self.src, dest))
+        self.assertEqual(dest.read_bytes(), CONTENT)
+        if os.name != "nt":
+            self.assertEqual(dest.stat().st_mode & 0o777, 0o750)
+        # existing file is not overwritten
+        self.src.write_bytes(b"changed")
+        self.assertFalse(copy_file(self.src, dest))
+        self.assertEqual(dest.read_bytes(), CONTENT)
+
+    def test_fallback(self):
+        self.src.write_bytes(CONTENT)
+        with patch.object(fastcopy, "clone_fd", unsupported):
+            for name, patches in (
+                ("copy_file_range", []),
+                ("sendfile", ["copy_file_range"]),
+                ("read and write", ["copy_file_range", "sendfile"]),
+            ):
+                with self.subTest(method=name):
+                    dest = self.root / name
+                    with ExitStack() as stack:
+                        for attr in patches:
+                            stack.enter_context(patch.object(os, attr, unsupported, create=True))
+                        copy_file(self.src, dest)
+                    self.assertEqual(dest.read_bytes(), CONTENT)
+
+        with patch.object(fastcopy, "copy_fd", side_effect=OSError(errno.ENOSPC, "no space")):
+            with self.assertRaises(OSError):
+                copy_file(self.src, self.root / "partial")
+        self.assertFalse((self.root / "partial").exists())
+
+    def test_copy_tree(self):
+        src = self.root / "tree"
+        for i in range(20):
+            (src / f"dir{i % 3}").mkdir(parents=True, exist_ok=True)
+            (src / f"dir{i % 3}" / f"file{i}").write_text(str(i))
+        (src / "dir0" / "link").symlink_to("file0")
+        (src / "dir0" / "loop").symlink_to("..")
+        (src / "dir1" / "shared").symlink_to(src / "dir2")
+        dest = self.root / "dest"
+        (dest / "dir0").mkdir(parents=True)
+        (dest / "dir0" / "file0").write_text("kept")
+
+        self.assertEqual(copy_tree(src, dest, jobs=4), 19 + 6)
+        self.assertEqual((dest / "dir0" / "file0").read_text(), "kept")
+        self.assertEqual((dest / "dir1" / "file1").read_text(), "1")
+        self.assertEqual(os.readlink(dest / "dir0" / "link"), "file0")
+        # symlinks to directories are copied as directories, loops are skipped
+        self.assertEqual((dest / "dir1" / "shared" / "file2").read_text(), "2")
+        self.assertFalse((dest / "dir0" / "loop").exists())
+
+    def test_copy_tree_traced(self):
+        src, dest = self.root / "tree", self.root / "dest"
+        src.mkdir()
+        (src / "new").write_bytes(b"12345")
+        (src / "raced").write_bytes(b"1234567890")
+        dest.mkdir()
+        (dest / "raced").write_text("created after scanning")
+        lexists = os.path.lexists
+
+        def created_later(path):
+            return False if path == str(dest / "raced") else lexists(path)
+
+        tracer = trace.enable()
+        try:
+            with patch("os.path.lexists", created_later), trace.phase("copy"):
+                self.assertEqual(copy_tree(src, dest), 1)
+                self.assertTrue(copy_file(self.src, self.root / "copied"))
+        finally:
+            trace.disable()
+        # bytes of the skipped file are not counted
+        self.assertEqual(tracer.to_json()["spans"][0]["bytes_written"], 5 + len(CONTENT))
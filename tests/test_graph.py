@@ -0,0 +1,53 @@
+import unittest
+
+from start.core.graph import PackageGraph
+
+# a -> b -> d, a -> c -> d, d -> e, f -> g <-> h, pip
+REQUIRES = {
+    "a": ["b", "c"],
+    "b": ["d"],
+    "c": ["d", "d"],
+    "d": ["e"],
+    "f": ["g"],
+    "g": ["h"],
+    "h": ["g", "pip"],
+}
+
+
+class TestPackageGraph(unittest.TestCase):
+    def setUp(self) -> None:
+        self.graph = PackageGraph(REQUIRES)
+
+    def test_edges(self):
+        self.assertEqual(len(self.graph), 9)
+        self.assertIn("e", self.graph)
+        self.assertEqual(self.graph.requires("c"), ["d"])
+        self.assertEqual(self.graph.requires("e"), [])
+        self.assertEqual(self.graph.requires("missing"), [])
+        self.assertEqual(self.graph.required_by("d"), ["b", "c"])
+        self.assertEqual(self.graph.roots(), ["a", "f"])
+        self.assertEqual(self.graph.reverse().roots(), ["e", "pip"])
+        self.assertEqual(self.graph.restrict(["b", "x"]).roots(), ["b"])
+
+    def test_closure(self):
+        self.assertEqual(self.graph.closure("a"), ["b", "c", "d", "e"])
+        self.assertEqual(self.graph.closure("e"), [])
+        # packages in a cycle require themselves
+        self.assertEqual(self.graph.closure("g"), ["g", "h", "pip"])
+        self.assertEqual(self.graph.closure("f"), ["g", "h", "pip"])
+        # a cycle not required by other packages
+        self.assertEqual(PackageGraph({"x": ["y"], "y": ["x"]}).roots(), ["x"])
+
+    def test_prunable(self):
+        self.assertEqual(self.graph.prunable(["a"]), ["b", "c", "d", "e"])
+        self.assertEqual(self.graph.prunable(["a"], keep=["c"]), ["b"])
+        self.assertEqual(self.graph.prunable(["b"]), [])
+        # pip is protected
+        self.assertEqual(self.graph.prunable(["f"]), ["g", "h"])
+
+    def test_large_graph(self):
+        # a chain deeper than the recursion limit
+        graph = PackageGraph({f"p{i}": [f"p{i + 1}"] for i in range(5000)})
+        self.assertEqual(graph.roots(), ["p0"])
+        self.assertEqual(len(graph.closure("p0")), 5000)
+        self.assertEqual(len(graph.prunable(["p0"])), 5000)
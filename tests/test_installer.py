@@ -0,0 +1,137 @@
+import base64
+import csv
+import hashlib
+import subprocess
+import venv
+import zipfile
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from start.core.installer import Installer, InstallError, WheelInstaller, install_locked
+from start.core.metadata import EnvMetadata
+from start.core.wheelhouse import Wheelhouse
+from tests.base import TestBase
+
+
+def build_wheel(dest_dir: Path, version: str, modules: dict) -> Path:
+    """Wheel of the demo package with a console script, a data script and a data file."""
+    dist_info = f"demo-{version}.dist-info"
+    files = {
+        **{f"demo/{name}": text for name, text in modules.items()},
+        f"demo-{version}.data/scripts/demo-data": "#!python\nprint('data script')\n",
+        f"demo-{version}.data/data/share/demo.txt": "shared\n",
+        f"{dist_info}/METADATA": f"Metadata-Version: 2.1\nName: demo\nVersion: {version}\n",
+        f"{dist_info}/WHEEL": "Wheel-Version: 1.0\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+        f"{dist_info}/entry_points.txt": "[console_scripts]\ndemo = demo:main\n",
+    }
+    record = []
+    for path, text in files.items():
+        digest = base64.urlsafe_b64encode(hashlib.sha256(text.encode()).digest()).rstrip(b"=")
+        record.append(f"{path},sha256={digest.decode()},{len(text.encode())}")
+    files[f"{dist_info}/RECORD"] = "\n".join([*record, f"{dist_info}/RECORD,,"]) + "\n"
+    wheel = dest_dir / f"demo-{version}-py3-none-any.whl"
+    with zipfile.ZipFile(wheel, "w") as zf:
+        for path, text in files.items():
+            zf.writestr(path, text)
+    return wheel
+
+
+class TestWheelInstaller(TestBase):
+    def setUp(self) -> None:
+        self.root = Path(self.tmp_dir, self._testMethodName)
+        self.env_dir = self.root / "env"
+        venv.EnvBuilder(with_pip=False).create(self.env_dir)
+        patcher = patch("start.core.metadata.INDEX_DIR", self.root / "index")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.wheelhouse = Wheelhouse(self.root / "wheels")
+        self.metadata = EnvMetadata(str(self.env_dir / "bin" / "python"))
+
+    def add_wheel(self, version: str, modules: dict) -> str:
+        """Add the wheel into the wheelhouse, return its sha256."""
+        (build_dir := self.root / "build").mkdir(exist_ok=True)
+        wheel = build_wheel(build_dir, version, modules)
+        digest = hashlib.sha256(wheel.read_bytes()).hexdigest()
+        self.wheelhouse.add(wheel)
+        return digest
+
+    def test_install(self):
+        digest = self.add_wheel(
+            "1.0",
+            {
+                "__init__.py": "def main():\n    print('demo 1.0')\n",
+                "old.py": "",
+            },
+        )
+        installer = WheelInstaller(self.metadata, self.wheelhouse)
+        remaining = installer.install(
+            [
+                f"demo==1.0 --hash=sha256:{digest}",
+                "missing==1.0",
+                'skipped==1.0 ; sys_platform == "nonexistent"',
+            ],
+            ["--no-deps"],
+        )
+        self.assertEqual(remaining, ["missing==1.0"])
+
+        site_packages = installer.site_packages
+        self.assertTrue((site_packages / "demo" / "old.py").is_file())
+        self.assertTrue(list((site_packages / "demo" / "__pycache__").glob("__init__.*.pyc")))
+        self.assertEqual((self.env_dir / "share" / "demo.txt").read_text(), "shared\n")
+        data_script = (self.env_dir / "bin" / "demo-data").read_text()
+        self.assertTrue(data_script.startswith(f"#!{self.metadata.execu}\n"))
+        output = subprocess.check_output([str(self.env_dir / "bin" / "demo")], text=True)
+        self.assertEqual(output.strip(), "demo 1.0")
+
+        dist_info = site_packages / "demo-1.0.dist-info"
+        self.assertEqual((dist_info / "INSTALLER").read_text(), "start\n")
+        with (dist_info / "RECORD").open() as f:
+            record = {row[0]: row for row in csv.reader(f)}
+        self.assertIn("../../../bin/demo", record)
+        self.assertIn("demo/old.py", record)
+        self.assertTrue(any("__pycache__" in path for path in record))
+        self.assertEqual(record["demo-1.0.dist-info/RECORD"][1:], ["", ""])
+        for path, (_, _hash, size) in record.items():
+            if _hash:
+                content = (site_packages / path).read_bytes()
+                self.assertEqual(int(size), len(content), path)
+
+        with self.subTest(test="Upgrade removes the files of the old version"):
+            self.add_wheel("2.0", {"__init__.py": "def main():\n    print('demo 2.0')\n"})
+            installer = WheelInstaller(EnvMetadata(self.metadata.execu), self.wheelhouse)
+            self.assertEqual(installer.install(["demo==2.0"], []), [])
+            self.assertFalse((site_packages / "demo" / "old.py").exists())
+            self.assertFalse(dist_info.exists())
+            self.assertTrue((site_packages / "demo-2.0.dist-info" / "RECORD").is_file())
+            output = subprocess.check_output([str(self.env_dir / "bin" / "demo")], text=True)
+            self.assertEqual(output.strip(), "demo 2.0")
+
+        with self.subTest(test="Mismatched hash and unsupported arguments go to pip"):
+            self.assertEqual(
+                installer.install(["demo==2.0 --hash=sha256:0"], []), ["demo==2.0 --hash=sha256:0"]
+            )
+            self.assertEqual(installer.install(["demo==2.0"], ["--target", "lib"]), ["demo==2.0"])
+            self.assertEqual(installer.install(["demo>=2.0"], []), ["demo>=2.0"])
+
+    def test_install_locked(self):
+        self.add_wheel("1.0", {"__init__.py": ""})
+        pip = MagicMock(execu=self.metadata.execu)
+        pip.install_locked.return_value = True
+        self.assertTrue(
+            install_locked(pip, ["demo==1.0", "other==1.0"], [], "auto", self.wheelhouse)
+        )
+        pip.install_locked.assert_called_once_with(["other==1.0"], pip_args=[])
+        self.assertTrue((self.env_dir / "bin" / "demo").is_file())
+
+        pip.install_locked.reset_mock()
+        self.assertTrue(install_locked(pip, ["demo==1.0"], [], "pip", self.wheelhouse))
+        pip.install_locked.assert_called_once_with(["demo==1.0"], pip_args=[])
+
+    def test_not_virtual_environment(self):
+        metadata = MagicMock(env_dir=None, python_version=self.metadata.python_version)
+        installer = WheelInstaller(metadata, self.wheelhouse)
+        self.assertEqual(installer.install(["demo==1.0"], []), ["demo==1.0"])
+        with self.assertRaises(InstallError):
+            installer.uninstall("demo")
+        with self.assertRaises(TypeError):
+            Installer()  # type: ignore[abstract]
@@ -0,0 +1,102 @@
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from start.core.dependency import DependencyManager
+from start.core.lock import LockedPackage, Lockfile, content_hash
+from tests.base import TestBase
+
+ENVIRONMENT = {"python_version": "3.11", "sys_platform": "linux"}
+
+
+def report_item(name: str, version: str, digest: str = "abc", requested: bool = True) -> dict:
+    return {
+        "metadata": {"name": name, "version": version},
+        "download_info": {
+            "url": f"https://example.com/{name}-{version}-py3-none-any.whl",
+            "archive_info": {"hashes": {"sha256": digest}},
+        },
+        "is_direct": False,
+        "requested": requested,
+    }
+
+
+class TestLockfile(TestBase):
+    def setUp(self) -> None:
+        project_dir = Path(self.tmp_dir, self._testMethodName)
+        project_dir.mkdir()
+        self.config_file = project_dir / "pyproject.toml"
+        self.config_file.write_text(
+            "[project]\n"
+            "dependencies = [\"Package_A>=1.0; python_version > '3'\"]\n"
+            "[project.optional-dependencies]\n"
+            'dev = ["package-c"]\n'
+        )
+        self.dm = DependencyManager(self.config_file)
+        self.pip = MagicMock()
+        self.pip.resolve.side_effect = [
+            {
+                "install": [report_item("Package_A", "1.2"), report_item("package-b", "2.0")],
+                "environment": ENVIRONMENT,
+            },
+            {
+                "install": [
+                    report_item("Package_A", "1.2"),
+                    report_item("package-b", "2.0"),
+                    report_item("package-c", "3.0"),
+                ],
+                "environment": ENVIRONMENT,
+            },
+        ]
+
+    def test_lock(self):
+        lockfile = Lockfile.for_config(self.config_file)
+        self.assertTrue(lockfile.lock(self.dm, self.pip, ["-i", "url"]))
+        self.pip.resolve.assert_any_call(
+            "Package_A>=1.0; python_version > '3'", pip_args=["-i", "url"]
+        )
+        self.assertEqual(list(lockfile.groups), ["default", "dev"])
+        self.assertEqual(
+            lockfile.groups["default"][0],
+            LockedPackage(
+                name="package-a",
+                version="1.2",
+                url="https://example.com/Package_A-1.2-py3-none-any.whl",
+                hashes=["sha256:abc"],
+                markers="python_version > '3'",
+            ),
+        )
+        self.assertEqual(len(lockfile.groups["dev"]), 3)
+
+        lockfile.save()
+        loaded = Lockfile.for_config(self.config_file).load()
+        self.assertEqual(loaded.path, self.config_file.with_name("start.lock"))
+        self.assertEqual(loaded.groups, lockfile.groups)
+        self.assertEqual(loaded.content_hash, content_hash(self.dm))
+        self.assertTrue(loaded.is_fresh(self.dm, ENVIRONMENT))
+        self.assertFalse(loaded.is_fresh(self.dm, {**ENVIRONMENT, "python_version": "3.12"}))
+        self.assertEqual(
+            loaded.requirements(),
+            [
+                "package-a==1.2 ; python_version > '3' --hash=sha256:abc",
+                "package-b==2.0 --hash=sha256:abc",
+            ],
+        )
+
+        self.dm.add(["package-d"])
+        self.assertFalse(loaded.is_fresh(self.dm, ENVIRONMENT))
+
+    def test_lock_failed(self):
+        self.pip.resolve.side_effect = [None]
+        lockfile = Lockfile.for_config(self.config_file)
+        self.assertFalse(lockfile.lock(self.dm, self.pip, []))
+        self.assertFalse(lockfile.exists())
+
+    def test_requirements_without_hashes(self):
+        lockfile = Lockfile(Path(self.tmp_dir, "start.lock"))
+        lockfile.groups["default"] = [
+            LockedPackage("package-a", "1.0", hashes=["sha256:abc"]),
+            LockedPackage("package-b", "1.0", url="git+https://example.com/b", is_direct=True),
+        ]
+        self.assertEqual(
+            lockfile.requirements(), ["package-a==1.0", "package-b @ git+https://example.com/b"]
+        )
@@ -0,0 +1,130 @@
+import json
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+from start.core.metadata import EnvMetadata, RequirementIndex
+from tests.base import TestBase
+
+PACKAGES = {
+    "Package_One": ("1.0", ["package-two>=2.0", "extra-package; extra == 'test'"]),
+    "package-two": ("2.0", ["package-three", "windows-only; sys_platform == 'win32'"]),
+    "package-three": ("3.0", []),
+}
+
+
+def make_fake_env(env_dir: Path, packages: dict = PACKAGES) -> str:
+    """Create a fake virtual environment with installed packages' metadata."""
+    (env_dir / "pyvenv.cfg").parent.mkdir(parents=True, exist_ok=True)
+    (env_dir / "pyvenv.cfg").write_text("home = /usr/bin\nversion_info = 3.11.7\n")
+    site_packages = env_dir / ("Lib" if os.name == "nt" else "lib/python3.11") / "site-packages"
+    for name, (version, requires) in packages.items():
+        dist_info = site_packages / f"{name}-{version}.dist-info"
+        dist_info.mkdir(parents=True)
+        lines = [f"Name: {name}", f"Version: {version}", f"Summary: {name} summary"]
+        lines.extend(f"Requires-Dist: {require}" for require in requires)
+        (dist_info / "METADATA").write_text("\n".join(lines) + "\n")
+    bin_dir = env_dir / ("Scripts" if os.name == "nt" else "bin")
+    bin_dir.mkdir(exist_ok=True)
+    return str(bin_dir / "python")
+
+
+class TestEnvMetadata(TestBase):
+    def setUp(self) -> None:
+        self.env_dir = Path(self.tmp_dir, self._testMethodName)
+        self.executable = make_fake_env(self.env_dir)
+        self.index_dir = Path(self.tmp_dir, "index", self._testMethodName)
+        patcher = patch("start.core.metadata.INDEX_DIR", self.index_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.metadata = EnvMetadata(self.executable)
+
+    def test_packages(self):
+        self.assertEqual(self.metadata.packages(), ["package-one", "package-three", "package-two"])
+        self.assertEqual(self.metadata.python_version, "3.11.7")
+
+    def test_requires(self):
+        self.assertEqual(self.metadata.requires("package_one"), ["package-two"])
+        if os.name != "nt":
+            self.assertEqual(self.metadata.requires("package-two"), ["package-three"])
+        self.assertEqual(self.metadata.requires("not-installed"), [])
+        self.assertEqual(self.metadata.required_by("package-three"), ["package-two"])
+
+    def test_is_satisfied(self):
+        self.assertTrue(self.metadata.is_satisfied("package-one"))
+        self.assertTrue(self.metadata.is_satisfied("Package_One>=1.0,<2"))
+        self.assertFalse(self.metadata.is_satisfied("package-one>1.0"))
+        self.assertFalse(self.metadata.is_satisfied("not-installed"))
+        self.assertTrue(self.metadata.is_satisfied("not-installed; python_version < '3'"))
+        self.assertFalse(self.metadata.is_satisfied("package-one @ https://example.com/a.whl"))
+        # extra-package is required by the extra test
+        self.assertFalse(self.metadata.is_satisfied("package-one[test]"))
+        self.assertTrue(self.metadata.is_satisfied("package-two[test]"))
+
+    def test_show(self):
+        info = self.metadata.show("Package-One")
+        assert info is not None
+        self.assertEqual(info["Name"], "Package_One")
+        self.assertEqual(info["Version"], "1.0")
+        self.assertEqual(info["Summary"], "Package_One summary")
+        self.assertEqual(info["Requires"], "package-two")
+        self.assertEqual(info["Required-by"], "")
+        self.assertIsNone(self.metadata.show("not-installed"))
+
+    def test_graph(self):
+        graph = self.metadata.graph
+        self.assertEqual(graph.roots(), ["package-one"])
+        self.assertEqual(graph.closure("package-one"), ["package-two", "package-three"])
+        self.assertEqual(graph.required_by("package-two"), ["package-one"])
+
+    def test_requirement_index(self):
+        index = RequirementIndex(self.metadata)
+        entries = index.load()
+        self.assertTrue(index.path.is_file())
+        self.assertEqual(index.path.parent, self.index_dir)
+        self.assertEqual(json.loads(index.path.read_text())["entries"], entries)
+
+        with patch.object(EnvMetadata, "parse_distribution") as mock_parse:
+            self.assertEqual(RequirementIndex(self.metadata).load(), entries)
+            mock_parse.assert_not_called()
+
+        # add a package and remove a package
+        new_path = make_fake_env(self.env_dir / "new", {"package-four": ("4.0", ["package-one"])})
+        site_packages = self.metadata.site_packages[0]
+        for dist_info in EnvMetadata(new_path).site_packages[0].iterdir():
+            dist_info.rename(site_packages / dist_info.name)
+        removed = next(site_packages.glob("package-three-*"))
+        for file in removed.iterdir():
+            file.unlink()
+        removed.rmdir()
+
+        with patch.object(
+            EnvMetadata, "parse_distribution", wraps=self.metadata.parse_distribution
+        ) as mock_parse:
+            metadata = EnvMetadata(self.executable)
+            self.assertEqual(metadata.packages(), ["package-four", "package-one", "package-two"])
+            mock_parse.assert_called_once()
+        self.assertEqual(metadata.requires("package-four"), ["package-one"])
+        self.assertNotIn(str(removed), RequirementIndex(metadata).read())
+
+    def test_warm_cache(self):
+        from start.core import warm
+
+        warm.enable()
+        self.addCleanup(warm.disable)
+        graph = EnvMetadata(self.executable).graph
+        with patch.object(RequirementIndex, "load") as mock_load:
+            metadata = EnvMetadata(self.executable)
+            self.assertIs(metadata.graph, graph)
+            self.assertEqual(metadata.packages(), ["package-one", "package-three", "package-two"])
+            mock_load.assert_not_called()
+
+        # installing a package changes the mtime of site-packages
+        site_packages = EnvMetadata(self.executable).site_packages[0]
+        (site_packages / "package_four-4.0.dist-info").mkdir()
+        (site_packages / "package_four-4.0.dist-info" / "METADATA").write_text(
+            "Name: package-four\nVersion: 4.0\n"
+        )
+        os.utime(site_packages, ns=(0, site_packages.stat().st_mtime_ns + 1_000_000))
+        self.assertIn("package-four", EnvMetadata(self.executable).packages())
+        self.assertIsNot(EnvMetadata(self.executable).graph, graph)
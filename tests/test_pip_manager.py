@@ -0,0 +1,137 @@
+import asyncio
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import PropertyMock, patch
+
+from start.core.pip_manager import InstalledPackage, PipManager
+
+SCRIPT = """
+import sys, time
+print("first", flush=True)
+print("warning", file=sys.stderr, flush=True)
+time.sleep(float(sys.argv[1]))
+print("second")
+sys.exit(int(sys.argv[2]))
+"""
+
+
+REPORT_SCRIPT = """
+import json, pathlib, sys
+args = sys.argv[1:]
+report = {"install": [
+    {"metadata": {"name": "Package_One", "version": "1.0"}, "requested": True,
+     "download_info": {"url": pathlib.Path(sys.argv[0]).as_uri()}},
+    {"metadata": {"name": "package-two", "version": "2.0"}, "requested": False,
+     "download_info": {"url": "https://example.com/package_two-2.0.whl"}},
+]}
+if "--report" in args:
+    with open(args[args.index("--report") + 1], "w") as f:
+        json.dump(report, f)
+print("Successfully installed Package_One-1.0 package-two-2.0")
+"""
+
+
+def fake_pip() -> PipManager:
+    """Pip manager which runs a script instead of pip."""
+    pip = PipManager(sys.executable)
+    pip.cmd = [sys.executable, "-c", SCRIPT]
+    return pip
+
+
+class TestPipManager(unittest.TestCase):
+    def test_execute(self):
+        pip = fake_pip().execute(["0", "3"])
+        self.assertEqual(pip.stdout, ["first", "second"])
+        self.assertEqual(pip.stderr, ["warning"])
+        self.assertEqual(pip.return_code, 3)
+
+    def test_stream(self):
+        async def collect():
+            lines = []
+            process = fake_pip().stream(["0.2", "0"])
+            async for name, line in process:
+                lines.append((name, line, time.perf_counter()))
+            return process, lines
+
+        process, lines = asyncio.run(collect())
+        self.assertEqual(process.return_code, 0)
+        self.assertEqual(
+            sorted(line[:2] for line in lines),
+            [("stderr", "warning"), ("stdout", "first"), ("stdout", "second")],
+        )
+        # lines are yielded when written, not after the process finished
+        self.assertGreater(lines[-1][2] - lines[0][2], 0.1)
+
+    def test_execute_concurrently(self):
+        async def run_all():
+            pip = fake_pip()
+            return await asyncio.gather(*(pip.execute_async(["0.3", str(i)]) for i in range(4)))
+
+        start = time.perf_counter()
+        processes = asyncio.run(run_all())
+        self.assertLess(time.perf_counter() - start, 1.2)
+        self.assertEqual([process.return_code for process in processes], [0, 1, 2, 3])
+
+    def test_timeout(self):
+        pip = fake_pip()
+        start = time.perf_counter()
+        with self.assertRaises(asyncio.TimeoutError):
+            pip.execute(["10", "0"], timeout=0.3)
+        self.assertLess(time.perf_counter() - start, 5)
+
+    def test_line_over_limit(self):
+        pip = PipManager(sys.executable)
+        pip.cmd = [sys.executable, "-c", "print('x' * 100); import time; time.sleep(0.3)"]
+        with patch("start.core.pip_manager.LINE_LIMIT", 10):
+            with self.assertRaises(ValueError):
+                pip.execute([], timeout=10)
+
+    def test_cancel(self):
+        async def cancel():
+            task = asyncio.create_task(fake_pip().execute_async(["10", "0"]))
+            await asyncio.sleep(0.3)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        start = time.perf_counter()
+        asyncio.run(cancel())
+        self.assertLess(time.perf_counter() - start, 5)
+
+
+class TestInstallResult(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pip = PipManager(sys.executable)
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        script = Path(tmp_dir.name, "fake_pip.py")
+        script.write_text(REPORT_SCRIPT)
+        self.script_size = script.stat().st_size
+        self.pip.cmd = [sys.executable, str(script)]
+
+    def test_install_with_report(self):
+        with patch.object(PipManager, "supports_report", new_callable=PropertyMock) as supports:
+            supports.return_value = True
+            self.assertEqual(self.pip.install("package-one", pip_args=[]), ["package-one"])
+        self.assertEqual(
+            self.pip.installed,
+            [
+                InstalledPackage("package-one", "1.0", True, self.script_size),
+                InstalledPackage("package-two", "2.0", False, None),
+            ],
+        )
+
+    def test_install_without_report(self):
+        with patch.object(PipManager, "supports_report", new_callable=PropertyMock) as supports:
+            supports.return_value = False
+            self.assertEqual(self.pip.install("package-one", pip_args=[]), ["package-one"])
+        self.assertEqual(
+            self.pip.installed,
+            [
+                InstalledPackage("package-one", "1.0", True),
+                InstalledPackage("package-two", "2.0", False),
+            ],
+        )
@@ -0,0 +1,65 @@
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from start.core import registry
+from start.core.registry import EnvRegistry
+from tests.base import TestBase
+from tests.test_metadata import make_fake_env
+
+
+def make_env(env_dir: Path, packages: dict) -> Path:
+    """Fake environment with the activate script."""
+    make_fake_env(env_dir, packages)
+    (env_dir / ("Scripts" if os.name == "nt" else "bin") / "activate").write_text("")
+    return env_dir
+
+
+class TestEnvRegistry(TestBase):
+    def setUp(self) -> None:
+        self.data_dir = Path(self.tmp_dir, self._testMethodName)
+        self.one = make_env(self.data_dir / "one", {"a": ("1.0", []), "b": ("2.0", [])})
+
+    def test_register(self):
+        envs = EnvRegistry(self.data_dir)
+        record = envs.register(self.one)
+        envs.save()
+        self.assertEqual(record["name"], "one")
+        self.assertEqual(record["python"], "3.11.7")
+        self.assertEqual(record["packages"], 2)
+        self.assertGreater(record["size"], 0)
+        saved = json.loads(envs.path.read_text())["envs"]["one"]
+        self.assertEqual(saved["path"], str(self.one.absolute()))
+
+        with self.subTest(test="Lookup updates last used time"):
+            self.assertEqual(EnvRegistry(self.data_dir).lookup("one"), self.one.absolute())
+            last_used = EnvRegistry(self.data_dir).envs["one"]["last_used"]
+            self.assertAlmostEqual(last_used, time.time(), delta=10)
+            with patch.object(EnvRegistry, "save") as mock_save:
+                EnvRegistry(self.data_dir).lookup("one")
+                mock_save.assert_not_called()
+            self.assertIsNone(EnvRegistry(self.data_dir).lookup("missing"))
+
+    def test_refresh(self):
+        records = EnvRegistry(self.data_dir).refresh()
+        self.assertEqual([record["name"] for record in records], ["one"])
+
+        with patch.object(registry, "_dir_size") as mock_size:
+            EnvRegistry(self.data_dir).refresh()
+            mock_size.assert_not_called()
+
+        # a package is installed, an environment is added and one is removed
+        site_packages = next(self.one.glob("lib*/**/site-packages"))
+        (site_packages / "c-3.0.dist-info").mkdir()
+        make_env(self.data_dir / "two" / ".venv", {})
+        os.utime(self.data_dir, ns=(0, self.data_dir.stat().st_mtime_ns + 1_000_000))
+        records = EnvRegistry(self.data_dir).refresh()
+        self.assertEqual([(r["name"], r["packages"]) for r in records], [("one", 3), ("two", 0)])
+        self.assertEqual(records[1]["path"], str(self.data_dir / "two" / ".venv"))
+
+        shutil.rmtree(self.data_dir / "two")
+        records = EnvRegistry(self.data_dir).refresh()
+        self.assertEqual([record["name"] for record in records], ["one"])
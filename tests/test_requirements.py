@@ -0,0 +1,136 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import typer
+
+from start.core import requirements
+from start.core.dependency import DependencyManager
+from start.core.requirements import constraint_args, parse_requirements
+
+
+class TestRequirements(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.root = Path(tmp_dir.name).resolve()
+
+    def write(self, name: str, content: str) -> Path:
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        return path
+
+    def test_parse(self):
+        self.write("base.txt", "six\n-c constraints/pins.txt\n")
+        self.write("constraints/pins.txt", "six==1.16.0\n-r more.txt\n")
+        self.write("constraints/more.txt", "idna<4\n")
+        self.write("dev.txt", "-r base.txt\npytest ; python_version >= '3.8'  # test\n")
+        requirements_file = self.write(
+            "requirements.txt",
+            "# comment\n"
+            "--index-url https://example.com/simple\n"
+            "requests>=2 \\\n"
+            "    --hash=sha256:abc\n"
+            "-rbase.txt\n"
+            "--requirement=dev.txt\n"
+            "-e ./local\n"
+            "-r https://example.com/requirements.txt\n",
+        )
+        with patch.dict(os.environ, {"PIN": "1.0"}):
+            self.write("extra.txt", "attrs==${PIN}\n")
+            parsed = parse_requirements(self.write("all.txt", "-r requirements.txt\n-r extra.txt"))
+
+        self.assertEqual(
+            parsed.requirements,
+            ["requests>=2", "six", "pytest ; python_version >= '3.8'", "attrs==1.0"],
+        )
+        self.assertEqual(parsed.constraints, ["six==1.16.0", "idna<4"])
+        self.assertEqual(
+            parsed.options,
+            [
+                "--index-url",
+                "https://example.com/simple",
+                "-e",
+                "./local",
+                "-r",
+                "https://example.com/requirements.txt",
+            ],
+        )
+        self.assertEqual(
+            [path.name for path in parsed.files],
+            [
+                "all.txt",
+                "requirements.txt",
+                "base.txt",
+                "pins.txt",
+                "more.txt",
+                "dev.txt",
+                "extra.txt",
+            ],
+        )
+        self.assertEqual(parse_requirements(requirements_file).requirements[0], "requests>=2")
+
+    def test_cycle(self):
+        self.write("a.txt", "six\n-r b.txt\n")
+        self.write("b.txt", "-c a.txt\n")
+        with patch("start.core.requirements.Error") as mock_error:
+            with self.assertRaises(typer.Exit):
+                parse_requirements(self.root / "a.txt")
+        mock_error.assert_called_once_with(
+            f"Circular include of requirements files: {self.root / 'a.txt'} -> "
+            f"{self.root / 'b.txt'} -> {self.root / 'a.txt'}"
+        )
+
+        self.write("c.txt", "-r missing.txt\n")
+        with patch("start.core.requirements.Error") as mock_error:
+            with self.assertRaises(typer.Exit):
+                parse_requirements(self.root / "c.txt")
+        mock_error.assert_called_once_with(
+            f"Requirements file {self.root / 'missing.txt'} not found included by "
+            f"{self.root / 'c.txt'}."
+        )
+
+    def test_cache(self):
+        path = self.write("requirements.txt", "six\n")
+        parse_requirements(path)
+        with patch.object(requirements, "parse_line") as mock_parse_line:
+            self.assertEqual(parse_requirements(path).requirements, ["six"])
+            mock_parse_line.assert_not_called()
+
+        stat = path.stat()
+        path.write_text("idna\n")
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        self.assertEqual(parse_requirements(path).requirements, ["idna"])
+
+    def test_constraint_args(self):
+        with constraint_args([]) as args:
+            self.assertEqual(args, [])
+        with constraint_args(["six==1.16.0", "idna<4"]) as args:
+            self.assertEqual(args[0], "-c")
+            self.assertEqual(Path(args[1]).read_text(), "six==1.16.0\nidna<4\n")
+        self.assertFalse(Path(args[1]).exists())
+
+    def test_dependency_manager(self):
+        self.write("base.txt", "six\nidna\n")
+        self.write("pins.txt", "six==1.16.0\n")
+        path = self.write(
+            "requirements.txt",
+            "-r base.txt\n-c pins.txt\n--no-binary :all:\n"
+            "requests>=2 \\\n    --hash=sha256:abc  # http\nidna\n",
+        )
+        dm = DependencyManager(path)
+        self.assertEqual(dm.project["dependencies"], ["requests>=2", "idna"])
+        self.assertEqual([str(dep) for dep in dm.packages()], ["requests>=2", "idna", "six"])
+        self.assertEqual(dm.constraints, ["six==1.16.0"])
+        self.assertEqual(dm.pip_options, ["--no-binary", ":all:"])
+
+        dm.add(["attrs"])
+        dm.remove(["idna"], save=True)
+        self.assertEqual(
+            path.read_text(),
+            "-r base.txt\n-c pins.txt\n--no-binary :all:\n"
+            "requests>=2 \\\n    --hash=sha256:abc  # http\nattrs\n",
+        )
@@ -1,5 +1,9 @@
+import os
+import subprocess
 from pathlib import Path
-from unittest.mock import ANY, patch
+from unittest.mock import patch
+
+from typer import Exit
 
 from start.core.template import Template, copy_template
 from tests.base import TestBase
@@ -28,6 +32,8 @@ class TestTemplate(TestBase):
         Path("test_template", "file1").touch()
         Path("test_template", "folder1", "file2").write_bytes(b"file2")
         Path("test_template", "folder1", "file3").symlink_to("file2")
+        Path("test_template", ".git").mkdir()
+        Path("test_template", ".git", "HEAD").write_text("ref: refs/heads/main\n")
 
         copy_template(Path("test_template"), Path("dest_template"))
 
@@ -40,6 +46,12 @@ class TestTemplate(TestBase):
             Path("dest_template", "folder1", "file2").read_bytes(),
         )
         self.assertEqual(Path("dest_template", "folder1", "file3").readlink(), Path("file2"))
+        # local templates are copied with their git directory
+        self.assertTrue(Path("dest_template", ".git", "HEAD").exists())
+
+        copy_template(Path("test_template"), Path("excluded_template"), exclude=(".git",))
+        self.assertTrue(Path("excluded_template", "file1").exists())
+        self.assertFalse(Path("excluded_template", ".git").exists())
 
     def test_create_by_local_template(self):
         project_name = "test_project"
@@ -59,18 +71,56 @@ class TestTemplate(TestBase):
             )
 
     def test_create_by_remote_template(self):
-        project_name = "test_project"
-        template_name = "https://github.com/remote_template.git"
-        template = Template(project_name, template_name)
+        from start.core import template as template_module
 
-        with patch("start.core.template.subprocess.check_output") as mock_check_output:
-            template.create_by_remote_template()
-            mock_check_output.assert_called_once_with(
-                ["git", "clone", template_name, project_name],
-                stderr=ANY,
-                encoding="utf-8",
+        def git(*args: str, cwd: Path | str = "."):
+            subprocess.check_output(
+                ["git", "-c", "user.name=test", "-c", "user.email=test@test", *args], cwd=cwd
             )
 
+        source = Path("template_source")
+        source.mkdir()
+        git("init", "-q", cwd=source)
+        (source / "README.md").write_text("v1")
+        git("add", ".", cwd=source)
+        git("commit", "-q", "-m", "v1", cwd=source)
+        git("clone", "-q", "--bare", str(source), "remote_template.git")
+        url = Path("remote_template.git").absolute().as_uri()
+
+        with patch.object(template_module, "REMOTE_TEMPLATES_DIR", Path(self.tmp_dir, ".remote")):
+            Template("project1", url).create()
+            self.assertEqual(Path("project1", "README.md").read_text(), "v1")
+            self.assertFalse(Path("project1", ".git").exists())
+
+            # the remote is updated, the cache is used within the ttl
+            (source / "README.md").write_text("v2")
+            git("commit", "-q", "-am", "v2", cwd=source)
+            git("push", "-q", url, "HEAD", cwd=source)
+            Template("project2", url).create()
+            self.assertEqual(Path("project2", "README.md").read_text(), "v1")
+
+            with patch.dict(os.environ, {"START_TEMPLATE_TTL": "0"}):
+                Template("project3", url, offline=True).create()
+                self.assertEqual(Path("project3", "README.md").read_text(), "v1")
+                Template("project4", url).create()
+                self.assertEqual(Path("project4", "README.md").read_text(), "v2")
+
+            with (
+                patch.dict(os.environ, {"START_TEMPLATE_TTL": "1h"}),
+                patch("start.core.template.Warn") as mock_warn,
+            ):
+                # invalid ttl falls back to the default, so the fresh cache is used
+                Template("project6", url).create()
+                self.assertEqual(Path("project6", "README.md").read_text(), "v2")
+                self.assertIn("START_TEMPLATE_TTL", mock_warn.call_args.args[0])
+
+            with self.assertRaises(Exit):
+                Template(
+                    "project5", url.replace("remote_template", "missing"), offline=True
+                ).create()
+            with patch("start.core.template.Error"), self.assertRaises(Exit):
+                Template("project5", url.replace("remote_template", "missing")).create()
+
     def test_create(self):
         project_name = "test_project"
 
@@ -0,0 +1,95 @@
+import unittest
+
+import rtoml
+
+from start.core.toml_edit import patch_arrays, scan
+
+DEPENDENCIES = ("project", "dependencies")
+DEV = ("project", "optional-dependencies", "dev")
+
+
+class TestTomlEdit(unittest.TestCase):
+    def assertPatched(self, text: str, arrays: dict, expected: str):
+        patched = patch_arrays(text, arrays)
+        self.assertEqual(patched, expected)
+        config = rtoml.loads(patched)
+        for path, values in arrays.items():
+            value = config
+            for part in path:
+                value = value[part]
+            self.assertEqual(value, values)
+
+    def test_scan(self):
+        text = (
+            'title = "a [fake] table # not comment"\n'
+            'description = """\n[not.table]\nkey = [1]\n"""\n'
+            "[project]\n"
+            "dependencies = [\n  'a]',  # ]\n]\n"
+            "optional-dependencies.dev = []\n"
+            "[[tool.items]]\n"
+            "name = 'x'\n"
+        )
+        layout = scan(text)
+        assert layout is not None
+        self.assertEqual(set(layout.arrays), {DEPENDENCIES, DEV})
+        self.assertEqual(set(layout.tables), {(), ("project",)})
+        self.assertIn(("tool", "items", "name"), layout.keys)
+        self.assertEqual(text[slice(*layout.arrays[DEPENDENCIES])], "[\n  'a]',  # ]\n]")
+
+    def test_patch_single_line(self):
+        self.assertPatched(
+            "[project]\ndependencies = ['b', \"c\"] # deps\nname = 'x'",
+            {DEPENDENCIES: ["a", "b"]},
+            "[project]\ndependencies = [\"a\", 'b'] # deps\nname = 'x'\n",
+        )
+
+    def test_patch_multiline(self):
+        self.assertPatched(
+            "[project]\n  dependencies = [\n\t'b',\n\t# c is pinned\n\t'c==1',\n  ]\n",
+            {DEPENDENCIES: ["a", "c==1"]},
+            "[project]\n  dependencies = [\n\t\"a\",\n\t# c is pinned\n\t'c==1',\n  ]\n",
+        )
+
+    def test_insert(self):
+        with self.subTest(test="Insert into existing table"):
+            self.assertPatched(
+                '[project]\nname = "x"\n\n[tool.x]\n',
+                {DEPENDENCIES: ["a"]},
+                '[project]\nname = "x"\ndependencies = [\n    "a",\n]\n\n[tool.x]\n',
+            )
+        with self.subTest(test="Insert into table defined by dotted keys"):
+            self.assertPatched(
+                '[project]\noptional-dependencies.test = ["a"]\n',
+                {DEV: []},
+                '[project]\noptional-dependencies.test = ["a"]\noptional-dependencies.dev = []\n',
+            )
+        with self.subTest(test="Append missing tables"):
+            self.assertPatched(
+                '[project]\nname = "x"',
+                {DEV: ["a"], ("project", "optional-dependencies", "test.e2e"): []},
+                '[project]\nname = "x"\n\n[project.optional-dependencies]\n'
+                'dev = [\n    "a",\n]\n"test.e2e" = []\n',
+            )
+        with self.subTest(test="Empty document"):
+            self.assertPatched("", {DEPENDENCIES: []}, "[project]\ndependencies = []\n")
+
+    def test_insert_and_patch_by_key(self):
+        # the missing array is inserted before the existing array is patched by the key
+        text = '[project]\noptional-dependencies.dev = [\n    "A==1",  # pinned\n]\n'
+        patched = patch_arrays(
+            text,
+            {("project", "optional-dependencies", "test"): ["b"], DEV: ["a==2"]},
+            key=lambda value: value.split("==")[0].lower(),
+        )
+        self.assertEqual(
+            patched,
+            '[project]\noptional-dependencies.dev = [\n    "a==2",  # pinned\n]\n'
+            'optional-dependencies.test = [\n    "b",\n]\n',
+        )
+
+    def test_unpatchable(self):
+        self.assertIsNone(
+            patch_arrays('[project]\noptional-dependencies = {dev = ["a"]}\n', {DEV: ["b"]})
+        )
+        self.assertIsNone(patch_arrays("[project]\ndependencies = [1, 2]\n", {DEPENDENCIES: []}))
+        self.assertIsNone(patch_arrays("[project\ndependencies = [\n", {DEPENDENCIES: []}))
@@ -0,0 +1,85 @@
+import json
+from pathlib import Path
+from threading import Thread
+
+from typer.testing import CliRunner
+
+from start.cli import app
+from start.core import trace
+from tests.base import TestBase
+
+
+class TestTrace(TestBase):
+    def tearDown(self) -> None:
+        trace.disable()
+
+    def test_phase(self):
+        with trace.phase("disabled") as span:
+            trace.count("subprocesses")
+        self.assertIsNone(span)
+
+        def in_thread():
+            with trace.phase("thread"):
+                pass
+
+        tracer = trace.enable("start new")
+        with trace.phase("create", path="a"):
+            trace.count("subprocesses")
+            for _ in range(2):
+                with trace.phase("write"):
+                    trace.count("bytes_written", 10)
+            thread = Thread(target=in_thread)
+            thread.start()
+            thread.join()
+        trace.count("subprocesses")
+        self.assertIs(trace.disable(), tracer)
+        self.assertFalse(trace.enabled())
+
+        data = tracer.to_json()
+        self.assertEqual(data["subprocesses"], 2)
+        self.assertEqual(data["bytes_written"], 20)
+        self.assertEqual(list(data["phases"]), ["create", "create/write", "thread"])
+        create = data["spans"][0]
+        self.assertEqual((create["subprocesses"], create["bytes_written"]), (1, 20))
+        self.assertEqual(create["args"], {"path": "a"})
+        self.assertEqual([child["bytes_written"] for child in create["children"]], [10, 10])
+
+        with self.subTest(test="Chrome trace events"):
+            events = tracer.to_chrome()["traceEvents"]
+            self.assertEqual(events[0]["args"], {"name": "start new"})
+            self.assertEqual(
+                [event["name"] for event in events[1:]], ["create", "write", "write", "thread"]
+            )
+            self.assertTrue(all(event["ph"] == "X" for event in events[1:]))
+            self.assertNotEqual(events[-1]["tid"], events[1]["tid"])
+
+        with self.subTest(test="Summary"):
+            lines = tracer.summary().splitlines()
+            self.assertTrue(lines[1].startswith("create "))
+            self.assertTrue(lines[2].startswith("  write "))
+            self.assertIn("20B", lines[-1])
+
+    def test_regressions(self):
+        baseline = {"phases": {"create": 1.0, "create/pip install": 0.8, "noise": 0.001}}
+        current = {"phases": {"create": 1.5, "create/pip install": 0.85, "noise": 0.005, "new": 1}}
+        self.assertEqual(trace.regressions(baseline, current), {"create": (1.0, 1.5)})
+
+    def test_cli(self):
+        trace_file = Path(self.tmp_dir, "trace.json")
+        runner = CliRunner()
+        project = "traced_project"
+        args = ["new", project, "--without-pip", "--without-upgrade"]
+        result = runner.invoke(app, ["--profile", "--trace", str(trace_file), *args])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("create environment", result.output)
+        phases = json.loads(trace_file.read_text())["phases"]
+        self.assertIn("create template/git user info", phases)
+        self.assertIn("create environment/setup python", phases)
+        self.assertFalse(trace.enabled())
+
+        with self.subTest(test="Chrome format by environment variable"):
+            env = {"START_TRACE": str(trace_file), "START_TRACE_FORMAT": "chrome"}
+            result = runner.invoke(app, [*args, "--force"], env=env)
+            self.assertEqual(result.exit_code, 0, result.output)
+            names = {event["name"] for event in json.loads(trace_file.read_text())["traceEvents"]}
+            self.assertIn("create environment", names)
@@ -0,0 +1,76 @@
+import io
+import json
+import unittest
+
+from start.core.graph import PackageGraph
+from start.core.tree import CYCLE, REPEATED, DependencyTree
+
+# a -> b -> d, a -> c -> d, d -> e, f <-> g
+REQUIRES = {
+    "a": ["b", "c"],
+    "b": ["d"],
+    "c": ["d"],
+    "d": ["e"],
+    "f": ["g"],
+    "g": ["f"],
+}
+
+
+class TestDependencyTree(unittest.TestCase):
+    def render(self, tree: DependencyTree, depth=None) -> list:
+        return [line.prefix + line.name + line.marker for line in tree.render(depth)]
+
+    def test_render(self):
+        tree = DependencyTree(PackageGraph(REQUIRES))
+        self.assertEqual(tree.roots(), ["a", "f"])
+        self.assertEqual(
+            self.render(tree),
+            [
+                "├─a",
+                "│ ├─b",
+                "│ │ └─d",
+                "│ │   └─e",
+                "│ └─c",
+                "│   └─d" + REPEATED,
+                "└─f",
+                "  └─g",
+                "    └─f" + CYCLE,
+            ],
+        )
+        self.assertEqual(self.render(tree, depth=1), ["├─a", "│ ├─b", "│ └─c", "└─f", "  └─g"])
+
+    def test_reverse(self):
+        tree = DependencyTree(PackageGraph(REQUIRES)).reverse()
+        self.assertEqual(tree.roots(), ["e", "f"])
+        self.assertEqual(
+            self.render(tree)[:5],
+            ["├─e", "│ └─d", "│   ├─b", "│   │ └─a", "│   └─c"],
+        )
+
+    def test_large_graph(self):
+        # every layer requires all packages of the next layer, paths grow exponentially
+        layers = [[f"p{layer}-{i}" for i in range(3)] for layer in range(30)]
+        requires = {
+            name: layers[layer + 1] if layer + 1 < len(layers) else []
+            for layer, names in enumerate(layers)
+            for name in names
+        }
+        # a chain deeper than the recursion limit
+        requires.update({f"chain{i}": [f"chain{i + 1}"] for i in range(5000)})
+        lines = list(DependencyTree(PackageGraph(requires)).render())
+        self.assertEqual(len(lines), 3 + 29 * 9 + 5001)
+        self.assertEqual(lines[-1].depth, 5000)
+
+    def test_export(self):
+        tree = DependencyTree(PackageGraph(REQUIRES))
+        output = io.StringIO()
+        tree.write_json(output, depth=1)
+        self.assertEqual(
+            json.loads(output.getvalue()),
+            {
+                "roots": ["a", "f"],
+                "packages": {"a": ["b", "c"], "f": ["g"], "b": [], "c": [], "g": []},
+            },
+        )
+        dot = list(DependencyTree(PackageGraph({"a": ["b"], "c": []})).iter_dot())
+        self.assertEqual(dot, ["digraph dependencies {", '    "a" -> "b";', '    "c";', "}"])
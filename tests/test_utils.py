@@ -5,7 +5,13 @@ from unittest.mock import MagicMock, patch
 
 from typer import Exit
 
-from start.utils import _script_dir_name, display_activate_cmd, is_env_dir, try_git_init
+from start.utils import (
+    _script_dir_name,
+    activated_environ,
+    display_activate_cmd,
+    is_env_dir,
+    try_git_init,
+)
 from tests.base import TestBase
 
 
@@ -70,3 +76,13 @@ class TestUtils(TestBase):
 
         # Test when the path does not exist
         self.assertFalse(is_env_dir("/path/to/nonexistent"))
+
+    def test_activated_environ(self):
+        environ = activated_environ(self.env_dir, {"PATH": "/usr/bin", "PYTHONHOME": "/python"})
+        env_dir = str(self.env_dir.absolute())
+        self.assertEqual(environ["VIRTUAL_ENV"], env_dir)
+        self.assertEqual(environ["VIRTUAL_ENV_PROMPT"], ".venv")
+        self.assertEqual(
+            environ["PATH"], os.pathsep.join((os.path.join(env_dir, _script_dir_name), "/usr/bin"))
+        )
+        self.assertNotIn("PYTHONHOME", environ)
@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import zipfile
+from pathlib import Path
+from typing import Sequence
+from unittest.mock import MagicMock
+
+from start.core.metadata import EnvMetadata
+from start.core.wheelhouse import Wheelhouse, filter_wheel_args, parse_size
+from tests.base import TestBase
+
+
+class TestWheelhouse(TestBase):
+    def setUp(self) -> None:
+        self.root = Path(self.tmp_dir, self._testMethodName)
+        self.wheelhouse = Wheelhouse(self.root, max_size="1K")
+
+    def make_wheel(self, name: str, content: bytes) -> Path:
+        wheel = Path(self.tmp_dir, name)
+        wheel.write_bytes(content)
+        return wheel
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("100"), 100)
+        self.assertEqual(parse_size("1k"), 1024)
+        self.assertEqual(parse_size("1.5M"), int(1.5 * 1024**2))
+        self.assertEqual(parse_size("5GB"), 5 * 1024**3)
+
+    def test_filter_wheel_args(self):
+        self.assertEqual(
+            filter_wheel_args(["-U", "--target", "dir", "--prefix=dir", "-i", "url", "--pre"]),
+            ["-i", "url", "--pre"],
+        )
+
+    def test_add(self):
+        link1 = self.wheelhouse.add(self.make_wheel("a-1.0-py3-none-any.whl", b"a"))
+        link2 = self.wheelhouse.add(self.make_wheel("b-1.0-py3-none-any.whl", b"a"))
+        self.assertEqual(link1, self.root / "links" / "a-1.0-py3-none-any.whl")
+        # the same content is stored only once
+        self.assertTrue(link1.samefile(link2))
+        self.assertEqual(len(list(self.wheelhouse.blobs_dir.iterdir())), 1)
+        self.assertEqual(self.wheelhouse.size(), 1)
+        self.assertEqual(
+            [wheel["name"] for wheel in self.wheelhouse.wheels()],
+            ["a-1.0-py3-none-any.whl", "b-1.0-py3-none-any.whl"],
+        )
+
+    def test_prune(self):
+        for i, name in enumerate(("old", "new", "newest")):
+            link = self.wheelhouse.add(
+                self.make_wheel(f"{name}-1.0-py3-none-any.whl", b"x" * 400 + name.encode())
+            )
+            os.utime(link, (i, i))
+        self.assertEqual(self.wheelhouse.prune(), ["old-1.0-py3-none-any.whl"])
+        self.assertEqual(len(list(self.wheelhouse.blobs_dir.iterdir())), 2)
+        self.assertEqual(
+            self.wheelhouse.prune(0), ["new-1.0-py3-none-any.whl", "newest-1.0-py3-none-any.whl"]
+        )
+        self.assertEqual(self.wheelhouse.size(), 0)
+
+        with self.subTest(test="Blobs being added are kept"):
+            blob = self.wheelhouse.blobs_dir / ("0" * 64)
+            blob.write_bytes(b"adding")
+            self.wheelhouse.prune()
+            self.assertTrue(blob.exists())
+            os.utime(blob, (0, 0))
+            self.wheelhouse.prune()
+            self.assertFalse(blob.exists())
+
+    def add_package(self, name: str, version: str, requires: Sequence[str] = ()):
+        wheel = Path(self.tmp_dir, f"{name}-{version}-py3-none-any.whl")
+        metadata = [f"Name: {name}", f"Version: {version}"]
+        metadata.extend(f"Requires-Dist: {require}" for require in requires)
+        with zipfile.ZipFile(wheel, "w") as zf:
+            zf.writestr(f"{name}-{version}.dist-info/METADATA", "\n".join(metadata) + "\n")
+        return self.wheelhouse.add(wheel)
+
+    def test_cached(self):
+        link = self.add_package("a", "1.0", ["b>=1.0", "c; extra == 'x'", "d; python_version<'3'"])
+        os.utime(link, (0, 0))
+        self.add_package("b", "1.0")
+        self.add_package("b", "2.0", ["a==1.0"])
+        environment = EnvMetadata(sys.executable).marker_environment
+
+        self.assertTrue(self.wheelhouse.cached(["a==1.0 --hash=sha256:0"], environment))
+        self.assertGreater(link.stat().st_mtime, time.time() - 60)
+        self.assertFalse(self.wheelhouse.cached(["a[x]==1.0"], environment))
+        self.assertFalse(self.wheelhouse.cached(["a>=1.0"], environment))
+        self.assertFalse(self.wheelhouse.cached(["a==1.0", "b==0.5"], environment))
+        self.assertTrue(self.wheelhouse.cached(["a==1.0", "b==1.0"], environment))
+        self.assertFalse(self.wheelhouse.cached(["c==1.0"], environment, deps=False))
+        self.assertTrue(self.wheelhouse.cached(["a[x]==1.0"], environment, deps=False))
+        self.assertFalse(
+            self.wheelhouse.cached(["a==1.0"], {**environment, "python_version": "2.7"})
+        )
+
+        with self.subTest(test="Fill is skipped for the cached requirements"):
+            pip = MagicMock(execu=sys.executable)
+            self.assertTrue(self.wheelhouse.fill(pip, "a==1.0", pip_args=[]))
+            require_file = Path(self.tmp_dir, "requirements.txt")
+            require_file.write_text("a==1.0 --hash=sha256:0\nc==1.0 ; sys_platform == 'x'\n")
+            self.assertTrue(
+                self.wheelhouse.fill(pip, "--no-deps", "-r", str(require_file), pip_args=[])
+            )
+            self.assertTrue(self.wheelhouse.fill(pip, "c", pip_args=["--no-index"]))
+            pip.execute.assert_not_called()
+
+    def test_fill(self):
+        pip = MagicMock(return_code=0, stderr=[""])
+
+        def build_wheel(cmd: list[str]):
+            self.make_wheel("a-1.0-py3-none-any.whl", b"a").rename(
+                Path(cmd[cmd.index("--wheel-dir") + 1], "a-1.0-py3-none-any.whl")
+            )
+
+        pip.execute.side_effect = build_wheel
+        self.assertTrue(self.wheelhouse.fill(pip, "a", pip_args=["-U"]))
+        cmd = pip.execute.call_args.args[0]
+        self.assertEqual(cmd[0], "wheel")
+        self.assertEqual(cmd[-1], "a")
+        self.assertEqual(
+            [wheel["name"] for wheel in self.wheelhouse.wheels()], ["a-1.0-py3-none-any.whl"]
+        )
+        self.assertEqual(
+            self.wheelhouse.pip_args(no_index=True),
+            ["--find-links", str(self.wheelhouse.links_dir), "--no-index"],
+        )
+
+        pip.return_code = 1
+        self.assertFalse(self.wheelhouse.fill(pip, "a", pip_args=[]))
+        self.assertEqual(
+            self.wheelhouse.pip_args(no_index=False),
+            ["--find-links", str(self.wheelhouse.links_dir)],
+        )
+
+        pip.reset_mock()
+        offline = Wheelhouse(self.root, offline=True)
+        self.assertTrue(offline.fill(pip, "a", pip_args=[]))
+        pip.execute.assert_not_called()
+        self.assertIn("--no-index", offline.pip_args(no_index=False))
@@ -0,0 +1,107 @@
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+from packaging.specifiers import SpecifierSet
+
+from start.core.metadata import EnvMetadata
+from start.core.workspace import Workspace, find_workspace, is_editable_install, is_satisfiable
+from tests.base import TestBase
+from tests.test_metadata import make_fake_env
+
+ENVIRONMENT = {"python_version": "3.11", "sys_platform": "linux", "extra": ""}
+
+
+def make_workspace(root: Path, members: dict, root_config: str = "") -> Path:
+    """Create the root config and member projects with their dependencies."""
+    for name, (dependencies, groups) in members.items():
+        member = root / "packages" / name
+        member.mkdir(parents=True)
+        lines = [f'[project]\nname = "{name}"\ndependencies = {json.dumps(dependencies)}']
+        if groups:
+            lines.append("[project.optional-dependencies]")
+            lines.extend(f"{group} = {json.dumps(deps)}" for group, deps in groups.items())
+        (member / "pyproject.toml").write_text("\n".join(lines))
+    config = root / "pyproject.toml"
+    config.write_text(root_config or '[tool.start.workspace]\nmembers = ["packages/*"]\n')
+    return config
+
+
+class TestWorkspace(TestBase):
+    def setUp(self) -> None:
+        self.root = Path(self.tmp_dir, self._testMethodName)
+
+    def test_requirements(self):
+        config = make_workspace(
+            self.root,
+            {
+                "app": (["Requests>=2.0", "lib", 'uvloop; sys_platform == "win32"'], {}),
+                "lib": (["requests[socks]<3", "click"], {"dev": ["pytest>=7", "Click>=8.1"]}),
+            },
+        )
+        (self.root / "packages" / "notes").mkdir()
+        workspace = Workspace(config)
+        self.assertEqual([member.name for member in workspace.members], ["app", "lib"])
+
+        requirements = {r.name: r for r in workspace.requirements(ENVIRONMENT)}
+        self.assertEqual(list(requirements), ["click", "pytest", "requests"])
+        self.assertEqual(str(requirements["requests"]), "requests[socks]<3,>=2.0")
+        self.assertEqual(str(requirements["click"]), "click>=8.1")
+        self.assertEqual(list(requirements["requests"].sources), ["app", "lib"])
+        self.assertEqual(workspace.conflicts(list(requirements.values())), [])
+
+        with self.subTest(test="Exclude members"):
+            config.write_text(
+                '[tool.start.workspace]\nmembers = ["packages/*"]\nexclude = ["packages/lib"]\n'
+            )
+            workspace = Workspace(config)
+            self.assertEqual([member.name for member in workspace.members], ["app"])
+            names = [r.name for r in workspace.requirements(ENVIRONMENT)]
+            # lib is excluded, so it's installed as a package
+            self.assertEqual(names, ["lib", "requests"])
+
+        with self.subTest(test="Find root config from member"):
+            self.assertEqual(find_workspace(self.root / "packages" / "app"), config)
+            self.assertIsNone(find_workspace(Path(self.tmp_dir)))
+
+    def test_conflicts(self):
+        config = make_workspace(
+            self.root,
+            {
+                "app": (["requests>=2.28", "six @ https://example.com/six-1.whl"], {}),
+                "lib": (["requests<2.28", "six @ https://example.com/six-2.whl"], {}),
+            },
+        )
+        workspace = Workspace(config)
+        conflicts = workspace.conflicts(workspace.requirements(ENVIRONMENT))
+        self.assertEqual([r.name for r in conflicts], ["requests", "six"])
+        self.assertEqual(conflicts[0].describe(), "requests>=2.28 (app), requests<2.28 (lib)")
+
+    def test_is_satisfiable(self):
+        for specifier, expected in (
+            ("", True),
+            (">=1.0,<2", True),
+            (">=2,<2", False),
+            ("==1.4.*,>=1.4.2", True),
+            ("==1.4.*,>=1.5", False),
+            ("~=1.4,!=1.4", True),
+            ("==1.0,!=1.0", False),
+            (">1.0,<1.0.1", True),
+            (">1.0rc1,<1.0rc3", True),
+            ("==1.0,==2.0", False),
+        ):
+            with self.subTest(specifier=specifier):
+                self.assertEqual(is_satisfiable(SpecifierSet(specifier)), expected)
+
+    def test_is_editable_install(self):
+        config = make_workspace(self.root, {"app": ([], {})})
+        member = Workspace(config).members[0]
+        env_dir = self.root / "env"
+        executable = make_fake_env(env_dir, {"app": ("0.1", [])})
+        with patch("start.core.metadata.INDEX_DIR", self.root / "index"):
+            metadata = EnvMetadata(executable)
+            self.assertFalse(is_editable_install(metadata, member))
+            dist_info = next(env_dir.glob("lib*/*/site-packages/app-0.1.dist-info"))
+            direct_url = {"url": member.path.as_uri(), "dir_info": {"editable": True}}
+            (dist_info / "direct_url.json").write_text(json.dumps(direct_url))
+            self.assertTrue(is_editable_install(metadata, member))